@@ -17,5 +17,9 @@ class Adaptor:
             raise ValueError(adaptor_name)
         return adaptor().transform(**data)
 
+    def validate_plan(self, domain, problem, plan, trajectory=None):
+        # Plans are simulated in-process with the planning editor adaptor's parser
+        return PlanningEditorAdaptor().validate(domain, problem, plan, trajectory)
+
 
 
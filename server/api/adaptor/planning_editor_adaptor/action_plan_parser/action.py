@@ -1,5 +1,7 @@
+import sys
+
 from formula import Formula
-from predicate import Predicate
+from predicate import Predicate, intern_args
 
 class Action (object):
     """
@@ -8,7 +10,7 @@ class Action (object):
         Attributes:
             name: the action name (string)
 
-            parameters: list of tuples that contain a pair of strings:
+            parameters: tuple of tuples that contain a pair of interned strings:
                 1) the variable name
                 2) the variable type
 
@@ -22,6 +24,11 @@ class Action (object):
             none
     """
 
+    __slots__ = ("name", "parameters", "precondition", "observe", "effect", "_hash", "_template")
+
+    # marks parameter positions while compiling the export template
+    _SLOT = "\0%d\0"
+
     def __init__ (self, name, parameters, precondition, observe, effect):
         """
             Create a new action.
@@ -43,26 +50,30 @@ class Action (object):
         """
 
         assert isinstance (name, str), "name must be a string"
-        assert isinstance (parameters, list) and all([isinstance (param, tuple) for param in parameters]), "parameters must be a list of tuples"
+        assert isinstance (parameters, (list, tuple)) and all([isinstance (param, tuple) for param in parameters]), "parameters must be a list of tuples"
         assert isinstance (precondition, Formula) or precondition is None, "precondition must be a Formula object"
         assert isinstance (observe, Predicate) or observe is None, "observe must be a Predicate object or None"
         assert isinstance (effect, Formula) or effect is None, "effect must be a Formula object or None"
 
-        self.name = name
-        self.parameters = parameters
+        self.name = sys.intern (name)
+        self.parameters = intern_args (parameters)
         self.precondition = precondition
         self.observe = observe
         self.effect = effect
+        self._hash = None
+        self._template = None
 
     def _hash_string (self):
         return self.name + "_" + \
                 "_".join([p[0] + "_" + p[1] for p in self.parameters])
 
     def __hash__ (self):
-        return hash (self._hash_string ())
+        if self._hash is None:
+            self._hash = hash (self._hash_string ())
+        return self._hash
 
-    def __cmp__ (self, a):
-        return cmp (self._hash_string (), a._hash_string())
+    def __lt__ (self, a):
+        return self._hash_string () < a._hash_string ()
 
     def __eq__ (self, a):
         return self.is_equal (a)
@@ -124,6 +135,30 @@ class Action (object):
         o.append (prefix + ")")
         return "\n".join(o)
 
+    def export_template (self):
+        """Return the grounded export of this action as a (format, slots) template.
+
+        The template is compiled once, by exporting the action with a marker in
+        place of every parameter. format has one %s per parameter occurrence and
+        slots gives the index of the parameter that fills each of them."""
+
+        if self._template is None:
+            marked = self.export (grounding=[Action._SLOT % i for i in range (len (self.parameters))])
+            pieces = marked.split ("\0")
+            fmt = "%s".join ([piece.replace ("%", "%%") for piece in pieces[0::2]])
+            slots = tuple ([int (i) for i in pieces[1::2]])
+            self._template = (fmt, slots)
+        return self._template
+
+    def ground_export (self, args):
+        """Same output as export (grounding=args), filled in from the compiled template."""
+
+        if len (args) != len (self.parameters):
+            return self.export (grounding=args)
+
+        fmt, slots = self.export_template ()
+        return fmt % tuple ([args[i] for i in slots])
+
     def dump (self, lvl=0):
         """ Verbose string representation for debugging
         Inputs:
@@ -0,0 +1,126 @@
+"""
+    Canonical form of PDDL text, so that submissions differing only in
+    comments, whitespace, case or the order of set-like sections share one
+    text and one digest.
+
+    The text is tokenized (comments dropped, tokens lowercased, see
+    preflight.tokenize) and written back with single spaces. The elements of :requirements, :types,
+    :constants, :predicates, :objects and :init are sorted (duplicate :init
+    facts dropped); typed lists are regrouped by type. Everything else keeps
+    its order.
+"""
+
+import hashlib
+import re
+
+from preflight import Tokens, tokenize
+
+# sections whose elements are expressions (or names) in no particular order
+_SORTED = set ([":requirements", ":predicates", ":init"])
+# typed lists of names
+_TYPED = set ([":types", ":constants", ":objects"])
+
+_SPACE_RE = re.compile (r"\( | \)")
+
+
+def _typed_list (items):
+    """Regroup a typed list (a list of names and expressions) by type, each group sorted."""
+
+    groups = {}
+    names = []
+    i = 0
+    while i < len (items):
+        if items[i] == "-" and i + 1 < len (items):
+            groups.setdefault (items[i + 1], set ([])).update (names)
+            names = []
+            i += 2
+        else:
+            names.append (items[i])
+            i += 1
+    out = []
+    for t in sorted (groups):
+        out.extend (sorted (groups[t]))
+        out.extend (["-", t])
+    # names without a type come last, as they are of type object
+    out.extend (sorted (set (names)))
+    return out
+
+
+def _section (keyword, tokens):
+    """Return the canonical tokens of a section, given the tokens inside its parentheses after the keyword."""
+
+    items = []
+    depth = 0
+    for t in tokens:
+        if depth == 0 and t != "(":
+            items.append (t)
+        else:
+            if depth == 0:
+                current = []
+            current.append (t)
+            if t == "(":
+                depth += 1
+            elif t == ")":
+                depth -= 1
+                if depth == 0:
+                    items.append (" ".join (current))
+    if keyword in _TYPED:
+        items = _typed_list (items)
+    elif keyword == ":init":
+        items = sorted (set (items))
+    else:
+        items = sorted (items)
+    # items are sorted as text, and expressions split back into their tokens
+    return ["(", keyword] + " ".join (items).split () + [")"]
+
+
+def canonical_tokens (tokens):
+    """
+        Return the Tokens of the canonical form of a PDDL domain or problem,
+        given its Tokens. Tokens with unbalanced parentheses are returned as
+        they are.
+    """
+
+    out = Tokens ()
+    out.offsets = None
+    depth = 0
+    start = None
+    for i, t in enumerate (tokens):
+        if t == "(":
+            depth += 1
+            if depth == 2:
+                start = i
+        elif t == ")":
+            depth -= 1
+            if depth == 1 and start is not None:
+                keyword = tokens[start + 1] if start + 1 < i else None
+                if keyword in _SORTED or keyword in _TYPED:
+                    out.extend (_section (keyword, tokens[start + 2:i]))
+                else:
+                    out.extend (tokens[start:i + 1])
+                start = None
+                continue
+        if depth < 2 and start is None:
+            out.append (t)
+    if start is not None or depth != 0:
+        return tokens
+    return out
+
+
+def canonical_text (tokens):
+    """Return the text of canonical Tokens and its sha256 hex digest."""
+
+    canonical = _SPACE_RE.sub (lambda m: m.group (0).strip (), " ".join (tokens))
+    return canonical, hashlib.sha256 (canonical.encode ('utf-8')).hexdigest ()
+
+
+def canonicalize (text, tokens=None):
+    """
+        Return the canonical text of a PDDL domain or problem and its sha256
+        hex digest. Text with unbalanced parentheses is only tokenized.
+        tokens may give the Tokens of the text.
+    """
+
+    if tokens is None:
+        tokens = tokenize (text)
+    return canonical_text (canonical_tokens (tokens))
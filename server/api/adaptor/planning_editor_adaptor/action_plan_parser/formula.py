@@ -1,5 +1,5 @@
 
-from predicate import Predicate
+from predicate import Predicate, intern_args
 
 
 class Formula(object):
@@ -7,7 +7,7 @@ class Formula(object):
         This is an abstract class.
 
         Attributes:
-            args: list of Formula objects
+            args: tuple of Formula objects
 
         Methods:
             normalize: restructure the Formula object to be in canonical form:
@@ -24,6 +24,8 @@ class Formula(object):
                             object if there is a Oneof object
     """
 
+    __slots__ = ("name", "args")
+
     def __init__(self, name, args):
         """
             Inputs:
@@ -31,11 +33,11 @@ class Formula(object):
                 args:   list of formula objects
         """
 
-        assert isinstance(args, list) and \
+        assert isinstance(args, (list, tuple)) and \
             all([isinstance(arg, Formula) for arg in args]),\
             "args must be a list of Formula objects"
         self.name = name
-        self.args = args
+        self.args = tuple(args)
 
     def to_ground (self, fluent_dict):
         """Assert that this formula is actually ground.
@@ -89,9 +91,7 @@ class Formula(object):
                 arg_lines.append (arg.export (lvl + 1, sp, untyped, grounding))
             else:
                 res_str = str(arg)
-                for k in grounding:
-                    res_str = res_str.replace(k, grounding[k])
-                arg_lines.append (prefix + res_str)
+                arg_lines.append (prefix + grounding.get(res_str, res_str))
 
         arg_lines.append (prefix + ")")
         return "\n".join (arg_lines)
@@ -126,7 +126,7 @@ class Formula(object):
         # 3) Verify And object not nested under And object
         if isinstance(self, And):
             i = 0
-            queue = self.args[:]
+            queue = list(self.args)
             while len(queue) > 0:
                 arg = queue.pop()
                 if isinstance(arg, And):
@@ -150,6 +150,8 @@ class Formula(object):
 
 class Forall(Formula):
 
+    __slots__ = ("params",)
+
     def __init__(self, params, args):
         """
         Inputs:
@@ -162,7 +164,7 @@ class Forall(Formula):
 
         assert len(args) == 1, "Args list of forall class must be 1"
         super(Forall, self).__init__("forall", args)
-        self.params = params
+        self.params = intern_args(params)
 
     def export (self, lvl, sp, untyped=False, grounding={}):
         """Special export for forall must include
@@ -174,9 +176,13 @@ class Forall(Formula):
             param_line = " ".join (["%s - %s" % (p[0], p[1]) \
                     for p in self.params])
 
+        # quantified variables shadow any action parameter of the same name
+        bound = set ([p[0] for p in self.params])
+        grounding = {k: v for k, v in grounding.items() if k not in bound}
+
         s = super (Forall, self).export (lvl, sp, untyped, grounding)
         s_replace = "forall (%s)" % param_line
-        return s.replace ("forall", s_replace)
+        return s.replace ("forall", s_replace, 1)
 
     def __eq__ (self, f):
         return self.is_equal (f)
@@ -201,6 +207,8 @@ class Forall(Formula):
 
 class Or (Formula):
 
+    __slots__ = ()
+
     def __init__ (self, args):
         """Inputs:
             args:   list of formula objects
@@ -229,6 +237,8 @@ class Or (Formula):
 
 class And(Formula):
 
+    __slots__ = ()
+
     def __init__(self, args):
         """
             Inputs:
@@ -270,6 +280,8 @@ class Xor(Formula):
     Xor(Primitive(foo_a_b), Not(Primitive(foo_a_b )))
     """
 
+    __slots__ = ()
+
     def __init__(self, args):
         """
             Inputs:
@@ -303,6 +315,8 @@ class Not(Formula):
             args: one-item list of Formula objects
     """
 
+    __slots__ = ()
+
     def __init__(self, args):
         """
             Inputs:
@@ -339,6 +353,8 @@ class When(Formula):
             result
     """
 
+    __slots__ = ("condition", "result")
+
     def __init__(self, condition, result):
         """
             Inputs:
@@ -379,6 +395,8 @@ class Oneof(Formula):
             args:    List of formula objects
     """
 
+    __slots__ = ()
+
     def __init__(self, args):
         """
             Inputs:
@@ -412,6 +430,8 @@ class Primitive(Formula):
             predicate: of the Predicate class
     """
 
+    __slots__ = ("predicate",)
+
     def __init__(self, predicate):
         """
             Inputs:
@@ -427,16 +447,15 @@ class Primitive(Formula):
         """Doesn't actually ground, just forces the Primitive
         to accept that it is *already* ground.
 
-        fluent_dict allows referencing to existing fluents to save space
+        fluent_dict allows referencing to existing fluents to save space.
+        Predicates are immutable (their hash is cached), so the ground
+        fluent is looked up rather than converted in place.
         """
 
-        self.predicate.ground_args = self.predicate.args
-        self.predicate.args = None
-        if hash (self.predicate) not in fluent_dict:
-            for p in sorted (fluent_dict.values()):
-                print (p)
-            print ("Did not find %s" % str(self.predicate))
-        self.predicate = fluent_dict[hash(self.predicate)]
+        fluent = Predicate (self.predicate.name, None, self.predicate.args)
+        if hash (fluent) not in fluent_dict:
+            print ("Did not find %s" % str(fluent))
+        self.predicate = fluent_dict[hash(fluent)]
 
     def __eq__ (self, f):
         return isinstance (f, Primitive) and \
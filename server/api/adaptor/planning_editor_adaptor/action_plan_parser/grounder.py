@@ -1,6 +1,6 @@
 from parser import Problem
 from action import Action
-from formula import Primitive, Forall, When, And
+from formula import Primitive, Forall, When, And, Not
 from predicate import Predicate
 import itertools
 
@@ -19,6 +19,10 @@ class GroundProblem(Problem):
 
         no_ground       if the problem is already ground, don't ground again
 
+        reachability    only create the operators and fluents that are reachable
+                        in the delete relaxation (default), instead of every
+                        type-compatible grounding
+
     Attributes:
        (in addition to those inherited from Problem)
 
@@ -30,7 +34,7 @@ class GroundProblem(Problem):
         none
     """
 
-    def __init__(self, domain_file, problem_file, no_ground=False):
+    def __init__(self, domain_file, problem_file, no_ground=False, reachability=True):
         """Create a new instance of GroundProblem.
         Inputs:
             domain_file:    The location of the PDDL domain on disk
@@ -40,8 +44,12 @@ class GroundProblem(Problem):
             no_ground:      Whether to ground the PDDL or not
                             Set to True if PDDL already grounded
 
+            reachability:   Whether to prune operators and fluents that are
+                            not relaxed-reachable from the initial state
+
         """
 
+        self.reachability = reachability
 
         super(GroundProblem, self).__init__(domain_file, problem_file)
 
@@ -98,34 +106,34 @@ class GroundProblem(Problem):
         assert isinstance (p, GroundProblem), "Must compare two ground problems"
 
         if self.objects != p.objects:
-            print "objects"
+            print ("objects")
             return False
 
         if self.init != p.init:
             return False
 
         if self.goal != p.goal:
-            print "goal"
+            print ("goal")
             return False
 
         if not all ([sa == pa for sa, pa in \
                 zip (sorted (list (self.operators)), \
                 sorted (list (p.operators)))]):
-            print "operators"
+            print ("operators")
             return False
 
         if not all ([sp == pp for sp, pp in \
                 zip (sorted (list (self.fluents)), \
                 sorted (list (p.fluents)))]):
-            print "fluents"
-            print "*self*"
-            print sorted( list( self.fluents))
-            print "*p*"
-            print sorted (list( p.fluents))
+            print ("fluents")
+            print ("*self*")
+            print (sorted( list( self.fluents)))
+            print ("*p*")
+            print (sorted (list( p.fluents)))
             return False
 
         if self.types != p.types or self.parent_types != p.parent_types:
-            print "types"
+            print ("types")
             return False
         
         return True
@@ -192,16 +200,7 @@ class GroundProblem(Problem):
         d = {}
 
         for param_name, param_type in params:
-            if param_type in self.type_to_obj:
-                d[param_name] = self.type_to_obj[param_type]
-            elif Predicate.OBJECT == param_type:
-                d[param_name] = self.objects.copy()
-            else:
-                # for debugging
-                s = "Found a type in the list of parameters that is not in the type_to_obj dict \n"
-                s += "param_type = %s\n" % str(param_type)
-                s += "type_to_obj = %s" % str(self.type_to_obj)
-                raise KeyError(s)
+            d[param_name] = self.objects_of_type(param_type)
 
         return d
 
@@ -218,7 +217,7 @@ class GroundProblem(Problem):
         if isinstance(formula, Primitive):
             for v, t in formula.predicate.args:
                 if v.startswith("?") and v not in assigned:
-                    raise KeyError("Found unbound variable %s in predicate %s" % v, str(formula.predicate))
+                    raise KeyError("Found unbound variable %s in predicate %s" % (v, str(formula.predicate)))
         else:
             [self._get_unassigned_vars(arg, assigned) for arg in formula.args]
 
@@ -323,28 +322,199 @@ class GroundProblem(Problem):
         op_effect = self._partial_ground_formula(action.effect, assignment, fluent_dict)
         return Operator(op_name, op_params, op_precond, op_observe, op_effect)
 
-    def _create_operators(self, fluent_dict):
-        """Create the set of operators by grounding the actions."""
+    def _create_operators(self, fluent_dict, assignments=None):
+        """Create the set of operators by grounding the actions.
+
+        assignments, if given, holds the list of parameter assignments to ground
+        for each action. Otherwise every type-compatible assignment is used."""
 
         self.operators = set([])
 
-        for a in self.actions:
-            
-            var_names, val_generator = self._create_valuations(a.parameters, a)
+        for i, a in enumerate(self.actions):
 
-            for valuation in val_generator:
-                assignment = {var_name: val for var_name, val in zip(var_names, valuation)}
+            if assignments is None:
+                var_names, val_generator = self._create_valuations(a.parameters, a)
+                found = ({var_name: val for var_name, val in zip(var_names, valuation)} for valuation in val_generator)
+            else:
+                found = assignments[i]
+
+            for assignment in found:
                 self.operators.add(self._action_to_operator(a, assignment, fluent_dict))
 
-    def _create_fluents(self):
-        """Create the set of fluents by grounding the predicates."""
+    def _create_fluents(self, facts=None):
+        """Create the set of fluents by grounding the predicates.
+
+        facts, if given, maps predicate names to the argument tuples to ground.
+        Otherwise every type-compatible grounding is used."""
 
         self.fluents = set([])
-        for p in self.predicates:
-            var_names, val_generator = self._create_valuations(p.args)
-            for valuation in val_generator:
-                assignment = {var_name: val for var_name, val in zip(var_names, valuation)}
-                self.fluents.add(self._predicate_to_fluent(p, assignment))
+
+        if facts is None:
+            for p in self.predicates:
+                var_names, val_generator = self._create_valuations(p.args)
+                for valuation in val_generator:
+                    assignment = {var_name: val for var_name, val in zip(var_names, valuation)}
+                    self.fluents.add(self._predicate_to_fluent(p, assignment))
+        else:
+            arg_types = {p.name: [t for _, t in p.args] for p in self.predicates}
+            for name, arg_tuples in facts.items():
+                for args in arg_tuples:
+                    types = arg_types.get(name, [Predicate.OBJECT] * len(args))
+                    self.fluents.add(Predicate(name, args=None, ground_args=list(zip(args, types))))
+
+    def _conjunctive_atoms(self, formula):
+        """Return the atoms of the top-level conjunction of formula, as (name, args) pairs.
+
+        Any other structure (disjunctions, negations, quantifiers) is ignored,
+        which can only make more operators reachable, never fewer."""
+
+        if isinstance(formula, Primitive):
+            parts = [formula]
+        elif isinstance(formula, And):
+            parts = formula.args
+        else:
+            return []
+
+        return [(f.predicate.name, tuple([v for v, _ in f.predicate.args])) for f in parts \
+                if isinstance(f, Primitive) and f.predicate.name != "="]
+
+    def _add_effects(self, formula, forall_params=()):
+        """Return the atoms that formula may make true, as (name, args, forall_params) triples.
+        The conditions of conditional effects are ignored (delete relaxation)."""
+
+        if formula is None or isinstance(formula, Not):
+            return []
+        elif isinstance(formula, Primitive):
+            return [(formula.predicate.name, tuple([v for v, _ in formula.predicate.args]), forall_params)]
+        elif isinstance(formula, When):
+            return self._add_effects(formula.result, forall_params)
+        elif isinstance(formula, Forall):
+            return self._add_effects(formula.args[0], forall_params + formula.params)
+        else:
+            return [e for arg in formula.args for e in self._add_effects(arg, forall_params)]
+
+    def _effect_predicates(self, formula):
+        """Return the names of the predicates that formula may change."""
+
+        if formula is None:
+            return set([])
+        elif isinstance(formula, Primitive):
+            return set([formula.predicate.name])
+        elif isinstance(formula, When):
+            return self._effect_predicates(formula.result)
+        else:
+            return set([]).union(*[self._effect_predicates(arg) for arg in formula.args])
+
+    def _static_predicates(self):
+        """Return the names of the predicates that no action changes.
+        Their facts are fixed by the initial state."""
+
+        fluent_names = set([]).union(*[self._effect_predicates(a.effect) for a in self.actions])
+        return set([p.name for p in self.predicates]) - fluent_names
+
+    def _assignments(self, params, atoms, facts):
+        """
+        Generate the assignments to params under which every atom holds in facts.
+
+        Inputs:
+            params      list of (variable name, type) tuples
+            atoms       list of (predicate name, args) pairs that must hold
+            facts       dictionary mapping predicate names to sets of argument tuples
+
+        Atoms are joined smallest relation first; variables that no atom binds
+        range over the type-indexed candidate lists.
+        """
+
+        candidates = {v: self.objects_of_type(t) for v, t in params}
+        allowed = {v: set(objs) for v, objs in candidates.items()}
+        order = sorted(atoms, key=lambda atom: len(facts.get(atom[0], ())))
+
+        def extend(i, assignment):
+            if i == len(order):
+                free = [v for v, _ in params if v not in assignment]
+                for values in itertools.product(*[candidates[v] for v in free]):
+                    full = dict(assignment)
+                    full.update(zip(free, values))
+                    yield full
+                return
+
+            name, args = order[i]
+            for fact in facts.get(name, ()):
+                if len(fact) != len(args):
+                    continue
+                bound = dict(assignment)
+                for term, obj in zip(args, fact):
+                    if term in bound:
+                        if bound[term] != obj:
+                            break
+                    elif term in allowed:
+                        if obj not in allowed[term]:
+                            break
+                        bound[term] = obj
+                    elif not term.startswith("?") and term != obj:
+                        # a constant
+                        break
+                else:
+                    for full in extend(i + 1, bound):
+                        yield full
+
+        return extend(0, {})
+
+    def _instantiate(self, args, assignment, forall_params):
+        """Generate the argument tuples of an add effect under assignment,
+        expanding any universally quantified variables."""
+
+        var_names = [v for v, _ in forall_params]
+        for values in itertools.product(*[self.objects_of_type(t) for _, t in forall_params]):
+            local = dict(assignment)
+            local.update(zip(var_names, values))
+            yield tuple([local.get(term, term) for term in args])
+
+    def _relaxed_reachability(self):
+        """
+        Compute the fixpoint of the delete relaxation from the initial state.
+
+        Returns:
+            facts           dictionary mapping predicate names to the set of
+                            reachable argument tuples (including static facts)
+            assignments     for each action, the list of parameter assignments
+                            whose preconditions are relaxed-reachable
+        """
+
+        facts = {}
+        for name, args in self._conjunctive_atoms(self.init):
+            facts.setdefault(name, set([])).add(args)
+
+        static = self._static_predicates()
+        schemas = [(a, self._conjunctive_atoms(a.precondition), self._add_effects(a.effect)) for a in self.actions]
+        reached = [{} for _ in self.actions]
+
+        # an action only needs revisiting once one of its non-static
+        # precondition predicates gains new facts
+        changed = None
+        while changed is None or len(changed) > 0:
+            new_changed = set([])
+            for i, (action, pre, adds) in enumerate(schemas):
+                if changed is not None and not any([name in changed for name, _ in pre if name not in static]):
+                    continue
+
+                seen = reached[i]
+                # materialize first: the effects below grow the relations being joined
+                for assignment in list(self._assignments(action.parameters, pre, facts)):
+                    key = tuple([assignment[v] for v, _ in action.parameters])
+                    if key in seen:
+                        continue
+                    seen[key] = assignment
+
+                    for name, args, forall_params in adds:
+                        relation = facts.setdefault(name, set([]))
+                        for fact in self._instantiate(args, assignment, forall_params):
+                            if fact not in relation:
+                                relation.add(fact)
+                                new_changed.add(name)
+            changed = new_changed
+
+        return facts, [list(seen.values()) for seen in reached]
 
     def _get_unground_vars(self, formula, d):
         """
@@ -378,11 +548,16 @@ class GroundProblem(Problem):
     def _ground(self):
         """Convert this problem into a ground problem."""
 
-        self._create_fluents()
+        if self.reachability:
+            facts, assignments = self._relaxed_reachability()
+        else:
+            facts, assignments = None, None
+
+        self._create_fluents(facts)
 
         # to avoid creating a bunch new fluent objects, create a dictionary mapping fluent names to their objects
         fluent_dict = {hash(f): f for f in self.fluents}
-        self._create_operators(fluent_dict)
+        self._create_operators(fluent_dict, assignments)
         self._ground_init(fluent_dict)
 
     def __repr__(self):
@@ -403,16 +578,16 @@ class GroundProblem(Problem):
             "Fluents": self.fluents
         }
 
-        for k, v in d.iteritems():
-            print "*** %s ***" % k
+        for k, v in d.items():
+            print ("*** %s ***" % k)
             if k == "Operators":
                 for op in self.operators:
                     op.dump(lvl=1)  # inherited from superclass Action
             elif hasattr(v, "__iter__"):
                 for item in v:
-                    print "\t" + str(item)
+                    print ("\t" + str(item))
             else:
-                print "\t" + str(v)
+                print ("\t" + str(v))
 
 
 class Operator(Action):
@@ -430,6 +605,8 @@ class Operator(Action):
         none
     """
 
+    __slots__ = ()
+
     def __init__(self, name, parameters, precondition, observe, effect):
         """Create a new Operator.
 
@@ -465,12 +642,11 @@ class Operator(Action):
         """
 
         # for operators, sufficient just to print the name, because pretty self-explanatory
-        print "\t" * lvl + "Operator %s" % self.name
+        print ("\t" * lvl + "Operator %s" % self.name)
         if len(self.parameters) > 0:
-            print "\t" * (lvl + 1) + "Parameters: " + \
-                ", ".join([v_type + " " + v_name for v_name, v_type in self.parameters])
+            print ("\t" * (lvl + 1) + "Parameters: " + ", ".join([v_type + " " + v_name for v_name, v_type in self.parameters]))
         else:
-            print "\t" * (lvl + 1) + "Parameters: <none>"
+            print ("\t" * (lvl + 1) + "Parameters: <none>")
             #print(lvl + 1) * "\t" + "Precondition: " + str(self.precondition)
         #print(lvl + 1) * "\t" + "Effect: " + str(self.effect)
         #print(lvl + 1) * "\t" + "Observe: " + str(self.observe)
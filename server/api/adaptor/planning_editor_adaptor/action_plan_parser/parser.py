@@ -3,6 +3,7 @@ import os
 sys.path.append(os.path.abspath(os.path.dirname(__file__) + '/../' + "action_plan_parser"))
 
 from collections import OrderedDict
+import copy
 from formula import Formula, And, Primitive, Forall, When, Xor, Not, Oneof, Or
 from action import Action
 from predicate import Predicate
@@ -59,6 +60,7 @@ class Problem(object):
         self.objects = set([])
         self.obj_to_type = {}
         self.type_to_obj = {}
+        self._type_index = None
 
         # make sure that domain is parsed before the problem
         self._parse_domain(domain_file)
@@ -218,12 +220,12 @@ class Problem(object):
         d["Obj -> Type Mapping"] = self.obj_to_type
         #d["Type -> Obj Mapping"] = self.type_to_obj
 
-        for k, v in d.iteritems():
+        for k, v in d.items():
             print ("*** %s ***" % k)
             if isinstance(v, dict):
                 if len(v) == 0:
                     print ("\t<no items>")
-                for k, val in v.iteritems():
+                for k, val in v.items():
                     print ("\t%s -> %s" % (k, str(val)))
             elif hasattr(v, '__iter__'):
                 if len(v) == 0:
@@ -286,7 +288,7 @@ class Problem(object):
                 self.parent_types[Predicate.OBJECT] = None
                 self.types.add(Predicate.OBJECT)
                 self.type_to_obj[Predicate.OBJECT] = set([])
-                for obj, type_list in self.obj_to_type.iteritems():
+                for obj, type_list in self.obj_to_type.items():
                     type_list.add(Predicate.OBJECT)
                     self.type_to_obj[Predicate.OBJECT].add(obj)
 
@@ -341,6 +343,48 @@ class Problem(object):
                 self.obj_to_type[obj].add(k)
                 k = self.parent_types[k]
 
+    def objects_of_type(self, t):
+        """Return the sorted list of objects that can fill a parameter of type t.
+        Objects of every subtype of t are included."""
+
+        if self._type_index is None:
+            # index each object under its type and all of its supertypes
+            self._type_index = {}
+            for obj in self.objects:
+                for obj_type in self.obj_to_type[obj]:
+                    self._type_index.setdefault(obj_type, []).append(obj)
+            for objs in self._type_index.values():
+                objs.sort()
+            self._type_index[Predicate.OBJECT] = sorted(self.objects)
+
+        if t == "object":
+            return self._type_index[Predicate.OBJECT]
+        elif t in self._type_index:
+            return self._type_index[t]
+        elif t in self.types:
+            return []
+        else:
+            # for debugging
+            s = "Found a type in the list of parameters that is not in the type_to_obj dict \n"
+            s += "param_type = %s\n" % str(t)
+            s += "type_to_obj = %s" % str(self.type_to_obj)
+            raise KeyError(s)
+
+    def with_problem(self, problem_file):
+        """
+        Return a new Problem that shares this parsed domain, with problem_file parsed.
+        This problem is left untouched, so a parsed domain can be reused across problems.
+        """
+
+        problem = copy.copy(self)
+        # constants stay in obj_to_type even when no problem file was given
+        problem.objects = set(self.obj_to_type.keys())
+        problem.obj_to_type = {obj: set(types) for obj, types in self.obj_to_type.items()}
+        problem.type_to_obj = {t: set(objs) for t, objs in self.type_to_obj.items()}
+        problem._type_index = None
+        problem._parse_problem(problem_file)
+        return problem
+
     def _parse_problem(self, f_problem):
         """
         Extract information from the problem file.
@@ -480,20 +524,20 @@ class Problem(object):
             i = len(node.children) - 1
 
             if len(node.children) == 2 and len(node.children[0].children) > 0:
-                # adjust this node by changing the structure of the first child
+                # read the variables from a restructured copy of the first child,
+                # leaving the (possibly shared) parse tree untouched
                 new_child = PDDL_Tree(PDDL_Tree.EMPTY)
                 new_child.add_child(PDDL_Tree(node.children[0].name))
 
                 for c in node.children[0].children:
                     new_child.add_child(c)
-                node.children[0] = new_child
                 l = PDDL_Utils.read_type(new_child)
 
+            # quantified variables shadow the outer parameters in a copy of the map
+            parameter_map = dict(parameter_map or {})
             for v, t in l:
                 parameter_map[v] = t
             args = [self.to_formula(c, parameter_map) for c in node.children[i:]]
-            for v, t in l:
-                del(parameter_map[v])
             return Forall(l, args)
 
         i = 0
@@ -0,0 +1,183 @@
+"""
+    Size statistics of a PDDL domain and problem, counted from their tokens
+    without building a parse tree, so that they are cheap enough to compute
+    for every submitted task: plain counts, and upper bounds on the size of
+    the grounded task from the number of objects of each type.
+"""
+
+from preflight import tokenize
+
+# goal expressions that are not atoms
+_CONNECTIVES = set (["and", "or", "not", "imply", "forall", "exists", "when", "preference"])
+_ACTIONS = set ([":action", ":durative-action"])
+
+
+def _sections (text, tokens=None):
+    """
+        Yield (keyword, tokens) for the sections of the (define ...) in text,
+        tokens being those after the keyword. tokens may give the Tokens of
+        the text.
+    """
+
+    if tokens is None:
+        tokens = tokenize (text)
+    depth = 0
+    start = None
+    for i, t in enumerate (tokens):
+        if t == "(":
+            depth += 1
+            if depth == 2:
+                start = i
+        elif t == ")":
+            if depth == 2 and start is not None and start + 1 < i:
+                yield tokens[start + 1], tokens[start + 2:i]
+            depth -= 1
+
+
+def _arity (tokens):
+    """Return the number of parameters in the tokens of an action."""
+
+    if ":parameters" not in tokens:
+        return 0
+    count = 0
+    for t in tokens[tokens.index (":parameters") + 2:]:
+        if t == ")":
+            break
+        if t[0] == "?":
+            count += 1
+    return count
+
+
+def pddl_statistics (domain_text, problem_text, tokens=None):
+    """
+        Return {"actions", "max_arity", "objects", "init_facts", "goals"}:
+        the number of action schemas and the largest number of parameters
+        of the domain, and the number of objects, initial facts and goal
+        atoms of the problem. Sections missing from the text count as 0.
+        tokens may give the (domain, problem) Tokens of the texts.
+    """
+
+    domain_tokens, problem_tokens = tokens or (None, None)
+    stats = {"actions": 0, "max_arity": 0, "objects": 0, "init_facts": 0, "goals": 0}
+    for keyword, tokens in _sections (domain_text, domain_tokens):
+        if keyword in _ACTIONS:
+            stats["actions"] += 1
+            stats["max_arity"] = max (stats["max_arity"], _arity (tokens))
+    for keyword, tokens in _sections (problem_text, problem_tokens):
+        if keyword == ":objects":
+            # names, without the "- type" that follows each group
+            stats["objects"] = len (tokens) - 2 * tokens.count ("-")
+        elif keyword == ":init":
+            depth = 0
+            for t in tokens:
+                if t == "(":
+                    if depth == 0:
+                        stats["init_facts"] += 1
+                    depth += 1
+                elif t == ")":
+                    depth -= 1
+        elif keyword == ":goal":
+            stats["goals"] = len ([i for i, t in enumerate (tokens[:-1]) if t == "(" and tokens[i + 1] not in _CONNECTIVES])
+    return stats
+
+
+def _typed (tokens):
+    """Return [(name, types)] for a typed list; types is ["object"] for untyped names, or the types of an either."""
+
+    items = []
+    names = []
+    i = 0
+    while i < len (tokens):
+        if tokens[i] == "-" and i + 1 < len (tokens):
+            if tokens[i + 1] == "(":
+                end = tokens.index (")", i + 1) if ")" in tokens[i + 1:] else len (tokens)
+                types = [t for t in tokens[i + 2:end] if t != "either"]
+                i = end + 1
+            else:
+                types = [tokens[i + 1]]
+                i += 2
+            items.extend ([(n, types) for n in names])
+            names = []
+        else:
+            if tokens[i] not in ("(", ")"):
+                names.append (tokens[i])
+            i += 1
+    return items + [(n, ["object"]) for n in names]
+
+
+def _groundings (types, counts):
+    """Return the number of objects matching a parameter of the given types."""
+
+    return sum ([counts.get (t, 0) for t in types])
+
+
+def _product (parameters, counts):
+    size = 1
+    for _, types in parameters:
+        size *= _groundings (types, counts)
+    return size
+
+
+def size_bounds (domain_text, problem_text, tokens=None):
+    """
+        Return {"ground_atoms", "ground_actions", "objects_per_type"}: upper
+        bounds on the number of ground atoms (over :predicates) and ground
+        actions of the task, each predicate or action schema counting the
+        product of the number of objects (constants included) of the type of
+        each of its parameters, and the number of objects of each type,
+        subtypes included. tokens may give the (domain, problem) Tokens of
+        the texts.
+    """
+
+    domain_tokens, problem_tokens = tokens or (None, None)
+    parents = {}
+    objects = []
+    predicates = []
+    actions = []
+    for keyword, tokens in _sections (domain_text, domain_tokens):
+        if keyword == ":types":
+            parents.update ([(name, types) for name, types in _typed (tokens)])
+        elif keyword == ":constants":
+            objects.extend (_typed (tokens))
+        elif keyword == ":predicates":
+            depth = 0
+            for t in tokens:
+                if t == "(":
+                    depth += 1
+                    if depth == 1:
+                        current = []
+                        continue
+                elif t == ")":
+                    depth -= 1
+                    if depth == 0:
+                        if current:
+                            predicates.append (_typed (current[1:]))
+                        continue
+                if depth > 0:
+                    current.append (t)
+        elif keyword in _ACTIONS and ":parameters" in tokens:
+            start = tokens.index (":parameters") + 2
+            end = tokens.index (")", start) if ")" in tokens[start:] else len (tokens)
+            actions.append (_typed (tokens[start:end]))
+    for keyword, tokens in _sections (problem_text, problem_tokens):
+        if keyword == ":objects":
+            objects.extend (_typed (tokens))
+
+    counts = {"object": 0}
+    for name, types in dict (objects).items ():
+        # an object counts for its types and all their ancestors
+        seen = set ([])
+        pending = list (types)
+        while pending:
+            t = pending.pop ()
+            if t in seen:
+                continue
+            seen.add (t)
+            pending.extend (parents.get (t, ["object"] if t != "object" else []))
+        for t in seen:
+            counts[t] = counts.get (t, 0) + 1
+    return {
+        "ground_atoms": sum ([_product (p, counts) for p in predicates]),
+        "ground_actions": sum ([_product (a, counts) for a in actions]),
+        "objects_per_type": counts,
+    }
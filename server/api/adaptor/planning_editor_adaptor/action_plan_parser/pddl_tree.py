@@ -24,10 +24,12 @@ class PDDL_Tree (object):
     TAB = " " * 4
     EMPTY = "<empty>"
 
+    __slots__ = ("name", "children")
+
     def __init__ (self, name):
         """Create a new tree node with given name."""
 
-        self.name = name
+        self.name = sys.intern (name)
         self.children = []
         
     def __getitem__ (self, k):
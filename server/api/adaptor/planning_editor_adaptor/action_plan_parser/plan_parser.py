@@ -0,0 +1,90 @@
+import re
+import sys
+
+# One pass over the plan text: every match is either a comment line (which may
+# carry the plan cost) or a step, optionally with a timestamp and a duration.
+_PLAN_RE = re.compile (r"""
+      ;(?P<comment>[^\n]*)
+    | (?:(?P<time>[-+]?\d+(?:\.\d*)?)[ \t]*:[ \t]*)?
+      \((?P<body>[^()]*)\)
+      (?:[ \t]*\[(?P<duration>[-+]?\d+(?:\.\d*)?)\])?
+""", re.X)
+
+_COST_RE = re.compile (r"\s*cost\s*[=:]\s*([-+]?\d+(?:\.\d*)?)")
+
+
+class PlanStep (object):
+    """
+        A single step of a plan.
+
+        Attributes:
+            name: the action name (string)
+
+            args: tuple of object names (strings)
+
+            time: start time of the step (float), or None for sequential plans
+
+            duration: duration of the step (float), or None if not given
+
+            text: the step as written in the plan, e.g. "(stack b a)"
+    """
+
+    __slots__ = ("name", "args", "time", "duration", "text")
+
+    def __init__ (self, name, args, time=None, duration=None, text=None):
+        self.name = name
+        self.args = args
+        self.time = time
+        self.duration = duration
+        self.text = text
+
+    def __str__ (self):
+        s = self.text
+        if self.time is not None:
+            s = "%s: %s" % (self.time, s)
+        if self.duration is not None:
+            s = "%s [%s]" % (s, self.duration)
+        return s
+
+    def __repr__ (self):
+        return "PlanStep " + str (self)
+
+
+class Plan (object):
+    """
+        Streaming reader for the plan text written by a planner.
+
+        Handles classical plans "(a x y)", plans with a "; cost = n" or
+        "; cost: n" comment, and timestamped temporal/numeric plans such as
+        "0.000: (a x y) [1.000]".
+        Iterating yields PlanStep objects lazily, so large plans are never split
+        into intermediate lists. The cost comment is picked up on the same pass.
+
+        Attributes:
+            cost: the plan cost (float) once its comment has been read, or None
+    """
+
+    def __init__ (self, text):
+        self.text = text
+        self.cost = None
+
+    def __iter__ (self):
+        for m in _PLAN_RE.finditer (self.text):
+            body = m.group ("body")
+            if body is None:
+                cost = _COST_RE.match (m.group ("comment"))
+                if cost is not None:
+                    self.cost = float (cost.group (1))
+                continue
+
+            elements = body.split ()
+            if len (elements) == 0:
+                continue
+
+            time = m.group ("time")
+            duration = m.group ("duration")
+            yield PlanStep (sys.intern (elements[0]),
+                            tuple (elements[1:]),
+                            None if time is None else float (time),
+                            None if duration is None else float (duration),
+                            "(%s)" % " ".join (elements))
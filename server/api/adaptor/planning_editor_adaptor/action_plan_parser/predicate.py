@@ -1,4 +1,16 @@
-import re
+import sys
+
+
+def intern_args (args):
+    """Return the (name, type) pairs in args as a tuple of interned string pairs.
+
+    Grounded problems hold many copies of the same object and type names, so
+    interning them lets every fluent share a single string object per symbol."""
+
+    if args is None:
+        return None
+    return tuple ((sys.intern (v), sys.intern (t)) for v, t in args)
+
 
 class Predicate (object):
     """
@@ -7,11 +19,11 @@ class Predicate (object):
         Attributes:
             name: the predicate name (string)
 
-            args: list of tuples that contain a pair of strings
+            args: tuple of tuples that contain a pair of interned strings
                 * the first is the variable name
                 * the second is the variable type
 
-            ground_args:    List of tuples that contain a pair of strings.
+            ground_args:    Tuple of tuples that contain a pair of interned strings.
                             The first is the object name and the second is the variable type.
 
         Methods:
@@ -27,6 +39,8 @@ class Predicate (object):
 
     OBJECT = "default_object"
 
+    __slots__ = ("name", "args", "ground_args", "_hash")
+
     def __init__ (self, name, args, ground_args=None):
         """
             Create a new predicate.
@@ -44,14 +58,25 @@ class Predicate (object):
         "Either this Predicate is ground or it is not"
 
         if ground_args is None:
-            assert isinstance (args, list) and all([isinstance(arg, tuple) for arg in args]), \
+            assert isinstance (args, (list, tuple)) and all([isinstance(arg, tuple) for arg in args]), \
             "args must be a list of tuples"
         else:
-            assert isinstance (ground_args, list), "ground_args must be a list"
+            assert isinstance (ground_args, (list, tuple)), "ground_args must be a list"
 
-        self.name = name
-        self.args = args
-        self.ground_args = ground_args
+        set_attr = object.__setattr__
+        set_attr (self, "name", sys.intern (name))
+        set_attr (self, "args", intern_args (args))
+        set_attr (self, "ground_args", intern_args (ground_args))
+        set_attr (self, "_hash", None)
+
+    def __setattr__ (self, attr, value):
+        raise AttributeError ("Predicate is immutable, cannot set %s" % attr)
+
+    def __delattr__ (self, attr):
+        raise AttributeError ("Predicate is immutable, cannot delete %s" % attr)
+
+    def __reduce__ (self):
+        return (Predicate, (self.name, self.args, self.ground_args))
 
     def _hash_string (self):
         """Return the string used for hashing."""
@@ -67,9 +92,12 @@ class Predicate (object):
 
     def __hash__(self):
         """Hash function, to compare two fluents.
-        Equal when names and arguments are equal."""
+        Equal when names and arguments are equal.
+        The hash is computed once and cached, as predicates are immutable."""
 
-        return hash (self._hash_string ())
+        if self._hash is None:
+            object.__setattr__ (self, "_hash", hash (self._hash_string ()))
+        return self._hash
 
     def __eq__ (self, p):
         return self.is_equal (p)
@@ -77,8 +105,8 @@ class Predicate (object):
     def __ne__ (self, p):
         return not (self == p)
 
-    def __cmp__ (self, p):
-        return cmp(self._hash_string(), p._hash_string())
+    def __lt__ (self, p):
+        return self._hash_string () < p._hash_string ()
 
     def is_equal (self, p):
         """Return True iff two predicates are equal."""
@@ -112,16 +140,11 @@ class Predicate (object):
         if len (l) > 0:
             sep = " "
 
+        # substitute whole arguments only, so ?x never rewrites part of ?xy
         if not untyped and len (l) > 0 and l [0][1] != Predicate.OBJECT:
-            arg_s = " ".join (["%s - %s" % (v, t) for v, t in l])
+            arg_s = " ".join (["%s - %s" % (grounding.get (v, v), t) for v, t in l])
         else:
-            arg_s = " ".join ([v for v, t in l])
-
-        # Create a regex pattern that matches the keys exactly
-        pattern = '|'.join(re.escape(key) for key in sorted(grounding.keys(), key=len, reverse=True))
-
-        # Use re.sub() to replace all matched keys to their corresponding value
-        arg_s = re.sub(pattern, lambda match: grounding[match.group(0)], arg_s)
+            arg_s = " ".join ([grounding.get (v, v) for v, t in l])
 
         return (sp * lvl) + "(%s%s%s)" % (self.name, sep, arg_s)
 
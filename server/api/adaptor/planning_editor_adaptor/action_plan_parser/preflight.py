@@ -0,0 +1,459 @@
+"""
+    Cheap structural checks of PDDL text, run before a job is queued.
+
+    The text is tokenized once (see tokenize, whose tokens the canonical form
+    and the size statistics reuse) into nested lists that remember where they
+    start, then checked for balanced parentheses, the domain name used by the
+    problem, declared types, and the names and arities of predicates and
+    functions. The checks stop (and accept the input) when the time budget
+    runs out.
+"""
+
+import bisect
+import re
+import time
+
+_TOKEN_RE = re.compile (r";[^\n]*|[()]|[^\s();]+")
+_NUMBER_RE = re.compile (r"[-+]?\d+(\.\d*)?$")
+
+# heads that are not predicates
+_CONNECTIVES = set (["and", "or", "not", "imply", "when"])
+_QUANTIFIERS = set (["forall", "exists"])
+_NUMERIC = set (["=", "<", ">", "<=", ">=", "+", "-", "*", "/", "increase", "decrease",
+                 "assign", "scale-up", "scale-down"])
+_TIME_SPECIFIERS = set (["start", "end", "all"])
+
+_DOMAIN_SECTIONS = set ([":requirements", ":types", ":constants", ":predicates", ":functions", ":action",
+                         ":durative-action", ":derived", ":constraints"])
+_PROBLEM_SECTIONS = set ([":domain", ":requirements", ":objects", ":init", ":goal", ":metric", ":constraints",
+                          ":length"])
+
+# errors reported per file at most
+_MAX_ERRORS = 20
+
+
+class Tokens (list):
+    """
+        The tokens of a PDDL text, lowercased and without comments. offsets
+        holds the offset of each token in the text, or is None for tokens that
+        are not read from a text (e.g. those of a canonical form).
+    """
+
+    __slots__ = ("offsets",)
+
+
+def tokenize (text):
+    """Return the Tokens of a PDDL text."""
+
+    tokens = Tokens ()
+    offsets = []
+    for m in _TOKEN_RE.finditer (text):
+        token = m.group (0)
+        if token[0] != ";":
+            tokens.append (token.lower ())
+            offsets.append (m.start ())
+    tokens.offsets = offsets
+    return tokens
+
+
+class _List (list):
+    """A parenthesized expression, with the offset of its opening parenthesis."""
+
+    __slots__ = ("offset",)
+
+
+class _OutOfTime (Exception):
+    pass
+
+
+class _Checker (object):
+    """Collects errors for one PDDL text and enforces the shared deadline."""
+
+    def __init__ (self, text, name, deadline, tokens=None):
+        self.text = text
+        self.tokens = tokens
+        self.name = name
+        self.deadline = deadline
+        self.errors = []
+        self._newlines = None
+        self._seen = set ([])
+
+    def tick (self):
+        if time.monotonic () > self.deadline:
+            raise _OutOfTime ()
+
+    def error (self, offset, message):
+        if self._newlines is None:
+            self._newlines = [m.start () for m in re.finditer ("\n", self.text)]
+        error = (offset, message)
+        if len (self.errors) >= _MAX_ERRORS or error in self._seen:
+            return
+        self._seen.add (error)
+        line = bisect.bisect_left (self._newlines, offset)
+        column = offset - (self._newlines[line - 1] + 1 if line > 0 else 0)
+        self.errors.append ({"file": self.name, "line": line + 1, "column": column + 1, "message": message})
+
+    def locate (self, offset, token):
+        """Return the offset of the first occurrence of token at or after offset."""
+
+        m = re.compile (r"(?<![^\s()])%s(?![^\s()])" % re.escape (token), re.I).search (self.text, offset)
+        return offset if m is None else m.start ()
+
+    def read (self):
+        """Return the top-level expressions of the text, or None if parentheses are unbalanced."""
+
+        if self.tokens is None:
+            self.tokens = tokenize (self.text)
+        root = _List ()
+        root.offset = 0
+        stack = [root]
+        for n, (token, offset) in enumerate (zip (self.tokens, self.tokens.offsets)):
+            if n & 0xfff == 0:
+                self.tick ()
+            if token == "(":
+                node = _List ()
+                node.offset = offset
+                stack[-1].append (node)
+                stack.append (node)
+            elif token == ")":
+                if len (stack) == 1:
+                    self.error (offset, "unexpected ')' with no matching '('")
+                    return None
+                stack.pop ()
+            else:
+                stack[-1].append (token)
+
+        if len (stack) > 1:
+            self.error (stack[-1].offset, "'(' is never closed")
+            return None
+        return root
+
+    def define (self, root, kind):
+        """Return the (define (kind name) ...) expression and its name."""
+
+        if len (root) != 1 or not isinstance (root[0], _List) or len (root[0]) == 0 or root[0][0] != "define":
+            self.error (root[0].offset if len (root) > 0 and isinstance (root[0], _List) else 0,
+                        "expected a single (define ...) expression")
+            return None, None
+        define = root[0]
+        if len (define) < 2 or not isinstance (define[1], _List) or len (define[1]) != 2 or define[1][0] != kind:
+            self.error (define.offset, "expected (%s <name>) after define" % kind)
+            return None, None
+        return define, define[1][1]
+
+    def typed_list (self, node, types, start=0):
+        """Return the names in a typed list (node[start:]), reporting undeclared types."""
+
+        names = []
+        i = start
+        while i < len (node):
+            item = node[i]
+            if item == "-":
+                if i + 1 >= len (node):
+                    self.error (node.offset, "'-' without a type")
+                    break
+                t = node[i + 1]
+                for tt in (t[1:] if isinstance (t, _List) and len (t) > 0 and t[0] == "either" else [t]):
+                    if types is not None and tt not in types:
+                        self.error (self.locate (node.offset, str (tt)), "undeclared type %s" % str (tt))
+                i += 2
+            elif isinstance (item, _List):
+                self.error (item.offset, "unexpected expression in a typed list")
+                i += 1
+            else:
+                names.append (item)
+                i += 1
+        return names
+
+    def formula (self, node, domain):
+        """Check that every atom in a formula uses a declared predicate or function with its arity."""
+
+        if not isinstance (node, _List) or len (node) == 0:
+            return
+        head = node[0]
+        if isinstance (head, _List):
+            self.error (node.offset, "expected a predicate or connective")
+        elif head in _CONNECTIVES:
+            for c in node[1:]:
+                self.formula (c, domain)
+        elif head in _QUANTIFIERS:
+            if len (node) != 3 or not isinstance (node[1], _List):
+                self.error (node.offset, "%s expects a variable list and a formula" % head)
+            else:
+                self.typed_list (node[1], domain["types"])
+                self.formula (node[2], domain)
+        elif head == "preference":
+            self.formula (node[-1], domain)
+        elif head in ("at", "over") and len (node) == 3 and node[1] in _TIME_SPECIFIERS:
+            self.formula (node[2], domain)
+        elif head == "at" and len (node) == 3 and isinstance (node[2], _List) and not isinstance (node[1], _List):
+            # timed initial literal
+            self.formula (node[2], domain)
+        elif head in _NUMERIC:
+            pass
+        else:
+            arity = domain["predicates"].get (head, domain["functions"].get (head))
+            if arity is None:
+                self.error (node.offset, "undeclared predicate %s" % head)
+            elif arity != len (node) - 1:
+                self.error (node.offset, "%s expects %d arguments, got %d" % (head, arity, len (node) - 1))
+
+
+def _sections (define):
+    """Yield (keyword, expression) for the sections of a define."""
+
+    for section in define[2:]:
+        if isinstance (section, _List) and len (section) > 0 and not isinstance (section[0], _List):
+            yield section[0], section
+
+
+def _check_domain (checker):
+    root = checker.read ()
+    if root is None:
+        return None
+    define, name = checker.define (root, "domain")
+    if define is None:
+        return None
+
+    domain = {"name": name, "types": set (["object"]), "predicates": {}, "functions": {}}
+    sections = list (_sections (define))
+
+    # types first, as everything else refers to them
+    for keyword, section in sections:
+        if keyword == ":types":
+            for item in section[1:]:
+                if isinstance (item, _List):
+                    domain["types"].update ([t for t in item[1:] if not isinstance (t, _List)])
+                elif item != "-":
+                    domain["types"].add (item)
+
+    for keyword, section in sections:
+        checker.tick ()
+        if keyword not in _DOMAIN_SECTIONS:
+            checker.error (section.offset, "unknown domain section %s" % keyword)
+        elif keyword == ":constants":
+            checker.typed_list (section, domain["types"], 1)
+        elif keyword in (":predicates", ":functions"):
+            table = domain["predicates"] if keyword == ":predicates" else domain["functions"]
+            for p in section[1:]:
+                if not isinstance (p, _List) or len (p) == 0 or isinstance (p[0], _List):
+                    if p != "-" and not (isinstance (p, str) and p in domain["types"] | set (["number"])):
+                        checker.error (getattr (p, "offset", section.offset), "malformed declaration in %s" % keyword)
+                    continue
+                table[p[0]] = len (checker.typed_list (p, domain["types"], 1))
+
+    for keyword, section in sections:
+        if keyword in (":action", ":durative-action"):
+            checker.tick ()
+            if len (section) < 2 or isinstance (section[1], _List):
+                checker.error (section.offset, "%s without a name" % keyword)
+                continue
+            fields = section[2:]
+            for i in range (0, len (fields) - 1, 2):
+                field, value = fields[i], fields[i + 1]
+                if field == ":parameters" and isinstance (value, _List):
+                    checker.typed_list (value, domain["types"])
+                elif field in (":precondition", ":effect", ":condition"):
+                    checker.formula (value, domain)
+    return domain
+
+
+def _check_problem (checker, domain):
+    root = checker.read ()
+    if root is None:
+        return
+    define, _ = checker.define (root, "problem")
+    if define is None:
+        return
+
+    found = set ([])
+    for keyword, section in _sections (define):
+        checker.tick ()
+        found.add (keyword)
+        if keyword not in _PROBLEM_SECTIONS:
+            checker.error (section.offset, "unknown problem section %s" % keyword)
+        elif keyword == ":domain":
+            if domain is not None and (len (section) != 2 or section[1] != domain["name"]):
+                checker.error (section.offset, "problem is for domain %s, but the domain is %s" %
+                               (" ".join ([str (s) for s in section[1:]]), domain["name"]))
+        elif domain is None:
+            continue
+        elif keyword == ":objects":
+            checker.typed_list (section, domain["types"], 1)
+        elif keyword == ":init":
+            for fact in section[1:]:
+                checker.formula (fact, domain)
+        elif keyword == ":goal":
+            for goal in section[1:]:
+                checker.formula (goal, domain)
+
+    for keyword in (":domain", ":init", ":goal"):
+        if keyword not in found:
+            checker.error (define.offset, "problem has no %s section" % keyword)
+
+
+# what each :requirements flag asks of a planner
+_REQUIREMENT_FEATURES = {
+    ":typing": ["typing"],
+    ":negative-preconditions": ["negative-preconditions"],
+    ":disjunctive-preconditions": ["disjunctive-preconditions"],
+    ":equality": ["equality"],
+    ":existential-preconditions": ["quantified-preconditions"],
+    ":universal-preconditions": ["quantified-preconditions"],
+    ":quantified-preconditions": ["quantified-preconditions"],
+    ":conditional-effects": ["conditional-effects"],
+    ":adl": ["typing", "negative-preconditions", "disjunctive-preconditions", "equality",
+             "quantified-preconditions", "conditional-effects"],
+    ":derived-predicates": ["derived-predicates"],
+    ":action-costs": ["action-costs"],
+    ":fluents": ["numeric-fluents"],
+    ":numeric-fluents": ["numeric-fluents"],
+    ":durative-actions": ["durative-actions"],
+    ":duration-inequalities": ["durative-actions"],
+    ":continuous-effects": ["durative-actions", "numeric-fluents"],
+    ":timed-initial-literals": ["timed-initial-literals"],
+    ":preferences": ["preferences"],
+    ":constraints": ["preferences"],
+}
+
+
+def _formula_features (node, found, effect=False):
+    """Add the features used by a precondition (or effect) formula to found."""
+
+    if not isinstance (node, _List) or len (node) == 0 or isinstance (node[0], _List):
+        return
+    head = node[0]
+    if head in ("at", "over") and len (node) == 3 and node[1] in _TIME_SPECIFIERS:
+        _formula_features (node[2], found, effect)
+    elif head == "when":
+        found.add ("conditional-effects")
+        for c in node[1:]:
+            _formula_features (c, found, effect)
+    elif head == "preference":
+        found.add ("preferences")
+        _formula_features (node[-1], found, effect)
+    elif head in _QUANTIFIERS:
+        found.add ("conditional-effects" if effect else "quantified-preconditions")
+        _formula_features (node[-1], found, effect)
+    elif head == "not":
+        if not effect:
+            found.add ("negative-preconditions")
+        for c in node[1:]:
+            _formula_features (c, found, effect)
+    elif head in ("or", "imply"):
+        found.add ("disjunctive-preconditions")
+        for c in node[1:]:
+            _formula_features (c, found, effect)
+    elif head == "and":
+        for c in node[1:]:
+            _formula_features (c, found, effect)
+    elif head in ("increase", "decrease") and len (node) == 3 and isinstance (node[1], _List) \
+            and node[1][:1] == ["total-cost"]:
+        found.add ("action-costs")
+    elif head == "=" and not any ([isinstance (a, _List) for a in node[1:]]):
+        found.add ("equality")
+    elif head in _NUMERIC:
+        found.add ("numeric-fluents")
+
+
+def features (domain_text, problem_text=None, tokens=None):
+    """
+        Return the sorted list of planner features a domain and problem need:
+        those its :requirements declare, plus those its actions actually use
+        (durative actions, numeric fluents, action costs, preferences,
+        conditional effects, negative, disjunctive and quantified preconditions,
+        derived predicates, timed initial literals). Unparsable text yields [].
+        tokens may give the (domain, problem) Tokens of the texts.
+    """
+
+    found = set ([])
+    for text, kind, text_tokens in zip ((domain_text, problem_text), ("domain", "problem"), tokens or (None, None)):
+        if text is None:
+            continue
+        checker = _Checker (text, kind, float ("inf"), text_tokens)
+        root = checker.read ()
+        if root is None:
+            continue
+        define, _ = checker.define (root, kind)
+        if define is None:
+            continue
+        for keyword, section in _sections (define):
+            if keyword == ":requirements":
+                for r in section[1:]:
+                    found.update (_REQUIREMENT_FEATURES.get (r, []))
+            elif keyword == ":functions":
+                names = [f[0] for f in section[1:] if isinstance (f, _List) and len (f) > 0]
+                if any ([n != "total-cost" for n in names]):
+                    found.add ("numeric-fluents")
+            elif keyword == ":durative-action":
+                found.add ("durative-actions")
+            elif keyword == ":derived":
+                found.add ("derived-predicates")
+            elif keyword == ":constraints":
+                found.add ("preferences")
+            elif keyword == ":types":
+                found.add ("typing")
+            elif keyword == ":init":
+                for fact in section[1:]:
+                    if isinstance (fact, _List) and len (fact) == 3 and fact[0] == "at" and \
+                            isinstance (fact[2], _List) and _NUMBER_RE.match (str (fact[1])):
+                        found.add ("timed-initial-literals")
+            elif keyword == ":goal":
+                for goal in section[1:]:
+                    _formula_features (goal, found)
+            elif keyword == ":metric":
+                if section[2:] != [["total-cost"]]:
+                    found.add ("numeric-fluents")
+            if keyword in (":action", ":durative-action"):
+                fields = section[2:]
+                for i in range (0, len (fields) - 1, 2):
+                    if fields[i] in (":precondition", ":condition"):
+                        _formula_features (fields[i + 1], found)
+                    elif fields[i] == ":effect":
+                        _formula_features (fields[i + 1], found, effect=True)
+    return sorted (found)
+
+
+def preflight (domain_text, problem_text=None, time_budget=0.2, tokens=None):
+    """
+        Structurally check a domain and (optionally) a problem.
+
+        Inputs:
+            domain_text:    the domain PDDL
+
+            problem_text:   the problem PDDL, or None
+
+            time_budget:    seconds to spend at most; checks that do not finish
+                            in time are skipped, never reported as errors
+
+            tokens:         the (domain, problem) Tokens of the texts, if they
+                            have been tokenized already
+
+        Returns:
+            list of errors, each a dictionary with "file" ("domain" or
+            "problem"), "line", "column" (both 1-based) and "message"
+    """
+
+    deadline = time.monotonic () + time_budget
+    errors = []
+    domain = None
+    domain_tokens, problem_tokens = tokens or (None, None)
+
+    checker = _Checker (domain_text, "domain", deadline, domain_tokens)
+    try:
+        domain = _check_domain (checker)
+    except _OutOfTime:
+        return checker.errors
+    errors.extend (checker.errors)
+    if len (errors) > 0:
+        domain = None
+
+    if problem_text is not None:
+        checker = _Checker (problem_text, "problem", deadline, problem_tokens)
+        try:
+            _check_problem (checker, domain)
+        except _OutOfTime:
+            pass
+        errors.extend (checker.errors)
+
+    return errors
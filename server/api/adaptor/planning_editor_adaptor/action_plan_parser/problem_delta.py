@@ -0,0 +1,123 @@
+"""
+    Edit the initial state and goal of a PDDL problem text.
+
+    Facts are matched by their tokens (case, comments and whitespace are
+    ignored), and only the :init and :goal sections are rewritten, so the rest
+    of the problem keeps its original text.
+"""
+
+from preflight import _TOKEN_RE
+
+
+def _tokens (text):
+    return tuple ([t.lower () for t in _TOKEN_RE.findall (text) if t[0] != ";"])
+
+
+def _children (text, start, end):
+    """Return the (start, end) spans of the expressions directly inside text[start:end]."""
+
+    spans = []
+    depth = 0
+    for m in _TOKEN_RE.finditer (text, start + 1, end - 1):
+        token = m.group (0)
+        if token == "(":
+            if depth == 0:
+                begin = m.start ()
+            depth += 1
+        elif token == ")":
+            depth -= 1
+            if depth == 0:
+                spans.append ((begin, m.end ()))
+    return spans
+
+
+def _sections (text):
+    """Return {keyword: (start, end)} for the sections of the (define ...) in text."""
+
+    spans = {}
+    depth = 0
+    keyword = None
+    for m in _TOKEN_RE.finditer (text):
+        token = m.group (0)
+        if token == "(":
+            depth += 1
+            if depth == 2:
+                begin = m.start ()
+                keyword = None
+        elif token == ")":
+            if depth == 2 and keyword is not None:
+                spans[keyword] = (begin, m.end ())
+            depth -= 1
+            if depth < 0:
+                raise ValueError ("unbalanced parentheses in the problem")
+        elif token[0] != ";" and depth == 2 and keyword is None:
+            keyword = token.lower ()
+    if depth != 0:
+        raise ValueError ("unbalanced parentheses in the problem")
+    return spans
+
+
+def _fact (text):
+    tokens = _tokens (text)
+    if len (tokens) < 3 or tokens[0] != "(" or tokens[-1] != ")":
+        raise ValueError ("expected a parenthesized fact, got %r" % text)
+    return tokens
+
+
+def _edit (items, add, remove):
+    """Return items (texts) without those matching remove, followed by add; raises ValueError on a missing item."""
+
+    removed = set ([_fact (f) for f in remove])
+    present = set ([_tokens (i) for i in items])
+    for f in remove:
+        if _fact (f) not in present:
+            raise ValueError ("%s is not in the problem" % f.strip ())
+    kept = [i for i in items if _tokens (i) not in removed]
+    known = set ([_tokens (i) for i in kept])
+    for f in add:
+        if _fact (f) not in known:
+            known.add (_fact (f))
+            kept.append (f.strip ())
+    return kept
+
+
+def apply_delta (problem_text, add_init=(), remove_init=(), goal=None, add_goals=(), remove_goals=()):
+    """
+        Return the problem text with facts added to and removed from :init,
+        and the goal replaced (goal, a formula) or edited (add_goals and
+        remove_goals, applied to the conjuncts of the goal).
+
+        Raises ValueError if the problem has no :init or :goal, or if a fact
+        to remove is not there.
+    """
+
+    spans = _sections (problem_text)
+    if ":init" not in spans or ":goal" not in spans:
+        raise ValueError ("the problem has no :init or :goal section")
+    edits = []
+
+    if add_init or remove_init:
+        start, end = spans[":init"]
+        items = [problem_text[s:e] for s, e in _children (problem_text, start, end)]
+        facts = _edit (items, add_init, remove_init)
+        edits.append ((start, end, "(:init\n    %s\n  )" % "\n    ".join (facts)))
+
+    if goal is not None or add_goals or remove_goals:
+        start, end = spans[":goal"]
+        if goal is None:
+            formula = _children (problem_text, start, end)
+            if len (formula) != 1:
+                raise ValueError ("expected a single goal formula")
+            s, e = formula[0]
+            conjuncts = _children (problem_text, s, e)
+            if _tokens (problem_text[s:e])[1] == "and":
+                items = [problem_text[cs:ce] for cs, ce in conjuncts]
+            else:
+                items = [problem_text[s:e]]
+            goal = "(and %s)" % " ".join (_edit (items, add_goals, remove_goals))
+        edits.append ((start, end, "(:goal %s)" % goal.strip ()))
+
+    # splice from the end so that earlier spans stay valid
+    for start, end, replacement in sorted (edits, reverse=True):
+        problem_text = problem_text[:start] + replacement + problem_text[end:]
+    return problem_text
@@ -0,0 +1,161 @@
+import numpy as np
+
+from grounder import GroundProblem
+from preflight import features
+from strips_task import StripsTask
+
+# planner features (see preflight.features) the grounder does not model; the
+# relaxation of such a problem could wrongly prove it unsolvable
+UNSUPPORTED_FEATURES = frozenset (["derived-predicates", "durative-actions", "numeric-fluents",
+                                   "conditional-effects", "equality", "preferences",
+                                   "timed-initial-literals"])
+
+
+def _row_sums (indptr, values):
+    """Sum values over the rows of a CSR matrix, as differences of a running sum."""
+
+    running = np.zeros (len (values) + 1)
+    np.cumsum (values, out=running[1:])
+    return running[indptr[1:]] - running[indptr[:-1]]
+
+
+class RelaxedPlanningGraph (object):
+    """
+        Delete-relaxation analysis of a grounded problem.
+
+        Runs on the relaxed StripsTask of the problem: operators are reduced to
+        their positive precondition atoms and every atom they may add; negative
+        and disjunctive conditions and effect conditions are dropped. That
+        over-approximates what is reachable, so a goal atom that is not
+        relaxed-reachable proves the problem unsolvable.
+
+        Costs are unit costs. h_add is the fixpoint of the operator and fact
+        cost equations, each round updating every operator and fact at once on
+        the CSR arrays, and h_FF is the size of the relaxed plan extracted from
+        the best (h_add) supporters of the goal atoms.
+
+        Attributes:
+            task:       the relaxed StripsTask
+
+            cost:       float array of the h_add cost of every fluent id
+                        (inf when unreachable)
+
+            op_cost:    float array of the cost of every operator id
+                        (inf when unreachable)
+
+            supporter:  dictionary mapping reachable fluent ids (not in the
+                        initial state) to their best achieving operator id
+
+        Methods:
+            unreachable_goals:  goal atoms that are not relaxed-reachable
+            h_add, h_ff:        heuristic estimates of the initial state
+            summary:            dictionary of the above, for reporting
+    """
+
+    def __init__ (self, problem):
+        """
+            Inputs:
+                problem:    GroundProblem (grounded with its default
+                            reachability pruning)
+        """
+
+        self.task = StripsTask.from_ground_problem (problem, relaxed=True)
+        self._sweep ()
+
+    def _sweep (self):
+        task = self.task
+        add_ops = np.repeat (np.arange (len (task.operators)), np.diff (task.add_indptr))
+        cost = np.full (len (task.fluents), np.inf)
+        cost[task.unpack (task.init)] = 0
+
+        while True:
+            pre_cost = cost[task.pre_indices]
+            reached = np.isfinite (pre_cost)
+            satisfied = _row_sums (task.pre_indptr, reached) == task.pre_counts
+            op_cost = np.where (satisfied, 1 + _row_sums (task.pre_indptr, np.where (reached, pre_cost, 0)), np.inf)
+            updated = cost.copy ()
+            np.minimum.at (updated, task.add_indices, op_cost[add_ops])
+            if (updated == cost).all ():
+                break
+            cost = updated
+
+        self.cost = cost
+        self.op_cost = op_cost
+
+        # the lowest-numbered operator whose cost equals the cost of the fact it adds
+        best = np.flatnonzero (op_cost[add_ops] == cost[task.add_indices])
+        best = best[np.lexsort ((add_ops[best], task.add_indices[best]))]
+        facts, first = np.unique (task.add_indices[best], return_index=True)
+        self.supporter = dict (zip (facts.tolist (), add_ops[best[first]].tolist ()))
+
+    def unreachable_goals (self):
+        return [self.task.fluents[g] for g in self.task.goal if not np.isfinite (self.cost[g])]
+
+    def h_add (self):
+        """Sum of the goal atom costs, or None if a goal atom is unreachable."""
+
+        if self.unreachable_goals ():
+            return None
+        return int (self.cost[self.task.goal].sum ())
+
+    def relaxed_plan (self):
+        """Return the operator names of a relaxed plan, or None if a goal atom is unreachable."""
+
+        if self.unreachable_goals ():
+            return None
+        task = self.task
+        plan = set ([])
+        stack = task.goal.tolist ()
+        seen = set (stack)
+        while stack:
+            f = stack.pop ()
+            i = self.supporter.get (f)
+            if i is None or i in plan:
+                continue
+            plan.add (i)
+            for p in task.pre_indices[task.pre_indptr[i]:task.pre_indptr[i + 1]].tolist ():
+                if p not in seen:
+                    seen.add (p)
+                    stack.append (p)
+        return [task.operators[i] for i in sorted (plan)]
+
+    def h_ff (self):
+        plan = self.relaxed_plan ()
+        return None if plan is None else len (plan)
+
+    def summary (self):
+        """
+            Returns:
+                dictionary with "solvable" (False when a goal atom is
+                relaxed-unreachable, None when unknown), "unreachable_goals",
+                "h_add", "h_ff", "facts" and "operators" (reachable counts)
+        """
+
+        unreachable = self.unreachable_goals ()
+        return {
+            "solvable": False if unreachable else None,
+            "unreachable_goals": ["(%s)" % " ".join ((name,) + args) for name, args in unreachable],
+            "h_add": self.h_add (),
+            "h_ff": self.h_ff (),
+            "facts": int (np.isfinite (self.cost).sum ()),
+            "operators": int (np.isfinite (self.op_cost).sum ()),
+        }
+
+
+def relaxed_precheck (domain_text, problem_text):
+    """
+        Ground a problem and return the RelaxedPlanningGraph summary, or None
+        if the problem is outside what the parser and grounder handle: its
+        requirements or the constructs it uses include one of
+        UNSUPPORTED_FEATURES (derived predicates, durative actions, numeric
+        fluents and comparisons, conditional effects, equality, ...), or it
+        fails to parse.
+    """
+
+    if UNSUPPORTED_FEATURES.intersection (features (domain_text, problem_text)):
+        return None
+    try:
+        problem = GroundProblem (domain_text, problem_text)
+        return RelaxedPlanningGraph (problem).summary ()
+    except Exception:
+        return None
@@ -0,0 +1,233 @@
+import numpy as np
+
+from formula import And, Not, When, Primitive
+
+
+def fact_key (predicate):
+    """Return the (name, args) tuple identifying a ground predicate."""
+
+    args = predicate.ground_args if predicate.args is None else predicate.args
+    return (predicate.name, tuple ([v for v, _ in args]))
+
+
+def positive_atoms (formula):
+    """Return the predicates of the positive atoms in the top-level conjunction
+    of formula, leaving out equality."""
+
+    if formula is None:
+        return []
+    parts = formula.args if isinstance (formula, And) else (formula,)
+    return [p.predicate for p in parts if isinstance (p, Primitive) and p.predicate.name != "="]
+
+
+def added_atoms (formula):
+    """Return the predicates of every atom a ground effect may add, ignoring
+    effect conditions."""
+
+    if formula is None or isinstance (formula, Not):
+        return []
+    elif isinstance (formula, Primitive):
+        return [formula.predicate]
+    elif isinstance (formula, When):
+        return added_atoms (formula.result)
+    else:
+        return [p for arg in formula.args for p in added_atoms (arg)]
+
+
+def _csr_gather (indptr, indices, rows):
+    """Return (row_positions, columns) of the entries in the given CSR rows.
+    row_positions index into rows, so each selected row can be repeated."""
+
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    total = int (counts.sum ())
+    row_positions = np.repeat (np.arange (len (rows)), counts)
+    offsets = np.arange (total) - np.repeat (np.cumsum (counts) - counts, counts)
+    return row_positions, indices[np.repeat (starts, counts) + offsets]
+
+
+class StripsTask (object):
+    """
+        Compact numeric form of a grounded STRIPS problem.
+
+        Fluents are numbered 0..n-1. Operator preconditions, add lists and
+        delete lists are CSR arrays (an indptr array of length n_operators + 1
+        and an indices array of fluent ids). States are packed bit arrays of
+        n_bytes uint8 values; a batch of states is a (k, n_bytes) array.
+
+        Attributes:
+            fluents:        list of (name, args) tuples, indexed by fluent id
+
+            fluent_ids:     dictionary mapping (name, args) tuples to fluent ids
+
+            operators:      list of operator names, indexed by operator id
+
+            pre_indptr, pre_indices:    preconditions in CSR form
+            add_indptr, add_indices:    add effects in CSR form
+            del_indptr, del_indices:    delete effects in CSR form
+
+            init:           the initial state (packed)
+
+            goal:           int32 array of the fluent ids of the goal
+
+        Methods:
+            from_ground_problem:    build a task from a GroundProblem
+            pack, unpack:           convert between boolean and packed states
+            applicable:             applicability of every operator in every state
+            successors:             apply operators to states
+            is_goal:                goal test for a batch of states
+    """
+
+    def __init__ (self, fluents, operators, pre, add, delete, init, goal):
+        """
+            Inputs:
+                fluents:    list of (name, args) tuples
+
+                operators:  list of operator names
+
+                pre, add, delete:   lists (one per operator) of fluent id lists
+
+                init:       iterable of the fluent ids true initially
+
+                goal:       iterable of the fluent ids of the goal
+        """
+
+        self.fluents = list (fluents)
+        self.fluent_ids = {f: i for i, f in enumerate (self.fluents)}
+        self.operators = list (operators)
+        self.n_bytes = (len (self.fluents) + 7) // 8
+
+        self.pre_indptr, self.pre_indices = StripsTask._to_csr (pre)
+        self.add_indptr, self.add_indices = StripsTask._to_csr (add)
+        self.del_indptr, self.del_indices = StripsTask._to_csr (delete)
+        self.pre_counts = np.diff (self.pre_indptr)
+
+        self.init = self.state (init)
+        self.goal = np.array (sorted (set (goal)), dtype=np.int32)
+
+    @staticmethod
+    def _to_csr (rows):
+        indptr = np.zeros (len (rows) + 1, dtype=np.int32)
+        indptr[1:] = np.cumsum ([len (r) for r in rows])
+        indices = np.fromiter ((i for r in rows for i in r), dtype=np.int32, count=int (indptr[-1]))
+        return indptr, indices
+
+    @staticmethod
+    def from_ground_problem (problem, relaxed=False):
+        """
+            Build a task from a GroundProblem.
+
+            Raises ValueError if an operator is not STRIPS: preconditions must be
+            conjunctions of atoms and effects conjunctions of literals.
+
+            With relaxed=True any operator is accepted and reduced to its delete
+            relaxation: the positive atoms of its precondition, every atom its
+            effect may add and no deletes. Negative and disjunctive conditions
+            and effect conditions are dropped, as are non-atomic goals.
+        """
+
+        fluents = sorted ([fact_key (f) for f in problem.fluents])
+        fluent_ids = {f: i for i, f in enumerate (fluents)}
+
+        def fid (predicate):
+            # facts outside the grounded fluents (e.g. unreachable goals) get new ids
+            key = fact_key (predicate)
+            if key not in fluent_ids:
+                fluent_ids[key] = len (fluents)
+                fluents.append (key)
+            return fluent_ids[key]
+
+        def literals (formula, what):
+            if formula is None:
+                return []
+            parts = formula.args if isinstance (formula, And) else (formula,)
+            for p in parts:
+                if not isinstance (p, Primitive) and \
+                        not (isinstance (p, Not) and isinstance (p.args[0], Primitive)):
+                    raise ValueError ("%s is not STRIPS: %s" % (what, str (p)))
+            return parts
+
+        names, pre, add, delete = [], [], [], []
+        for op in sorted (problem.operators):
+            name = op.name
+            if relaxed:
+                names.append (name)
+                pre.append (sorted (set ([fid (p) for p in positive_atoms (op.precondition)])))
+                add.append (sorted (set ([fid (p) for p in added_atoms (op.effect)])))
+                delete.append ([])
+                continue
+            op_pre = []
+            for p in literals (op.precondition, "precondition of " + name):
+                if isinstance (p, Not):
+                    raise ValueError ("precondition of %s is not STRIPS: %s" % (name, str (p)))
+                op_pre.append (fid (p.predicate))
+            op_add, op_del = [], []
+            for p in literals (op.effect, "effect of " + name):
+                if isinstance (p, Not):
+                    op_del.append (fid (p.args[0].predicate))
+                else:
+                    op_add.append (fid (p.predicate))
+            names.append (name)
+            pre.append (op_pre)
+            add.append (op_add)
+            delete.append (op_del)
+
+        if relaxed:
+            init = [fid (p) for p in positive_atoms (problem.init)]
+            goal = [fid (p) for p in positive_atoms (problem.goal)]
+        else:
+            init = [fid (p.predicate) for p in literals (problem.init, "init")]
+            goal = [fid (p.predicate) for p in literals (problem.goal, "goal")]
+        return StripsTask (fluents, names, pre, add, delete, init, goal)
+
+    def pack (self, states):
+        """Pack boolean states of shape (..., n_fluents) into bit arrays."""
+
+        return np.packbits (states, axis=-1, bitorder="little")
+
+    def unpack (self, states):
+        """Unpack bit-array states into booleans of shape (..., n_fluents)."""
+
+        return np.unpackbits (states, axis=-1, count=len (self.fluents), bitorder="little").astype (bool)
+
+    def state (self, fluent_ids):
+        """Return the packed state in which exactly the given fluents hold."""
+
+        s = np.zeros (len (self.fluents), dtype=bool)
+        s[list (fluent_ids)] = True
+        return self.pack (s)
+
+    def applicable (self, states):
+        """
+            Return a boolean array of shape (k, n_operators): whether each
+            operator is applicable in each of the k packed states.
+        """
+
+        states = np.atleast_2d (states)
+        held = self.unpack (states)[:, self.pre_indices]
+        # satisfied preconditions per operator, as differences of a running count
+        running = np.zeros ((held.shape[0], held.shape[1] + 1), dtype=np.int32)
+        np.cumsum (held, axis=1, out=running[:, 1:])
+        satisfied = running[:, self.pre_indptr[1:]] - running[:, self.pre_indptr[:-1]]
+        return satisfied == self.pre_counts
+
+    def successors (self, states, state_ids, op_ids):
+        """
+            Apply operator op_ids[i] to state states[state_ids[i]] for every i.
+            Applicability is not checked. Returns the packed successor states.
+        """
+
+        states = np.atleast_2d (states)
+        op_ids = np.asarray (op_ids, dtype=np.int32)
+        succ = self.unpack (states[np.asarray (state_ids)])
+
+        rows, cols = _csr_gather (self.del_indptr, self.del_indices, op_ids)
+        succ[rows, cols] = False
+        rows, cols = _csr_gather (self.add_indptr, self.add_indices, op_ids)
+        succ[rows, cols] = True
+        return self.pack (succ)
+
+    def is_goal (self, states):
+        """Return a boolean array: whether each packed state satisfies the goal."""
+
+        return self.unpack (np.atleast_2d (states))[:, self.goal].all (axis=1)
@@ -0,0 +1,299 @@
+import itertools
+
+from formula import And, Or, Not, Forall, When, Primitive
+
+
+def _fact_str (fact):
+    """PDDL representation of a (name, arg, ...) fact tuple."""
+
+    return "(%s)" % " ".join (fact)
+
+
+class PlanValidator (object):
+    """
+        Validate plans in-process by simulating them on a parsed problem.
+
+        Every lifted action is compiled once into nested tuples whose arguments
+        are either parameter slots (ints) or constants (strings), so executing a
+        step only substitutes the step's arguments. For STRIPS actions the ground
+        precondition, add and delete lists of each distinct step are memoized.
+        The state is a single set of (name, arg, ...) fact tuples that each step
+        updates in place with its delete and add lists.
+
+        Supports conjunctions, disjunctions, negation, equality and forall in
+        preconditions, and conditional and universal effects. Temporal plans are
+        simulated sequentially in the order given. Step arguments must be
+        objects of the problem of their parameter's type.
+
+        Attributes:
+            problem: the Problem (with a problem file) plans are checked against
+
+        Methods:
+            validate:   simulate a plan and report whether it is valid
+    """
+
+    def __init__ (self, problem):
+        """
+            Inputs:
+                problem: Problem object with both domain and problem parsed
+        """
+
+        assert problem.init is not None, "validation needs a problem file as well as the domain"
+        self.problem = problem
+        self._actions = {a.name: a for a in problem.actions}
+        self._compiled = {}
+        self._goal = self._compile_condition (problem.goal, {})
+
+    def initial_state (self):
+        """Return the initial state as a new set of fact tuples."""
+
+        state = set ([])
+        parts = self.problem.init.args if isinstance (self.problem.init, And) else (self.problem.init,)
+        for p in parts:
+            if isinstance (p, Primitive):
+                state.add ((p.predicate.name,) + tuple ([v for v, _ in self._pred_args (p.predicate)]))
+        return state
+
+    @staticmethod
+    def _pred_args (predicate):
+        return predicate.ground_args if predicate.args is None else predicate.args
+
+    def _slots (self, predicate, slots):
+        """Map the arguments of predicate to parameter slots or constants."""
+
+        out = []
+        for v, _ in self._pred_args (predicate):
+            if v in slots:
+                out.append (slots[v])
+            elif v.startswith ("?"):
+                raise ValueError ("unbound variable %s in %s" % (v, str (predicate)))
+            else:
+                out.append (v)
+        return tuple (out)
+
+    def _compile_condition (self, formula, slots):
+        """Compile a precondition or goal formula."""
+
+        if formula is None:
+            return ("and", ())
+        elif isinstance (formula, Primitive):
+            if formula.predicate.name == "=":
+                return ("eq", self._slots (formula.predicate, slots))
+            return ("atom", formula.predicate.name, self._slots (formula.predicate, slots))
+        elif isinstance (formula, And):
+            return ("and", tuple ([self._compile_condition (a, slots) for a in formula.args]))
+        elif isinstance (formula, Or):
+            return ("or", tuple ([self._compile_condition (a, slots) for a in formula.args]))
+        elif isinstance (formula, Not):
+            return ("not", self._compile_condition (formula.args[0], slots))
+        elif isinstance (formula, Forall):
+            inner, types = self._bind (formula.params, slots)
+            return ("forall", types, self._compile_condition (formula.args[0], inner))
+        raise ValueError ("unsupported condition: %s" % str (formula))
+
+    def _compile_effect (self, formula, slots):
+        """Compile an effect formula."""
+
+        if formula is None:
+            return ("and", ())
+        elif isinstance (formula, Primitive):
+            return ("add", formula.predicate.name, self._slots (formula.predicate, slots))
+        elif isinstance (formula, Not) and isinstance (formula.args[0], Primitive):
+            p = formula.args[0].predicate
+            return ("del", p.name, self._slots (p, slots))
+        elif isinstance (formula, And):
+            return ("and", tuple ([self._compile_effect (a, slots) for a in formula.args]))
+        elif isinstance (formula, When):
+            return ("when", self._compile_condition (formula.condition, slots),
+                    self._compile_effect (formula.result, slots))
+        elif isinstance (formula, Forall):
+            inner, types = self._bind (formula.params, slots)
+            return ("forall", types, self._compile_effect (formula.args[0], inner))
+        raise ValueError ("unsupported effect: %s" % str (formula))
+
+    def _bind (self, params, slots):
+        """
+            Give quantified variables the next free slots, after every slot
+            in use (values are appended to the binding), even when they shadow
+            a variable of an outer scope.
+        """
+
+        base = max (slots.values ()) + 1 if slots else 0
+        inner = dict (slots)
+        for k, (v, _) in enumerate (params):
+            inner[v] = base + k
+        return inner, tuple ([t for _, t in params])
+
+    def _compile_action (self, action):
+        """Return (precondition, effect, strips, domains) for action, compiling it
+        on first use. strips is (precondition atoms, add atoms, delete atoms) when
+        the action is STRIPS, and None otherwise; domains holds the set of objects
+        each parameter accepts."""
+
+        if action.name not in self._compiled:
+            slots = {v: i for i, (v, _) in enumerate (action.parameters)}
+            precondition = self._compile_condition (action.precondition, slots)
+            effect = self._compile_effect (action.effect, slots)
+
+            pre = precondition[1] if precondition[0] == "and" else (precondition,)
+            eff = effect[1] if effect[0] == "and" else (effect,)
+            strips = None
+            if all ([c[0] == "atom" for c in pre]) and all ([e[0] in ("add", "del") for e in eff]):
+                strips = (tuple ([c[1:] for c in pre]),
+                          tuple ([e[1:] for e in eff if e[0] == "add"]),
+                          tuple ([e[1:] for e in eff if e[0] == "del"]))
+            domains = tuple ([frozenset (self.problem.objects_of_type (t)) for _, t in action.parameters])
+            self._compiled[action.name] = (precondition, effect, strips, domains)
+        return self._compiled[action.name]
+
+    def _check_args (self, action, binding, domains):
+        """Return why the step arguments cannot fill the parameters of action, or None."""
+
+        for arg, allowed, (v, t) in zip (binding, domains, action.parameters):
+            if arg not in allowed:
+                if arg not in self.problem.objects:
+                    return "unknown object %s in (%s)" % (arg, " ".join ((action.name,) + binding))
+                return "%s of (%s) must be of type %s, got %s" % \
+                    (v, " ".join ((action.name,) + binding), t, arg)
+        return None
+
+    @staticmethod
+    def _ground (name, arg_slots, binding):
+        return (name,) + tuple ([binding[s] if s.__class__ is int else s for s in arg_slots])
+
+    def _holds (self, node, binding, state):
+        kind = node[0]
+        if kind == "atom":
+            return self._ground (node[1], node[2], binding) in state
+        elif kind == "and":
+            return all (self._holds (c, binding, state) for c in node[1])
+        elif kind == "not":
+            return not self._holds (node[1], binding, state)
+        elif kind == "or":
+            return any (self._holds (c, binding, state) for c in node[1])
+        elif kind == "eq":
+            values = self._ground ("=", node[1], binding)[1:]
+            return all (v == values[0] for v in values)
+        else:
+            return all (self._holds (node[2], binding + values, state) for values in self._valuations (node[1]))
+
+    def _effects (self, node, binding, state, adds, dels):
+        """Collect the facts added and deleted by an effect, evaluated in state."""
+
+        kind = node[0]
+        if kind == "add":
+            adds.append (self._ground (node[1], node[2], binding))
+        elif kind == "del":
+            dels.append (self._ground (node[1], node[2], binding))
+        elif kind == "and":
+            for c in node[1]:
+                self._effects (c, binding, state, adds, dels)
+        elif kind == "when":
+            if self._holds (node[1], binding, state):
+                self._effects (node[2], binding, state, adds, dels)
+        else:
+            for values in self._valuations (node[1]):
+                self._effects (node[2], binding + values, state, adds, dels)
+
+    def _valuations (self, types):
+        return itertools.product (*[self.problem.objects_of_type (t) for t in types])
+
+    def _unsatisfied (self, node, binding, state):
+        """Describe the parts of a failed condition that do not hold."""
+
+        parts = node[1] if node[0] == "and" else (node,)
+        out = []
+        for c in parts:
+            if not self._holds (c, binding, state):
+                if c[0] == "atom":
+                    out.append (_fact_str (self._ground (c[1], c[2], binding)))
+                elif c[0] == "not" and c[1][0] == "atom":
+                    out.append ("(not %s)" % _fact_str (self._ground (c[1][1], c[1][2], binding)))
+                else:
+                    out.append ("(%s ...)" % c[0])
+        return out
+
+    def validate (self, steps, trajectory=None):
+        """
+            Simulate a plan from the initial state.
+
+            Inputs:
+                steps:      iterable of plan steps, each with a name and args
+                            (e.g. the PlanStep objects of plan_parser.Plan)
+
+                trajectory: None, "deltas" to also return the facts added and
+                            deleted by each step, or "states" to also return
+                            the state after each step
+
+            Returns:
+                dictionary with "valid", "steps" (number of steps executed),
+                "error", "failed_step", "unsatisfied", and "deltas" or
+                "states" when requested
+        """
+
+        state = self.initial_state ()
+        result = {"valid": False, "steps": 0, "error": None, "failed_step": None, "unsatisfied": []}
+        if trajectory == "deltas":
+            result["deltas"] = []
+        elif trajectory == "states":
+            result["states"] = [sorted (_fact_str (f) for f in state)]
+
+        ground = self._ground
+        grounded = {}
+        i = -1
+        for i, step in enumerate (steps):
+            action = self._actions.get (step.name)
+            if action is None:
+                result.update (error="unknown action %s" % step.name, failed_step=i, steps=i)
+                return result
+            if len (step.args) != len (action.parameters):
+                result.update (error="%s expects %d arguments, got %d" %
+                               (step.name, len (action.parameters), len (step.args)), failed_step=i, steps=i)
+                return result
+
+            precondition, effect, strips, domains = self._compile_action (action)
+            binding = tuple (step.args)
+            error = self._check_args (action, binding, domains)
+            if error is not None:
+                result.update (error=error, failed_step=i, steps=i)
+                return result
+
+            if strips is not None:
+                key = (step.name, binding)
+                facts = grounded.get (key)
+                if facts is None:
+                    facts = tuple ([[ground (name, a, binding) for name, a in atoms] for atoms in strips])
+                    grounded[key] = facts
+                pre, adds, dels = facts
+                satisfied = all ([f in state for f in pre])
+            else:
+                satisfied = self._holds (precondition, binding, state)
+
+            if not satisfied:
+                result.update (error="precondition of (%s) not satisfied" % " ".join ((step.name,) + binding),
+                               failed_step=i, steps=i, unsatisfied=self._unsatisfied (precondition, binding, state))
+                return result
+
+            if strips is None:
+                adds, dels = [], []
+                self._effects (effect, binding, state, adds, dels)
+
+            # delete-then-add semantics, applied as the facts whose truth value changes
+            added = set ([f for f in adds if f not in state])
+            deleted = set ([f for f in dels if f in state]).difference (adds)
+            state.difference_update (deleted)
+            state.update (added)
+
+            if trajectory == "deltas":
+                result["deltas"].append ({"add": sorted ([_fact_str (f) for f in added]),
+                                          "del": sorted ([_fact_str (f) for f in deleted])})
+            elif trajectory == "states":
+                result["states"].append (sorted (_fact_str (f) for f in state))
+
+        result["steps"] = i + 1
+        if not self._holds (self._goal, (), state):
+            result.update (error="goal not satisfied", unsatisfied=self._unsatisfied (self._goal, (), state))
+            return result
+
+        result["valid"] = True
+        return result
@@ -1,10 +1,11 @@
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from action_plan_parser.parser import Problem
+from domain_cache import DOMAIN_CACHE
+from action_plan_parser.plan_parser import Plan
+from action_plan_parser.validator import PlanValidator
 import copy
 import json
-import re
 import traceback
 
 TEMPLATE={
@@ -34,7 +35,13 @@ class PlanningEditorAdaptor:
         result["result"]["output"]=stdout
         return result
 
-    def handle_plan(self,domain_file,actions,stdout,output_type):
+    def validate(self,domain_file,problem_file,actions,trajectory=None):
+        # Simulate the plan against the (cached) domain and the problem
+        domain,_=DOMAIN_CACHE.get(domain_file)
+        validator=PlanValidator(domain.with_problem(problem_file))
+        return validator.validate(Plan(actions.lower()),trajectory)
+
+    def handle_plan(self,domain_file,actions,stdout,output_type,validator=None,trajectory=None):
 
             try:
                 # Generate one action with the plan text when the output type is 'log'. 
@@ -46,27 +53,38 @@ class PlanningEditorAdaptor:
 
                 # Parse plan text and generate a plan with list of actions
                 else:
-                    domain=Problem(domain_file)
+                    # Parsed domains are shared across plans and requests
+                    domain,act_map=DOMAIN_CACHE.get(domain_file)
                     plan = []
-                    act_map = {}
-                    for a in domain.actions:
-                        act_map[a.name] = a
-                    action_list=re.findall(r"(\([a-z\d _-]*\))", actions)
-
-                    for action_str in action_list:
-                        elements=[element for element in action_str[1:-1].split(" ") if len(element)>0]
-                        a_name=elements[0]
-                        if len(elements)>0:
-                            a_params=elements[1:]
-                        else:
-                            a_params=False
-
-                        if a_name in act_map:
-                            a = act_map[a_name]
-                            plan.append({"name": action_str, "action": a.export(grounding=a_params)})      
+                    plan_text=Plan(actions)
+
+                    # Plans repeat steps heavily, so each distinct step is exported once
+                    exported={}
+                    for step in plan_text:
+                        key=(step.name,step.args)
+                        if key not in exported:
+                            if step.name in act_map:
+                                exported[key]=act_map[step.name].ground_export(step.args)
+                            else:
+                                exported[key]=None
+
+                        if exported[key] is not None:
+                            action={"name": step.text, "action": exported[key]}
+                            if step.time is not None:
+                                action["time"]=step.time
+                            if step.duration is not None:
+                                action["duration"]=step.duration
+                            plan.append(action)
 
                     result=self.generate_result(plan,stdout)
-                    
+                    if plan_text.cost is not None:
+                        result["result"]["cost"]=plan_text.cost
+                    if validator is not None:
+                        try:
+                            result["result"]["validation"]=validator.validate(plan_text,trajectory)
+                        except Exception as e:
+                            result["result"]["validation"]={"valid":False,"error":str(e)}
+
                     return result
 
             # Then the adaptor could not parse the plan, generate one action with the plan text
@@ -93,15 +111,26 @@ class PlanningEditorAdaptor:
             arguments=kwargs["arguments"]
             
             # request data send to the check API. 
-            # request_data=kwargs["request_data"]
+            request_data=kwargs.get("request_data") or {}
 
             domain_file=arguments["domain"]["value"]
             
             result={"plans":[],"status":"ok"}
+
+            # Optionally validate each plan against the problem, with per-step deltas or states
+            validator=None
+            trajectory=request_data.get("trajectory")
+            if request_data.get("validate") and "problem" in arguments:
+                try:
+                    domain,_=DOMAIN_CACHE.get(domain_file)
+                    validator=PlanValidator(domain.with_problem(arguments["problem"]["value"]))
+                except Exception as e:
+                    result["validation_error"]=str(e)
+
             for plan_name in raw_data["output"]:
                 actions=raw_data["output"][plan_name]
                 actions=actions.lower()
-                parsed_plan=self.handle_plan(domain_file,actions,raw_data["stdout"],raw_data["output_type"])
+                parsed_plan=self.handle_plan(domain_file,actions,raw_data["stdout"],raw_data["output_type"],validator,trajectory)
                 result["plans"].append(parsed_plan)
             return result
 
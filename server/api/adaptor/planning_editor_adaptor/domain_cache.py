@@ -0,0 +1,98 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from action_plan_parser.parser import Problem
+from action_plan_parser.canonical import canonicalize
+from collections import OrderedDict
+import threading
+
+# Bounds for the process-wide cache of parsed domains
+DOMAIN_CACHE_SIZE = int(os.environ.get('DOMAIN_CACHE_SIZE', 128))
+DOMAIN_CACHE_BYTES = int(os.environ.get('DOMAIN_CACHE_BYTES', 16 * 1024 * 1024))
+
+
+def domain_digest(domain_text):
+    """
+        Return the cache key for a domain (the sha256 of its canonical text)
+        along with the canonical text. Case, comments, whitespace and the
+        order of types, constants and predicates are ignored.
+    """
+
+    normalized, digest = canonicalize(domain_text)
+    return digest, normalized
+
+
+class DomainCache:
+    """
+        Thread-safe LRU cache of parsed domains.
+
+        Each entry holds the parsed Problem (domain only) and the map from
+        action names to lifted actions. Entries are read-only once cached, so
+        they can be shared by every request handled by this process.
+
+        The cache is bounded both by the number of entries and by the total size
+        of the normalized domain texts it holds.
+    """
+
+    def __init__(self, max_entries=DOMAIN_CACHE_SIZE, max_bytes=DOMAIN_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, domain_text):
+        """Return (domain, act_map) for the domain text, parsing it on a miss."""
+
+        key, normalized = domain_digest(domain_text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0], entry[1]
+            self.misses += 1
+
+        # Parse outside the lock so a slow domain does not block other requests
+        domain = Problem(domain_text)
+        act_map = {a.name: a for a in domain.actions}
+        size = len(normalized)
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (domain, act_map, size)
+                self._bytes += size
+                self._evict()
+        return domain, act_map
+
+    def _evict(self):
+        """Drop least recently used entries until both bounds hold. Caller holds the lock."""
+
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return the hit/miss counters and current occupancy."""
+
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Shared by every adaptor instance in this process
+DOMAIN_CACHE = DomainCache()
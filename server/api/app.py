@@ -1,5 +1,9 @@
 import os
+import re
+import sys
+import math
 import tempfile
+import time
 from flask import Flask
 from flask import url_for
 from flask import flash, Markup, render_template, request, redirect, send_file, make_response, jsonify, json,abort
@@ -15,12 +19,35 @@ from base64 import b64encode
 from planutils.package_installation import PACKAGES
 from planutils import settings
 import copy
+import uuid
 
 from worker import celery
 import celery.states as states
 
 # Adaptor
 from adaptor.adaptor import Adaptor
+# on the path set up by the adaptor package
+from action_plan_parser.preflight import preflight, tokenize, features as pddl_features
+from action_plan_parser.relaxed import relaxed_precheck
+from action_plan_parser.problem_delta import apply_delta
+from action_plan_parser.canonical import canonicalize, canonical_tokens, canonical_text
+from action_plan_parser.pddl_stats import pddl_statistics, size_bounds
+from domain_cache import DOMAIN_CACHE
+from planner_selection import select_planner
+from meta_history import MetaHistory
+from runtime_model import RuntimeModel
+# Result store shared with the workers (installed in the image, or next to this folder in local dev)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+from blob_store import get_store, rehydrate_result, offload_file_arguments, expiry, put_value, get_value, is_blob, BLOB_KEY
+from affinity import TASK_AFFINITY, AffinityRouter
+from scheduling import priority, record_poll, skip_reason, count_skip
+import fair_share
+from fair_share import FAIR_SHARE
+from metrics import RedisCounters
+from prometheus_client import CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
+from celery.utils.nodenames import worker_direct
+import hashlib
+import hmac
 from flask_cors import CORS
 
 from collections import OrderedDict
@@ -45,6 +72,39 @@ app.secret_key = app.config['SECRET_KEY']
 # For API limit checking
 block_dict={}
 LIMITER_SECONDS= app.config['LIMITER_SECONDS']
+PREFLIGHT_TIME_BUDGET = app.config['PREFLIGHT_TIME_BUDGET']
+
+# Past run durations, for ranking planners in auto mode
+meta_history = MetaHistory(ttl=app.config['PLANNER_HISTORY_TTL'], max_samples=app.config['RUNTIME_MODEL_SAMPLES'])
+# Run times predicted from that history, for ordering the queues and hinting when to poll
+runtime_model = RuntimeModel(meta_history, min_runs=app.config['RUNTIME_MODEL_MIN_RUNS'])
+
+# Cold tier holding large result values and persistent results
+blob_store = get_store()
+PLANNER_HISTORY_MIN_RUNS = app.config['PLANNER_HISTORY_MIN_RUNS']
+PRECHECK_MAX_BYTES = app.config['PRECHECK_MAX_BYTES']
+CANONICALIZE_PDDL = app.config['CANONICALIZE_PDDL']
+
+# Registered domain texts (by id) recently used by this process
+registered_domains = OrderedDict()
+REGISTERED_DOMAINS_CACHED = app.config['REGISTERED_DOMAINS_CACHED']
+DIGEST_RE = re.compile(r"[0-9a-f]{64}")
+
+# Memory classes of tasks, each sent to its own pool of workers when SIZE_ROUTING is set
+SIZE_ROUTING = app.config['SIZE_ROUTING']
+LARGE_TASK_QUEUE = app.config['LARGE_TASK_QUEUE']
+LARGE_TASK_GROUND_BOUND = app.config['LARGE_TASK_GROUND_BOUND']
+
+# Routes tasks for the same domain to the same worker, when TASK_AFFINITY is set
+affinity_router = AffinityRouter() if TASK_AFFINITY else None
+
+# Clients are told apart by this header, or else by their IP address
+API_KEY_HEADER = app.config['API_KEY_HEADER']
+ADMIN_KEY = app.config['ADMIN_KEY']
+
+# Counters kept in Redis by the API and the workers, served by /metrics
+metrics_registry = CollectorRegistry()
+metrics_registry.register(RedisCounters())
 
 # Flask-Upload
 PDDL = ('pddl',)
@@ -77,28 +137,36 @@ def index():
             if check_for_throttle(request.remote_addr):
                 abort(429, description="Sorry, we're busy. Please try again after {} seconds.".format(LIMITER_SECONDS))
 
+        # Grabs the request data (JSON), with domain_ref replaced by the registered domain
+        request_data = resolve_refs(request.get_json() or {})
+        if 'Error' in request_data:
+            return jsonify(request_data)
+        try:
+            deadline = task_deadline(request_data)
+        except ValueError:
+            return jsonify({"Error":"deadline must be a positive number of seconds"})
+
+        # "planner" may name a package, or be "auto" to pick one from the PDDL features
+        package = request_data.get("planner", default_package)
+        required_features = None
+        if package == "auto":
+            required_features = pddl_features(request_data.get("domain", ""), request_data.get("problem"))
+            package = select_planner(required_features, solver_packages(), meta_history.durations(), PLANNER_HISTORY_MIN_RUNS)
+            if package is None:
+                return jsonify({"Error":"No installed planner supports " + ", ".join(required_features)})
+
         # Called route with a package that isn't in Planutils
-        if default_package not in PACKAGES:
-            return jsonify({"Error":"{} is not installed".format(default_package)})
+        if package not in PACKAGES:
+            return jsonify({"Error":"{} is not installed".format(package)})
+        if "solve" not in PACKAGES[package].get('endpoint', {}).get('services', {}):
+            return jsonify({"Error":"{} does not contain service solve".format(package)})
 
-        # Grabs the request data (JSON)
-        request_data = request.get_json()
         # Contains manifest information
-        package_manifest = PACKAGES[default_package]['endpoint']['services']["solve"]
-
-        # Get all necessary arguments for the service from request_data
-        arguments = get_arguments(request_data, package_manifest)
-        if 'Error' in arguments:
-            return jsonify(arguments)
-
-        call = package_manifest['call']
-        output_file = package_manifest['return']
-        # Send task
-        task = celery.send_task('tasks.run.package', args=[default_package, arguments, call, output_file], kwargs={})
-
-        # keep the IP and datetime of the tasks
-        block_dict[request.remote_addr]=datetime.now()
-        return jsonify({"result":str(url_for('check_task', task_id=task.id, external=True))})
+        package_manifest = PACKAGES[package]['endpoint']['services']["solve"]
+        extra = {"planner":package}
+        if required_features is not None:
+            extra["features"] = required_features
+        return queue_request(request_data, package, package_manifest, deadline, extra=extra)
 
 # Main execution route for running planutils packages
 @app.route('/package/<package>/<service>', methods=['GET', 'POST'])
@@ -130,25 +198,100 @@ def runPackage(package, service):
 
         persistent_value="true" if request.headers.get('persistent',"false") == "true" else "false"
 
-        # Grabs the request data (JSON)
-        request_data = request.get_json()
+        # Grabs the request data (JSON), with domain_ref replaced by the registered domain
+        request_data = resolve_refs(request.get_json() or {})
+        if 'Error' in request_data:
+            return jsonify(request_data)
+        try:
+            deadline = task_deadline(request_data)
+        except ValueError:
+            return jsonify({"Error":"deadline must be a positive number of seconds"})
         # Contains manifest information
         package_manifest = PACKAGES[package]['endpoint']['services'][service]
+        return queue_request(request_data, package, package_manifest, deadline, persistent_value)
+
+
+# Check a request for a package service and queue it: the steps shared by /solver and
+# /package. extra is added to the response (e.g. the planner picked by /solver).
+def queue_request(request_data, package, package_manifest, deadline, persistent_value="false", extra=None):
+    # Get all necessary arguments for the service from request_data
+    arguments = get_arguments(request_data, package_manifest)
+    if 'Error' in arguments:
+        return jsonify(arguments)
+
+    # The PDDL is tokenized once, for the checks, the canonical form and the statistics
+    tokens = pddl_tokens(arguments)
+
+    # Reject broken PDDL before it takes a worker slot
+    errors = check_pddl(arguments, tokens)
+    if errors:
+        return jsonify({"Error":"Invalid PDDL", "details":errors})
+    arguments = canonical_arguments(arguments, tokens)
+
+    call = package_manifest['call']
+    output_file = package_manifest['return']
+
+    # Optional relaxed reachability check: unsolvable problems are answered without a planner
+    estimate = run_precheck(arguments) if request_data.get("precheck") else None
+    if estimate is not None and estimate["solvable"] is False:
+        task_id = answer_unsolvable(arguments, output_file, estimate)
+        return jsonify(dict(extra or {}, result=str(url_for('check_task', task_id=task_id, external=True)), precheck=estimate))
+
+    stats = task_statistics(arguments, tokens)
+    size_class = task_size_class(arguments, tokens)
+    runtime = runtime_model.predict(package, stats)
+
+    # Send task, with large files as digests into the blob store
+    arguments = offload_file_arguments(arguments, blob_store, expiry(persistent_value == "true"))
+    task_id = submit_task(package, arguments, call, output_file, {"persistent":persistent_value, "estimate":estimate, "deadline":deadline, "stats":stats, "size_class":size_class}, runtime)
+
+    # keep the IP and datetime of the tasks
+    block_dict[request.remote_addr]=datetime.now()
+    response = dict(extra or {}, result=str(url_for('check_task', task_id=task_id, external=True)))
+    if estimate is not None:
+        response["precheck"] = estimate
+    return submitted(response, runtime)
+
+
+
+# Register a domain once and refer to it by id (domain_ref) in later submissions
+@app.route('/domains', methods=['POST'])
+def register_domain():
+    request_data = request.get_json() or {}
+    domain = request_data.get("domain")
+    if not isinstance(domain, str):
+        return jsonify({"Error":"Required argument, domain was not provided"})
+
+    tokens = tokenize(domain)
+    errors = preflight(domain, None, PREFLIGHT_TIME_BUDGET, (tokens, None))
+    if errors:
+        return jsonify({"Error":"Invalid PDDL", "details":errors})
+    required_features = pddl_features(domain, None, (tokens, None))
+    # Equivalent texts (up to comments, case, whitespace and order) get the same id
+    if CANONICALIZE_PDDL:
+        domain, _ = canonicalize(domain, tokens)
+
+    # Parse into the shared domain cache, so that broken domains are reported now and later
+    # validations and adaptor requests find the domain parsed. Domains the in-process
+    # parser does not support can still be sent to the planners.
+    try:
+        parsed, act_map = DOMAIN_CACHE.get(domain)
+        domain_name, actions = parsed.domain_name, len(act_map)
+    except Exception:
+        domain_name, actions = None, None
 
-        # Get all necessary arguments for the service from request_data
-        arguments = get_arguments(request_data, package_manifest)
-        if 'Error' in arguments:
-            return jsonify(arguments)
-
-        call = package_manifest['call']
-        output_file = package_manifest['return']
-        # Send task
-        task = celery.send_task('tasks.run.package', args=[package, arguments, call, output_file], kwargs={"persistent":persistent_value})
-
-        # keep the IP and datetime of the tasks
-        block_dict[request.remote_addr]=datetime.now()
-        return jsonify({"result":str(url_for('check_task', task_id=task.id, external=True))})
+    # The id is the content hash, so registering the same domain again returns the same id
+    domain_id = put_value(domain, blob_store, expiry(True))
+    remember_domain(domain_id, domain)
+    return jsonify({"id":domain_id, "domain_name":domain_name, "actions":actions, "parsed":domain_name is not None,
+                    "features":required_features})
 
+@app.route('/domains/<string:domain_id>', methods=['GET'])
+def get_domain(domain_id):
+    domain = registered_domain(domain_id)
+    if domain is None:
+        return jsonify({"Error":"Unknown domain id " + domain_id, "status":"expired"}), 404
+    return jsonify({"id":domain_id, "domain":domain})
 
 
 # Redirects user to documentation for the package
@@ -161,7 +304,10 @@ def get_available_package():
 
     # Return the manifest of installed package
     insterested_package={package: all_packages[package] for package in all_packages if package in installed_package if "services" in all_packages[package].get("endpoint", {})}
-    return jsonify(insterested_package)
+    # ETag lets clients (e.g. the MCP wrapper) revalidate cheaply with If-None-Match
+    response = jsonify(insterested_package)
+    response.add_etag()
+    return response.make_conditional(request)
 
 
 # Redirects user to documentation for the package
@@ -192,29 +338,154 @@ def get_documentation_service(package, service):
 # @limiter.limit("1/10second", error_message="Sorry, we're busy. Please try again after 10 seconds.")
 @app.route('/check/<string:task_id>', methods=['GET', 'POST'])
 def check_task(task_id: str) -> str:
-    res = celery.AsyncResult(task_id)
-    if res.state == states.PENDING:
-        return {"status":res.state}
-    else:
-        #Get requst
+    # Workers drop tasks past their deadline, or no longer polled by their client, and
+    # fair sharing drops those it cannot send
+    if celery.AsyncResult(task_id).state == states.REVOKED:
+        return {"Error":"The task was dropped before it ran (deadline passed, client gone, or it could not be queued)","status":"skipped"}
+    try:
+        loaded = load_task(task_id)
+    except KeyError:
+        return {"Error":"The result of this task has expired","status":"expired"}
+    if loaded is None:
+        # Tasks whose client stops polling are dropped (TASK_ABANDON_AFTER)
+        record_poll(task_id)
+        return {"status":states.PENDING}
+    result,arguments=loaded
+
+    #Get requst
 
-        if request.method == 'GET':
-            result,arguments=res.result
+    if request.method == 'GET':
+        return {"result":result,"status":"ok"}
+    # Post request
+    elif request.method == 'POST':
+        request_data = request.get_json()
+        if request_data and "adaptor" in request_data:
+            adaptor=Adaptor()
+            try:
+                transformed_result=adaptor.get_result(request_data["adaptor"],result=result,arguments=arguments,request_data=request_data)
+                return transformed_result
+            except:
+                return "Adaptor Not Found",400
+        else:
+            # Return the default result format
             return {"result":result,"status":"ok"}
-        # Post request
-        elif request.method == 'POST':
-            request_data = request.get_json()
-            result,arguments=res.result
-            if request_data and "adaptor" in request_data:
-                adaptor=Adaptor()
-                try:
-                    transformed_result=adaptor.get_result(request_data["adaptor"],result=result,arguments=arguments,request_data=request_data)
-                    return transformed_result
-                except:
-                    return "Adaptor Not Found",400
-            else:
-                # Return the default result format
-                return {"result":result,"status":"ok"}
+
+# Re-solve the problem of a finished task after changes to its initial state or goal
+@app.route('/resolve/<string:task_id>', methods=['POST'])
+def resolve_task(task_id):
+    if check_lock():
+        if check_for_throttle(request.remote_addr):
+            abort(429, description="Sorry, we're busy. Please try again after {} seconds.".format(LIMITER_SECONDS))
+
+    request_data = request.get_json() or {}
+    try:
+        deadline = task_deadline(request_data)
+    except ValueError:
+        return jsonify({"Error":"deadline must be a positive number of seconds"})
+    try:
+        loaded = load_task(task_id)
+    except KeyError:
+        return jsonify({"Error":"The result of this task has expired","status":"expired"})
+    if loaded is None:
+        return jsonify({"Error":"Task {} has no result yet".format(task_id)})
+    previous_result, previous_arguments = loaded
+    if "domain" not in previous_arguments or "problem" not in previous_arguments:
+        return jsonify({"Error":"Task {} did not solve a domain and problem".format(task_id)})
+    # The new task is persistent, and charged to a client, as the original was
+    previous_kwargs = task_kwargs(task_id)
+    persistent = previous_kwargs.get("persistent") == "true" or request.headers.get('persistent', "false") == "true"
+    persistent_value = "true" if persistent else "false"
+
+    domain = previous_arguments["domain"]["value"]
+    try:
+        problem = apply_delta(previous_arguments["problem"]["value"],
+                              request_data.get("add_init", []), request_data.get("remove_init", []),
+                              request_data.get("goal"), request_data.get("add_goals", []), request_data.get("remove_goals", []))
+    except ValueError as e:
+        return jsonify({"Error":"Could not apply the changes: " + str(e)})
+
+    # The same planner as before, unless another one is named
+    package = request_data.get("planner") or previous_result.get("planner") or task_package(task_id) or "lama-first"
+    if package not in PACKAGES or "solve" not in PACKAGES[package].get('endpoint', {}).get('services', {}):
+        return jsonify({"Error":"{} is not installed or does not contain service solve".format(package)})
+    package_manifest = PACKAGES[package]['endpoint']['services']["solve"]
+    resubmitted = {name: arg["value"] for name, arg in previous_arguments.items()}
+    resubmitted["problem"] = problem
+    arguments = get_arguments(resubmitted, package_manifest)
+    if 'Error' in arguments:
+        return jsonify(arguments)
+
+    tokens = pddl_tokens(arguments)
+    errors = check_pddl(arguments, tokens)
+    if errors:
+        return jsonify({"Error":"Invalid PDDL", "details":errors})
+    arguments = canonical_arguments(arguments, tokens)
+
+    # A plan that still reaches the goal from the new initial state is returned without a planner run
+    plan_name, plan = latest_plan(previous_result)
+    if plan is not None:
+        try:
+            validation = Adaptor().validate_plan(domain, problem, plan)
+        except Exception:
+            validation = None
+        if validation is not None and validation["valid"]:
+            stdout = "The plan of task {} is still valid for the changed problem.".format(task_id)
+            result = {"stdout":stdout, "stderr":"", "call":"resolve", "output":{plan_name:plan},
+                      "output_type":previous_result.get("output_type", "generic"), "planner":package, "resolved_from":task_id}
+            new_task_id = store_answer(arguments, result, persistent)
+            return jsonify({"result":str(url_for('check_task', task_id=new_task_id, external=True)), "planner":package, "reused":True})
+
+    call = package_manifest['call']
+    output_file = package_manifest['return']
+    stats = task_statistics(arguments, tokens)
+    size_class = task_size_class(arguments, tokens)
+    runtime = runtime_model.predict(package, stats)
+    arguments = offload_file_arguments(arguments, blob_store, expiry(persistent))
+    new_task_id = submit_task(package, arguments, call, output_file, {"persistent":persistent_value, "deadline":deadline, "stats":stats, "size_class":size_class},
+                              runtime, client=previous_kwargs.get("client"))
+    block_dict[request.remote_addr]=datetime.now()
+    return submitted({"result":str(url_for('check_task', task_id=new_task_id, external=True)), "planner":package, "reused":False}, runtime)
+
+# Fair-share usage of each client, and their weights and concurrency caps
+@app.route('/admin/clients', methods=['GET'])
+def get_clients():
+    check_admin()
+    return jsonify({"fair_share":FAIR_SHARE, "max_in_flight":fair_share.FAIR_MAX_IN_FLIGHT, "clients":fair_share.report()})
+
+@app.route('/admin/clients/<string:client>', methods=['POST'])
+def set_client(client):
+    check_admin()
+    request_data = request.get_json() or {}
+    try:
+        fair_share.set_policy(client, request_data.get("weight"), request_data.get("max_running"))
+    except (TypeError, ValueError) as e:
+        return jsonify({"Error":str(e)})
+    weight, max_running = fair_share.policy(client)
+    return jsonify({"client":client, "weight":weight, "max_running":max_running})
+
+# Counters in the Prometheus text format
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return generate_latest(metrics_registry), 200, {"Content-Type": CONTENT_TYPE_LATEST}
+
+# Validate a plan in-process by simulating it on the domain and problem
+@app.route('/validate', methods=['POST'])
+def validate_plan():
+    request_data = request.get_json() or {}
+    for arg_name in ("domain", "problem", "plan"):
+        if arg_name not in request_data:
+            return jsonify({"Error":"Required argument, " + arg_name + " was not provided"})
+
+    # "deltas" returns the facts added/deleted by each step, "states" every state
+    trajectory = request_data.get("trajectory")
+    if trajectory not in (None, "deltas", "states"):
+        return jsonify({"Error":"trajectory must be one of deltas, states"})
+
+    try:
+        result = Adaptor().validate_plan(request_data["domain"], request_data["problem"], request_data["plan"], trajectory)
+    except Exception as e:
+        return jsonify({"Error":"Could not parse the domain or problem: " + str(e)})
+    return jsonify({"result":result,"status":"ok"})
 
 # Returns all necessary arguments for a service in a package
 def get_arguments(request_data, package_manifest):
@@ -239,6 +510,300 @@ def get_arguments(request_data, package_manifest):
         return {"Error": "This Planutils package is not configured correctly"}
 
 
+def remember_domain(domain_id, domain):
+    registered_domains[domain_id] = domain
+    registered_domains.move_to_end(domain_id)
+    while len(registered_domains) > REGISTERED_DOMAINS_CACHED:
+        registered_domains.popitem(last=False)
+
+
+# Text of a registered domain, or None if it is unknown or has expired
+def registered_domain(domain_id):
+    if not DIGEST_RE.fullmatch(domain_id):
+        return None
+    if domain_id in registered_domains:
+        registered_domains.move_to_end(domain_id)
+        return registered_domains[domain_id]
+    try:
+        text = get_value(domain_id, blob_store)
+    except (KeyError, ValueError):
+        return None
+    if not isinstance(text, str):
+        return None
+    remember_domain(domain_id, text)
+    return text
+
+
+# Replace domain_ref (an id from /domains) with the registered domain
+def resolve_refs(request_data):
+    request_data = dict(request_data)
+    domain_id = request_data.pop("domain_ref", None)
+    if domain_id is None or "domain" in request_data:
+        return request_data
+    domain = registered_domain(str(domain_id))
+    if domain is None:
+        return {"Error":"Unknown domain_ref {}, register the domain again with POST /domains".format(domain_id)}
+    request_data["domain"] = domain
+    return request_data
+
+
+# send_task options placing the task in the queue of the worker of its pool chosen for
+# its domain, or else in the queue of its pool (none for the shared queue of the small pool)
+def task_route(arguments, size_class=None):
+    pool = "large" if size_class == "large" else "small"
+    default = {"queue": LARGE_TASK_QUEUE} if pool == "large" else {}
+    if affinity_router is None or "domain" not in arguments:
+        return default
+    domain = arguments["domain"]["value"]
+    if is_blob(domain):
+        key = domain[BLOB_KEY]
+    elif isinstance(domain, str):
+        key = hashlib.sha256(domain.encode('utf-8')).hexdigest()
+    else:
+        return default
+    hostname = affinity_router.route(key, pool)
+    return {"queue": worker_direct(hostname)} if hostname else default
+
+# The time by which the client stops waiting for its task, from the optional "deadline"
+# (seconds from now) of a request. Raises ValueError if it is not a positive finite number.
+def task_deadline(request_data):
+    seconds = request_data.get("deadline")
+    if seconds is None:
+        return None
+    if isinstance(seconds, bool) or not isinstance(seconds, (int, float, str)):
+        raise ValueError(seconds)
+    # "nan" would pass the comparison, and "inf" would never expire
+    seconds = float(seconds)
+    if not math.isfinite(seconds) or seconds <= 0:
+        raise ValueError(seconds)
+    return time.time() + seconds
+
+
+# send_task options serving tasks with the least slack (or, without a deadline, the
+# shortest expected run time) first, and letting the workers drop a task once its
+# deadline has passed
+def deadline_options(deadline, runtime=None):
+    if deadline is None:
+        return {"priority": priority(None, runtime)}
+    return {"priority": priority(deadline, runtime), "expires": max(deadline - time.time(), 0)}
+
+
+# Send a task to the workers or, with FAIR_SHARE, queue it behind the earlier tasks
+# of its client (by default, the client making the request). Returns the task id.
+def submit_task(package, arguments, call, output_file, kwargs, runtime, client=None):
+    task_id = str(uuid.uuid4())
+    entry = {"package":package, "arguments":arguments, "call":call, "output_file":output_file, "kwargs":kwargs, "runtime":runtime}
+    if not FAIR_SHARE:
+        send_entry(task_id, entry)
+        return task_id
+    client = client or client_id()
+    entry["kwargs"] = dict(kwargs, client=client)
+    # Tasks cost their expected run time, or a second when it is unknown
+    fair_share.enqueue(client, task_id, entry, runtime or 1.0)
+    # Sent by the dispatcher thread, so that the request does not wait for the dispatch
+    # lock or fail when the broker does
+    fair_share.wake()
+    return task_id
+
+
+def send_entry(task_id, entry):
+    kwargs = entry["kwargs"]
+    celery.send_task('tasks.run.package', args=[entry["package"], entry["arguments"], entry["call"], entry["output_file"]], kwargs=kwargs,
+                     task_id=task_id, **task_route(entry["arguments"], kwargs.get("size_class")), **deadline_options(kwargs.get("deadline"), entry["runtime"]))
+
+
+# Send a task taken from a fair-share queue, unless it has passed its deadline or
+# been abandoned while it waited there. Returns whether it was sent.
+def dispatch_entry(task_id, entry):
+    kwargs = entry["kwargs"]
+    reason = skip_reason(task_id, kwargs.get("deadline"), kwargs.get("persistent") == "true")
+    if reason:
+        count_skip(reason)
+        celery.backend.mark_as_revoked(task_id, reason)
+        return False
+    send_entry(task_id, entry)
+    return True
+
+
+# Give up on a task that fair sharing failed to send FAIR_MAX_ATTEMPTS times, so that /check reports it
+def drop_entry(task_id, entry, error):
+    count_skip("send_failed")
+    celery.backend.mark_as_revoked(task_id, "send_failed")
+
+
+# Who a request is accounted to: a digest of its API key, or its IP address
+def client_id():
+    api_key = request.headers.get(API_KEY_HEADER)
+    if api_key:
+        return "key-" + hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+    return "ip-" + str(request.remote_addr)
+
+
+# Admin routes need the ADMIN_KEY of config.py in the X-Admin-Key header
+def check_admin():
+    given = request.headers.get("X-Admin-Key", "")
+    if not ADMIN_KEY or not hmac.compare_digest(given.encode('utf-8'), ADMIN_KEY.encode('utf-8')):
+        abort(403, description="Admin key required")
+
+
+# Tokens of the domain and problem arguments ({"domain", "problem"}), None for those
+# the service does not take or that are not text
+def pddl_tokens(arguments):
+    tokens = {}
+    for arg_name in ("domain", "problem"):
+        value = arguments[arg_name]["value"] if arg_name in arguments else None
+        tokens[arg_name] = tokenize(value) if isinstance(value, str) else None
+    return tokens
+
+
+# Size statistics of the domain and problem arguments, or None if the service takes no
+# PDDL. They are recorded with the task's run time, to train the run time model.
+def task_statistics(arguments, tokens=None):
+    if "domain" not in arguments or "problem" not in arguments:
+        return None
+    domain = arguments["domain"]["value"]
+    problem = arguments["problem"]["value"]
+    if not isinstance(domain, str) or not isinstance(problem, str):
+        return None
+    return pddl_statistics(domain, problem, tokens and (tokens["domain"], tokens["problem"]))
+
+
+# "large" if the grounding of the domain and problem arguments may exceed LARGE_TASK_GROUND_BOUND
+# (ground atoms plus ground actions), "small" if not, or None without SIZE_ROUTING or PDDL
+def task_size_class(arguments, tokens=None):
+    if not SIZE_ROUTING or "domain" not in arguments or "problem" not in arguments:
+        return None
+    domain = arguments["domain"]["value"]
+    problem = arguments["problem"]["value"]
+    if not isinstance(domain, str) or not isinstance(problem, str):
+        return None
+    bounds = size_bounds(domain, problem, tokens and (tokens["domain"], tokens["problem"]))
+    return "large" if bounds["ground_atoms"] + bounds["ground_actions"] > LARGE_TASK_GROUND_BOUND else "small"
+
+
+# Submit response with the predicted run time of the task, which is also the
+# Retry-After (seconds) before its first /check
+def submitted(response, runtime):
+    if runtime is not None:
+        response["expected_runtime"] = round(runtime, 2)
+    response = jsonify(response)
+    if runtime is not None:
+        response.headers["Retry-After"] = str(max(1, math.ceil(runtime)))
+    return response
+
+# Installed packages offering a solve service
+def solver_packages():
+    installed = settings.load()['installed']
+    return [p for p in installed if "solve" in PACKAGES.get(p, {}).get('endpoint', {}).get('services', {})]
+
+
+# Structural check of the domain and problem arguments, if the service takes them.
+# tokens are those of pddl_tokens, if the arguments have been tokenized already.
+def check_pddl(arguments, tokens=None):
+    if "domain" not in arguments:
+        return []
+    domain = arguments["domain"]["value"]
+    problem = arguments["problem"]["value"] if "problem" in arguments else None
+    if not isinstance(domain, str) or not isinstance(problem, (str, type(None))):
+        return []
+    return preflight(domain, problem, PREFLIGHT_TIME_BUDGET, tokens and (tokens["domain"], tokens["problem"]))
+
+
+# Replace the domain and problem by their canonical text, so that equivalent submissions
+# share blobs, worker caches and routing. tokens (of pddl_tokens) are replaced by those
+# of the canonical text.
+def canonical_arguments(arguments, tokens=None):
+    if not CANONICALIZE_PDDL:
+        return arguments
+    arguments = dict(arguments)
+    for arg_name in ("domain", "problem"):
+        if arg_name in arguments and isinstance(arguments[arg_name]["value"], str):
+            if tokens is None:
+                text, _ = canonicalize(arguments[arg_name]["value"])
+            else:
+                tokens[arg_name] = canonical_tokens(tokens[arg_name])
+                text, _ = canonical_text(tokens[arg_name])
+            arguments[arg_name] = dict(arguments[arg_name], value=text)
+    return arguments
+
+
+# Delete-relaxation reachability and h_add/h_FF estimates for the domain and problem
+# arguments. None when the service takes no PDDL, the files are too large to
+# ground in the API, or they use features the grounder does not model (e.g.
+# temporal, numeric or conditional-effect domains).
+def run_precheck(arguments):
+    if "domain" not in arguments or "problem" not in arguments:
+        return None
+    domain = arguments["domain"]["value"]
+    problem = arguments["problem"]["value"]
+    if not isinstance(domain, str) or not isinstance(problem, str) or len(domain) + len(problem) > PRECHECK_MAX_BYTES:
+        return None
+    return relaxed_precheck(domain, problem)
+
+
+# Store a result computed in the API as a finished task, so that clients poll
+# /check for it as for any other task. Persistent answers are kept in the cold tier too.
+def store_answer(arguments, result, persistent=False):
+    task_id = str(uuid.uuid4())
+    celery.backend.store_result(task_id, (result, arguments), states.SUCCESS)
+    if persistent:
+        blob_store.put_task(task_id, (result, arguments), expiry(True))
+    return task_id
+
+
+# Answer a problem proven unsolvable without running a planner
+def answer_unsolvable(arguments, output_file, estimate):
+    stdout = "Goals unreachable even ignoring delete effects: {}\nThe problem is unsolvable.".format(" ".join(estimate["unreachable_goals"]))
+    result = {"stdout":stdout, "stderr":"", "call":"precheck", "output":{}, "output_type":output_file["type"], "precheck":estimate}
+    return store_answer(arguments, result)
+
+
+# The result and arguments of a finished task, or None if it is pending or unknown.
+# Raises KeyError if its result has expired from the cold tier.
+def load_task(task_id):
+    res = celery.AsyncResult(task_id)
+    if res.state == states.PENDING:
+        # Persistent results outlive their Redis entry in the cold tier
+        stored = blob_store.get_task(task_id)
+        if stored is None:
+            return None
+        result,arguments=stored
+    else:
+        result,arguments=res.result
+    # Large values are stored as references to the cold tier
+    return rehydrate_result(result,arguments,blob_store)
+
+
+# The keyword arguments a finished task was sent with (persistent, client, ...), or {}
+# when the result backend has none, e.g. for answers the API stored itself
+def task_kwargs(task_id):
+    res = celery.AsyncResult(task_id)
+    try:
+        if res.state == states.PENDING:
+            # only persistent results outlive their Redis entry, in the cold tier
+            return {"persistent": "true"}
+        return res.kwargs or {}
+    except Exception:
+        return {}
+
+
+# The package a task was sent to, if the result backend still has it
+def task_package(task_id):
+    try:
+        args = celery.AsyncResult(task_id).args
+    except Exception:
+        return None
+    return args[0] if args else None
+
+
+# The name and text of the last plan in a result (e.g. sas_plan.3 after sas_plan.2), or (None, None)
+def latest_plan(result):
+    plans = [(name, text) for name, text in (result.get("output") or {}).items() if "plan" in name and isinstance(text, str)]
+    if not plans:
+        return None, None
+    return max(plans, key=lambda plan: (len(plan[0]), plan[0]))
+
+
 def check_for_throttle(ip_address):
     if ip_address not in block_dict:
         return False
@@ -262,5 +827,10 @@ def check_lock():
         return False
 
 
+# Sends fair-share queued tasks on as earlier ones finish
+if FAIR_SHARE:
+    fair_share.start_dispatcher(dispatch_entry, drop_entry)
+
+
 if __name__ == "__main__":
     app.run("0.0.0.0", port=5001, debug=True)
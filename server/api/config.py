@@ -1,5 +1,33 @@
+import os
+
 SECRET_KEY = 'very_very_secure_and_secret'
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 UPLOAD_FOLDER = 'tmp'
-LIMITER_SECONDS=20
\ No newline at end of file
+LIMITER_SECONDS=20
+# Seconds the API may spend checking PDDL before a job is queued
+PREFLIGHT_TIME_BUDGET=0.2
+# Seconds between reloads of the run history used to rank planners in auto mode
+PLANNER_HISTORY_TTL=300
+# Runs every capable planner needs before auto mode ranks them by history
+PLANNER_HISTORY_MIN_RUNS=20
+# Runs of a package with recorded problem statistics before its run times are predicted from them
+RUNTIME_MODEL_MIN_RUNS=20
+# Most past runs the run time model is trained on
+RUNTIME_MODEL_SAMPLES=50000
+# Largest domain + problem (in bytes) the API grounds for the relaxed reachability pre-check
+PRECHECK_MAX_BYTES=65536
+# Registered domain texts each API process keeps in memory
+REGISTERED_DOMAINS_CACHED=128
+# Send the canonical text of domains and problems (comments dropped, lowercase, set-like sections sorted)
+CANONICALIZE_PDDL=True
+# Send tasks whose grounding may be large to the workers of the large pool
+SIZE_ROUTING=os.environ.get('SIZE_ROUTING', 'false') == 'true'
+# Queue of the large pool (the other tasks go to Celery's default queue)
+LARGE_TASK_QUEUE='large'
+# Upper bound on ground atoms plus ground actions above which a task is large
+LARGE_TASK_GROUND_BOUND=10000000
+# Header carrying the API key that fair-share scheduling (FAIR_SHARE) accounts tasks to
+API_KEY_HEADER='X-API-Key'
+# Key required in the X-Admin-Key header by the /admin routes (unset disables them)
+ADMIN_KEY=os.environ.get('ADMIN_KEY')
@@ -0,0 +1,79 @@
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+
+MYSQL_USER=os.environ.get('MYSQL_USER', 'user')
+MYSQL_PASSWORD=os.environ.get('MYSQL_PASSWORD', 'password')
+MYSQL_HOST=os.environ.get('MYSQL_HOST', 'mysql')
+
+
+class MetaHistory:
+    """
+        Read-only view of the meta_basic table written by the workers, where
+        each finished task records its package name and duration, and of the
+        meta_features table holding the size statistics of its domain and
+        problem.
+
+        Aggregates are cached for `ttl` seconds. When the database cannot be
+        reached (e.g. when running the API locally without MySQL) the history
+        is simply empty.
+    """
+
+    def __init__(self, ttl=300, max_samples=50000):
+        self.ttl = ttl
+        self.max_samples = max_samples
+        self._engine = None
+        self._durations = {}
+        self._loaded_at = None
+        self._samples = {}
+        self._samples_loaded_at = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._engine is None:
+            self._engine = create_engine(f'mysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:3306/db', pool_recycle=500)
+        return self._engine
+
+    def durations(self):
+        """Return {package: (mean duration in seconds, number of runs)}."""
+
+        with self._lock:
+            if self._loaded_at is not None and time.time() - self._loaded_at < self.ttl:
+                return self._durations
+            try:
+                with self._connect().connect() as conn:
+                    rows = conn.execute(text("SELECT name, AVG(duration), COUNT(*) FROM meta_basic GROUP BY name"))
+                    self._durations = {name: (float(mean), int(count)) for name, mean, count in rows}
+            except Exception:
+                # Keep serving the last known history
+                pass
+            self._loaded_at = time.time()
+            return self._durations
+
+    def samples(self):
+        """
+            Return {package: [(statistics, duration in seconds)]} for the
+            max_samples tasks that finished last. The same object is returned
+            until the history is reloaded.
+        """
+
+        with self._lock:
+            if self._samples_loaded_at is not None and time.time() - self._samples_loaded_at < self.ttl:
+                return self._samples
+            try:
+                with self._connect().connect() as conn:
+                    rows = conn.execute(text("SELECT b.name, b.duration, f.objects, f.init_facts, f.goals, f.actions, f.max_arity "
+                                             "FROM meta_basic b JOIN meta_features f ON f.task_id = b.task_id ORDER BY f.id DESC LIMIT :n"),
+                                        {"n": self.max_samples})
+                    samples = {}
+                    for name, duration, objects, init_facts, goals, actions, max_arity in rows:
+                        stats = {"objects": objects, "init_facts": init_facts, "goals": goals, "actions": actions, "max_arity": max_arity}
+                        samples.setdefault(name, []).append((stats, float(duration)))
+                    self._samples = samples
+            except Exception:
+                # Keep serving the last known history
+                pass
+            self._samples_loaded_at = time.time()
+            return self._samples
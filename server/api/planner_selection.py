@@ -0,0 +1,53 @@
+from collections import OrderedDict
+
+# Features (see action_plan_parser.preflight.features) each package can handle.
+# Packages are listed from the one expected to be fastest to the slowest; this
+# order is used until there is enough run history to rank them.
+PLANNER_CAPABILITIES = OrderedDict([
+    ("lama-first", {"typing", "negative-preconditions", "disjunctive-preconditions", "equality",
+                    "quantified-preconditions", "conditional-effects", "derived-predicates", "action-costs"}),
+    ("dual-bfws-ffparser", {"typing", "negative-preconditions", "disjunctive-preconditions", "equality",
+                            "quantified-preconditions", "conditional-effects"}),
+    ("enhsp", {"typing", "negative-preconditions", "disjunctive-preconditions", "equality",
+               "quantified-preconditions", "conditional-effects", "action-costs", "numeric-fluents"}),
+    ("tfd", {"typing", "negative-preconditions", "equality", "action-costs", "numeric-fluents",
+             "durative-actions", "timed-initial-literals"}),
+    ("optic", {"typing", "negative-preconditions", "equality", "action-costs", "numeric-fluents",
+               "durative-actions", "timed-initial-literals", "preferences"}),
+    ("delfi", {"typing", "negative-preconditions", "equality", "action-costs"}),
+])
+
+
+def capable_planners(features, installed):
+    """Return the installed packages that handle every feature, in default order."""
+
+    return [p for p, supported in PLANNER_CAPABILITIES.items() if p in installed and set(features) <= supported]
+
+
+def select_planner(features, installed, durations=None, min_runs=20):
+    """
+        Pick the package to solve a problem with the given features.
+
+        Inputs:
+            features:   list of features the domain and problem need
+
+            installed:  names of the installed packages offering a solve service
+
+            durations:  {package: (mean duration, number of runs)} from past runs
+
+            min_runs:   runs a package needs before its history is trusted
+
+        Returns:
+            the package name, or None if no installed package is capable
+    """
+
+    candidates = capable_planners(features, installed)
+    if not candidates:
+        return None
+
+    # Rank by history only when every candidate has enough of it, as a package
+    # with a handful of runs on easy problems would otherwise always win
+    durations = durations or {}
+    if all(durations.get(p, (0, 0))[1] >= min_runs for p in candidates):
+        return min(candidates, key=lambda p: durations[p][0])
+    return candidates[0]
@@ -0,0 +1,59 @@
+import math
+import threading
+
+import numpy as np
+
+# Size statistics (see action_plan_parser.pddl_stats) the run time is regressed on
+FEATURES = ("objects", "init_facts", "goals", "actions", "max_arity")
+
+
+def _row(stats):
+    return [1.0] + [math.log1p(stats.get(f, 0)) for f in FEATURES]
+
+
+class RuntimeModel:
+    """
+        Predicts how long a package runs on a problem, from the run history
+        of the workers (see MetaHistory.samples).
+
+        Each package with at least `min_runs` recorded runs has its own
+        least-squares fit of log(1 + duration) on the log size statistics of
+        the domain and problem (with a small ridge term, as statistics such
+        as the arity barely vary within a domain). Packages with fewer runs
+        are predicted their mean duration, and packages never run None.
+        The fits are redone when the history is reloaded.
+    """
+
+    def __init__(self, history, min_runs=20, ridge=1.0):
+        self.history = history
+        self.min_runs = min_runs
+        self.ridge = ridge
+        self._samples = None
+        self._weights = {}
+        self._lock = threading.Lock()
+
+    def _fit(self, samples):
+        weights = {}
+        for package, runs in samples.items():
+            if len(runs) < self.min_runs:
+                continue
+            X = np.array([_row(stats) for stats, _ in runs])
+            y = np.log1p(np.array([duration for _, duration in runs]))
+            penalty = self.ridge * np.eye(X.shape[1])
+            penalty[0, 0] = 0
+            weights[package] = np.linalg.solve(X.T @ X + penalty, X.T @ y)
+        return weights
+
+    def predict(self, package, stats):
+        """Return the expected run time in seconds of package on a task with the given statistics (which may be None), or None if the package has no history."""
+
+        samples = self.history.samples()
+        with self._lock:
+            if samples is not self._samples:
+                self._weights = self._fit(samples)
+                self._samples = samples
+            weights = self._weights.get(package)
+        if weights is not None and stats is not None:
+            return max(float(np.expm1(np.dot(_row(stats), weights))), 0.0)
+        mean, runs = self.history.durations().get(package, (None, 0))
+        return mean if runs else None
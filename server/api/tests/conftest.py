@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The API modules import each other, and the shared modules, by their flat
+# names: put them on the path as app.py does. Importing the adaptor adds the
+# paths of the parser modules.
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+sys.path.append(os.path.join(API_DIR, "..", "shared"))
+
+os.environ.setdefault("BLOB_STORE_PATH", tempfile.mkdtemp(prefix="paas-blobs-"))
+
+from adaptor.adaptor import Adaptor  # noqa: E402,F401
+
+# A solve service in the form the workers run
+SOLVER = {"endpoint": {"services": {"solve": {
+    "args": [{"name": "domain", "type": "file"}, {"name": "problem", "type": "file"}],
+    "call": "lama-first {domain} {problem}",
+    "return": {"type": "generic", "files": "*plan*"}}}}}
+
+
+@pytest.fixture
+def api():
+    """The API's app module."""
+    import app
+    return app
+
+
+@pytest.fixture
+def sent(api, monkeypatch):
+    """The send_task calls of the API, run with no broker, Redis or MySQL at hand."""
+    calls = []
+
+    def send_task(name, **options):
+        calls.append(options)
+        return api.celery.AsyncResult(options.get("task_id") or "task-%d" % len(calls))
+
+    monkeypatch.setitem(api.PACKAGES, "lama-first", SOLVER)
+    monkeypatch.setattr(api, "FAIR_SHARE", False)
+    monkeypatch.setattr(api, "affinity_router", None)
+    monkeypatch.setattr(api, "check_lock", lambda: False)
+    monkeypatch.setattr(api.runtime_model, "predict", lambda package, stats: None)
+    monkeypatch.setattr(api.celery, "send_task", send_task)
+    return calls
@@ -0,0 +1,38 @@
+from domain_cache import DomainCache
+
+DOMAIN = """(define (domain rooms)
+  (:requirements :typing :conditional-effects)
+  (:types room ball)
+  (:predicates (at ?b - ball ?r - room) (near ?r ?rr - room) (lit ?r - room))
+  (:action move
+    :parameters (?b - ball ?r ?rr - room)
+    :precondition (and (at ?b ?r) (near ?r ?rr))
+    :effect (and (not (at ?b ?r)) (at ?b ?rr)
+                 (forall (?r - room) (when (near ?rr ?r) (lit ?r))))))"""
+
+
+def move():
+    _, act_map = DomainCache().get(DOMAIN)
+    return act_map["move"]
+
+
+def test_template_matches_the_export():
+    action = move()
+    for args in (["b1", "r1", "r2"], ["b100%", "r%s", "r"]):
+        assert action.ground_export(args) == action.export(grounding=args)
+
+
+def test_whole_arguments_are_substituted():
+    exported = move().export(grounding=["b1", "r1", "r2"])
+    assert "(at b1 r1)" in exported and "(near r1 r2)" in exported
+    assert "?rr" not in exported and "r1r" not in exported
+
+
+def test_forall_variables_shadow_parameters():
+    exported = move().export(grounding=["b1", "r1", "r2"])
+    assert "(near r2 ?r)" in exported and "(lit ?r)" in exported
+
+
+def test_wrong_arity_falls_back_to_export():
+    action = move()
+    assert action.ground_export(["b1"]) == action.export(grounding=["b1"])
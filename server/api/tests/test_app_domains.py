@@ -0,0 +1,52 @@
+import os
+
+DOMAINS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "testing", "benchmarks", "domains")
+PROBLEM = """(define (problem bw-3) (:domain blocks) (:objects b0 b1 b2)
+  (:init (clear b2) (ontable b0) (on b1 b0) (on b2 b1) (handempty))
+  (:goal (and (on b0 b1) (on b1 b2))))"""
+
+
+def blocksworld():
+    with open(os.path.join(DOMAINS, "blocksworld.pddl")) as f:
+        return f.read()
+
+
+def register(client, domain):
+    return client.post("/domains", json={"domain": domain}).get_json()
+
+
+def test_register_and_fetch(api):
+    with api.app.test_client() as client:
+        registered = register(client, blocksworld())
+        assert registered["parsed"] and registered["domain_name"] == "blocks" and registered["actions"] == 4
+        assert registered["features"] == []
+        # equivalent texts get the same id
+        assert register(client, "; same\n" + blocksworld().upper())["id"] == registered["id"]
+        fetched = client.get("/domains/" + registered["id"]).get_json()
+        assert "(:action pick-up" in fetched["domain"]
+
+
+def test_registered_domains_survive_the_process_cache(api):
+    with api.app.test_client() as client:
+        domain_id = register(client, blocksworld())["id"]
+        api.registered_domains.clear()
+        assert client.get("/domains/" + domain_id).status_code == 200
+        assert client.get("/domains/" + "0" * 64).status_code == 404
+        assert client.get("/domains/not-a-digest").status_code == 404
+
+
+def test_invalid_domains_are_rejected(api):
+    with api.app.test_client() as client:
+        assert register(client, "(define (domain d)")["Error"] == "Invalid PDDL"
+        assert "Error" in client.post("/domains", json={}).get_json()
+
+
+def test_tasks_refer_to_registered_domains(api, sent):
+    with api.app.test_client() as client:
+        domain_id = register(client, blocksworld())["id"]
+        assert "result" in client.post("/solver/", json={"domain_ref": domain_id, "problem": PROBLEM}).get_json()
+        unknown = client.post("/solver/", json={"domain_ref": "f" * 64, "problem": PROBLEM}).get_json()
+    assert "register the domain again" in unknown["Error"]
+    assert len(sent) == 1
+    # the task is sent the blob the domain was registered as
+    assert sent[0]["args"][1]["domain"]["value"]["__blob__"] == domain_id
@@ -0,0 +1,65 @@
+import pytest
+
+from blob_store import FILE_INLINE_BYTES
+from test_app_domains import PROBLEM, blocksworld
+
+
+@pytest.fixture(autouse=True)
+def size_routing(api, monkeypatch):
+    monkeypatch.setattr(api, "SIZE_ROUTING", True)
+
+
+def solve(api, domain):
+    with api.app.test_client() as client:
+        return client.post("/solver/", json={"domain": domain, "problem": PROBLEM}).get_json()
+
+
+def test_large_tasks_go_to_the_large_queue(api, sent, monkeypatch):
+    monkeypatch.setattr(api, "LARGE_TASK_GROUND_BOUND", 10)
+    domain = blocksworld()
+    assert len(domain) > FILE_INLINE_BYTES
+    assert "result" in solve(api, domain)
+    assert sent[0]["kwargs"]["size_class"] == "large"
+    assert sent[0]["queue"] == api.LARGE_TASK_QUEUE
+
+
+def test_small_tasks_go_to_the_shared_queue(api, sent):
+    assert "result" in solve(api, blocksworld())
+    assert sent[0]["kwargs"]["size_class"] == "small"
+    assert "queue" not in sent[0]
+
+
+def test_task_route_without_size_class(api, monkeypatch):
+    monkeypatch.setattr(api, "affinity_router", None)
+    assert api.task_route({"domain": {"value": "(define)"}}) == {}
+    assert api.task_route({}, "large") == {"queue": api.LARGE_TASK_QUEUE}
+
+
+def test_submitted_pddl_is_tokenized_once(api, sent, monkeypatch):
+    tokenized = []
+    tokenize = api.tokenize
+    monkeypatch.setattr(api, "tokenize", lambda text: tokenized.append(text) or tokenize(text))
+    assert solve(api, blocksworld())["planner"] == "lama-first"
+    assert len(tokenized) == 2
+    with api.app.test_client() as client:
+        response = client.post("/package/lama-first/solve", json={"domain": blocksworld(), "problem": PROBLEM},
+                               headers={"persistent": "true"}).get_json()
+    assert "result" in response and "planner" not in response
+    assert len(tokenized) == 4
+    assert sent[1]["kwargs"]["persistent"] == "true" and sent[1]["kwargs"]["size_class"] == sent[0]["kwargs"]["size_class"]
+
+
+@pytest.mark.parametrize("seconds", [0, -1, "nan", "inf", "-inf", float("inf"), "soon", True, [5]])
+def test_invalid_deadlines_are_rejected(api, seconds):
+    with pytest.raises(ValueError):
+        api.task_deadline({"deadline": seconds})
+
+
+def test_deadline_is_seconds_from_now(api, sent):
+    assert api.task_deadline({}) is None
+    deadline = api.task_deadline({"deadline": "30"})
+    assert 29 < deadline - api.time.time() <= 30
+    with api.app.test_client() as client:
+        response = client.post("/solver/", json={"domain": "(define)", "problem": PROBLEM, "deadline": "nan"}).get_json()
+    assert response == {"Error": "deadline must be a positive number of seconds"}
+    assert sent == []
@@ -0,0 +1,73 @@
+from action_plan_parser.canonical import canonicalize, canonical_tokens, canonical_text
+from action_plan_parser.preflight import tokenize
+from domain_cache import DomainCache, domain_digest
+from test_domain_cache import BLOCKS
+
+PROBLEM = """(define (problem p) (:domain d)
+  (:objects b a - block c - obj d) ; d is an object
+  (:init (on b a) (ON a  b) (on b a))
+  (:goal (and (z) (a))))"""
+DOMAIN = """(define (domain d) (:requirements :typing :strips) (:types t2 t1 - object) (:predicates (q ?x) (p))
+  (:action b :parameters () :effect (p)) (:action a :parameters () :effect (q)))"""
+
+
+def test_set_like_sections_are_sorted():
+    text, _ = canonicalize(PROBLEM)
+    assert text == "(define (problem p) (:domain d) (:objects a b - block c - obj d) (:init (on a b) (on b a)) (:goal (and (z) (a))))"
+    text, _ = canonicalize(DOMAIN)
+    assert text.startswith("(define (domain d) (:requirements :strips :typing) (:types t1 t2 - object) (:predicates (p) (q ?x))")
+    # actions and goals keep their order
+    assert text.endswith("(:action b :parameters () :effect (p)) (:action a :parameters () :effect (q)))")
+
+
+def test_equivalent_texts_share_a_digest():
+    text, digest = canonicalize(PROBLEM)
+    equivalent = """; comment
+    (DEFINE (problem P) (:domain d) (:objects c - obj a - block b - block d)
+      (:init (on a b) (on b a))
+      (:goal (and (z) (a))))"""
+    assert canonicalize(equivalent) == (text, digest)
+    assert canonicalize(text) == (text, digest)
+    assert canonicalize(PROBLEM.replace("(and (z) (a))", "(and (a) (z))"))[1] != digest
+
+
+def test_unbalanced_text_is_only_tokenized():
+    assert canonicalize("(define (domain d) (:predicates (q) (p)")[0] == "(define (domain d) (:predicates (q) (p)"
+
+
+def test_domain_digest_ignores_predicate_order():
+    reordered = BLOCKS.replace("(clear ?x) (handempty)", "(handempty) (clear ?x)", 1)
+    assert reordered != BLOCKS
+    assert domain_digest(reordered)[0] == domain_digest(BLOCKS)[0]
+    cache = DomainCache()
+    domain, _ = cache.get(BLOCKS)
+    assert cache.get(reordered)[0] is domain
+
+
+def test_canonical_arguments(api, monkeypatch):
+    arguments = {"domain": {"value": DOMAIN, "type": "file"}, "problem": {"value": PROBLEM, "type": "file"}, "n": {"value": 3, "type": "int"}}
+    canonical = api.canonical_arguments(arguments)
+    assert canonical["domain"]["value"] == canonicalize(DOMAIN)[0]
+    assert canonical["problem"] == {"value": canonicalize(PROBLEM)[0], "type": "file"}
+    assert canonical["n"] == {"value": 3, "type": "int"}
+    assert arguments["problem"]["value"] == PROBLEM
+    monkeypatch.setattr(api, "CANONICALIZE_PDDL", False)
+    assert api.canonical_arguments(arguments) is arguments
+
+
+def test_canonical_tokens_are_those_of_the_canonical_text():
+    for text in (PROBLEM, DOMAIN, "(define (domain d) (:predicates (q) (p)"):
+        tokens = canonical_tokens(tokenize(text))
+        canonical, digest = canonicalize(text)
+        assert tokens == tokenize(canonical)
+        assert canonical_text(tokens) == (canonical, digest) == canonicalize(text, tokenize(text))
+    # they are not read from a text
+    assert canonical_tokens(tokenize(PROBLEM)).offsets is None
+
+
+def test_canonical_arguments_replace_the_tokens(api):
+    arguments = {"domain": {"value": DOMAIN, "type": "file"}, "problem": {"value": PROBLEM, "type": "file"}}
+    tokens = api.pddl_tokens(arguments)
+    canonical = api.canonical_arguments(arguments, tokens)
+    assert canonical == api.canonical_arguments(arguments)
+    assert tokens == {name: tokenize(canonical[name]["value"]) for name in ("domain", "problem")}
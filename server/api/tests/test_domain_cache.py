@@ -0,0 +1,39 @@
+from domain_cache import DomainCache, domain_digest
+
+BLOCKS = """(define (domain blocks)
+  (:predicates (clear ?x) (handempty))
+  (:action pick-up :parameters (?x) :precondition (and (clear ?x) (handempty)) :effect (not (handempty))))"""
+
+
+def other(name):
+    return BLOCKS.replace("domain blocks", "domain " + name)
+
+
+def test_equivalent_texts_share_an_entry():
+    cache = DomainCache()
+    domain, act_map = cache.get(BLOCKS)
+    assert list(act_map) == ["pick-up"]
+    same, _ = cache.get("; comment\n" + BLOCKS.upper().replace("  ", "\t"))
+    assert same is domain
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = DomainCache(max_entries=2)
+    first, _ = cache.get(other("a"))
+    cache.get(other("b"))
+    cache.get(other("a"))
+    cache.get(other("c"))
+    assert cache.get(other("a"))[0] is first
+    assert cache.stats()["evictions"] == 1 and cache.stats()["entries"] == 2
+    cache.get(other("b"))
+    assert cache.stats()["misses"] == 4
+
+
+def test_size_bound():
+    size = len(domain_digest(BLOCKS)[1])
+    cache = DomainCache(max_bytes=size + size // 2)
+    cache.get(other("a"))
+    cache.get(other("b"))
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] <= size + size // 2
@@ -0,0 +1,35 @@
+from grounder import GroundProblem
+
+DOMAIN = """(define (domain roads)
+  (:requirements :strips :typing)
+  (:types place vehicle - object truck - vehicle)
+  (:predicates (at ?v - vehicle ?p - place) (road ?from ?to - place) (visited ?p - place))
+  (:action drive
+    :parameters (?v - vehicle ?from ?to - place)
+    :precondition (and (at ?v ?from) (road ?from ?to))
+    :effect (and (not (at ?v ?from)) (at ?v ?to) (visited ?to))))"""
+
+PROBLEM = """(define (problem roads-1) (:domain roads)
+  (:objects t - truck a b c d - place)
+  (:init (at t a) (road a b) (road b c) (road d a))
+  (:goal (visited c)))"""
+
+
+def names(items):
+    return sorted(str(i) for i in items)
+
+
+def test_only_reachable_operators_are_grounded():
+    task = GroundProblem(DOMAIN, PROBLEM)
+    assert [o.name for o in sorted(task.operators, key=lambda o: o.name)] == ["drive_t_a_b", "drive_t_b_c"]
+    assert "at(t d)" not in names(task.fluents)
+    assert "visited(c)" in names(task.fluents)
+
+
+def test_exhaustive_grounding_is_a_superset():
+    pruned = GroundProblem(DOMAIN, PROBLEM)
+    naive = GroundProblem(DOMAIN, PROBLEM, reachability=False)
+    assert set(o.name for o in pruned.operators) < set(o.name for o in naive.operators)
+    assert set(names(pruned.fluents)) < set(names(naive.fluents))
+    # objects of subtypes are candidates for their supertype's parameters
+    assert "drive_t_d_a" in set(o.name for o in naive.operators)
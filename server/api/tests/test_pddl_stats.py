@@ -0,0 +1,43 @@
+from action_plan_parser.pddl_stats import pddl_statistics, size_bounds
+from action_plan_parser.preflight import tokenize
+from test_grounder import DOMAIN, PROBLEM
+
+UNTYPED = """(define (domain gripper) (:constants left right)
+  (:predicates (at ?b ?r) (free ?g))
+  (:action pick :parameters (?b ?r ?g) :precondition (and (at ?b ?r) (free ?g)) :effect (not (at ?b ?r))))"""
+
+
+def test_bounds_count_subtypes():
+    bounds = size_bounds(DOMAIN, PROBLEM)
+    assert bounds["objects_per_type"] == {"object": 5, "vehicle": 1, "truck": 1, "place": 4}
+    # at: 1 vehicle x 4 places, road: 4 x 4, visited: 4
+    assert bounds["ground_atoms"] == 4 + 16 + 4
+    # drive: 1 vehicle x 4 x 4 places
+    assert bounds["ground_actions"] == 16
+
+
+def test_bounds_count_constants_and_either_types():
+    bounds = size_bounds(UNTYPED, "(define (problem g) (:domain gripper) (:objects b1 b2 room))")
+    assert bounds["objects_per_type"] == {"object": 5}
+    assert bounds["ground_atoms"] == 25 + 5
+    assert bounds["ground_actions"] == 125
+    either = DOMAIN.replace("(visited ?p - place)", "(visited ?p - (either place vehicle))")
+    assert size_bounds(either, PROBLEM)["ground_atoms"] == 4 + 16 + 5
+
+
+def test_size_class(api, monkeypatch):
+    arguments = {"domain": {"value": DOMAIN, "type": "file"}, "problem": {"value": PROBLEM, "type": "file"}}
+    monkeypatch.setattr(api, "SIZE_ROUTING", False)
+    assert api.task_size_class(arguments) is None
+    monkeypatch.setattr(api, "SIZE_ROUTING", True)
+    monkeypatch.setattr(api, "LARGE_TASK_GROUND_BOUND", 40)
+    assert api.task_size_class(arguments) == "small"
+    monkeypatch.setattr(api, "LARGE_TASK_GROUND_BOUND", 39)
+    assert api.task_size_class(arguments) == "large"
+    assert api.task_size_class({"domain": arguments["domain"]}) is None
+
+
+def test_statistics_of_given_tokens():
+    tokens = (tokenize(DOMAIN), tokenize(PROBLEM))
+    assert size_bounds(DOMAIN, PROBLEM, tokens) == size_bounds(DOMAIN, PROBLEM)
+    assert pddl_statistics(DOMAIN, PROBLEM, tokens) == pddl_statistics(DOMAIN, PROBLEM)
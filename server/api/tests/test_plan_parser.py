@@ -0,0 +1,36 @@
+import os
+
+from action_plan_parser.plan_parser import Plan
+
+PLANS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "testing", "benchmarks", "plans")
+
+
+def read(name):
+    with open(os.path.join(PLANS, name)) as f:
+        return Plan(f.read())
+
+
+def test_classical_steps():
+    steps = list(Plan("(unstack b2 b1)\n( put-down   b2 )\n()\n"))
+    assert [(s.name, s.args, s.text) for s in steps] == [("unstack", ("b2", "b1"), "(unstack b2 b1)"),
+                                                         ("put-down", ("b2",), "(put-down b2)")]
+    assert steps[0].time is None and steps[0].duration is None
+
+
+def test_cost_comment_is_read_on_the_same_pass():
+    plan = read("costed.plan")
+    assert plan.cost is None
+    steps = list(plan)
+    assert steps[-1].name == "drop"
+    assert plan.cost == 27
+    plan = Plan("(a)\n; cost: 1.5")
+    list(plan)
+    assert plan.cost == 1.5
+
+
+def test_timed_steps():
+    steps = list(read("temporal.plan"))
+    assert str(steps[0]) == "0.0: (load-truck obj1 tru1 pos1) [2.0]"
+    assert (steps[0].time, steps[0].duration) == (0.0, 2.0)
+    numeric = list(read("numeric.plan"))
+    assert numeric[0].time == 0.0 and numeric[0].duration is None
@@ -0,0 +1,28 @@
+from action_plan_parser.preflight import features
+from planner_selection import capable_planners, select_planner
+
+INSTALLED = ["lama-first", "dual-bfws-ffparser", "enhsp", "optic", "delfi"]
+
+TEMPORAL = """(define (domain t) (:requirements :durative-actions :typing)
+  (:types truck)
+  (:durative-action drive :parameters (?t - truck) :duration (= ?duration 2)
+    :condition (at start (ready ?t)) :effect (at end (not (ready ?t)))))"""
+
+
+def test_capable_planners_in_default_order():
+    assert capable_planners(["typing"], INSTALLED) == INSTALLED
+    assert capable_planners(["numeric-fluents"], INSTALLED) == ["enhsp", "optic"]
+    assert capable_planners(["preferences", "numeric-fluents"], ["lama-first"]) == []
+
+
+def test_temporal_domains_go_to_a_temporal_planner():
+    assert features(TEMPORAL) == ["durative-actions", "typing"]
+    assert select_planner(features(TEMPORAL), INSTALLED) == "optic"
+
+
+def test_history_ranks_only_when_every_candidate_has_enough():
+    durations = {"lama-first": (9.0, 50), "dual-bfws-ffparser": (1.0, 50)}
+    assert select_planner(["typing"], ["lama-first", "dual-bfws-ffparser"], durations, 20) == "dual-bfws-ffparser"
+    durations["dual-bfws-ffparser"] = (1.0, 5)
+    assert select_planner(["typing"], ["lama-first", "dual-bfws-ffparser"], durations, 20) == "lama-first"
+    assert select_planner(["durative-actions"], ["lama-first"]) is None
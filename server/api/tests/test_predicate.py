@@ -0,0 +1,60 @@
+import pytest
+
+from predicate import Predicate
+from formula import And, Primitive
+from action import Action
+
+
+def test_arguments_are_interned_tuples():
+    # names built at run time, which Python does not intern by itself
+    a = Predicate("on", [("?x", "block"), ("?y", "block")])
+    b = Predicate("".join(["o", "n"]), [("?x", "".join(["bl", "ock"])), ("?y", "block")])
+    assert a.args == (("?x", "block"), ("?y", "block"))
+    assert a.name is b.name
+    assert a.args[0][1] is b.args[0][1]
+    assert a == b and hash(a) == hash(b)
+
+
+def test_objects_are_slotted():
+    p = Predicate("handempty", [])
+    with pytest.raises(AttributeError):
+        p.extra = 1
+    with pytest.raises(AttributeError):
+        Action("noop", [], None, None, None).extra = 1
+
+
+def test_fluents_and_predicates_differ():
+    fluent = Predicate("clear", None, [("a", "block")])
+    assert fluent != Predicate("clear", [("a", "block")])
+    assert fluent == Predicate("clear", None, (("a", "block"),))
+    assert fluent.export(0) == "(clear a - block)"
+    assert fluent.export(0, untyped=True) == "(clear a)"
+
+
+def test_to_ground_shares_the_fluent_without_changing_the_predicate():
+    lifted = Predicate("clear", [("a", "block")])
+    fluent = Predicate("clear", None, [("a", "block")])
+    primitive = Primitive(lifted)
+    And([primitive]).to_ground({hash(fluent): fluent})
+    assert primitive.predicate is fluent
+    assert lifted.args == (("a", "block"),) and lifted.ground_args is None
+
+
+def test_predicates_are_immutable():
+    fluent = Predicate("clear", None, [("a", "block")])
+    key = hash(fluent)
+    for attr in ("name", "args", "ground_args", "_hash"):
+        with pytest.raises(AttributeError):
+            setattr(fluent, attr, None)
+        with pytest.raises(AttributeError):
+            delattr(fluent, attr)
+    assert hash(fluent) == key and fluent.name == "clear"
+
+
+def test_copies_stay_equal_and_interned():
+    import copy
+    import pickle
+    fluent = Predicate("clear", None, [("a", "block")])
+    for clone in (copy.copy(fluent), copy.deepcopy(fluent), pickle.loads(pickle.dumps(fluent))):
+        assert clone == fluent and hash(clone) == hash(fluent)
+        assert clone.name is fluent.name
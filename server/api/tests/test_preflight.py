@@ -0,0 +1,62 @@
+from action_plan_parser.preflight import preflight, features, tokenize
+
+DOMAIN = """(define (domain blocks)
+  (:requirements :strips :typing)
+  (:types block)
+  (:predicates (on ?x ?y - block) (clear ?x - block) (handempty))
+  (:action pick-up
+    :parameters (?x - block)
+    :precondition (and (clear ?x) (handempty))
+    :effect (not (handempty))))
+"""
+
+
+def problem(sections):
+    return "(define (problem p) (:domain blocks) (:objects a b - block) %s)" % sections
+
+
+def messages(errors):
+    return [e["message"] for e in errors]
+
+
+def test_valid_files_pass():
+    assert preflight(DOMAIN, problem("(:init (clear a) (on a b)) (:goal (handempty))")) == []
+
+
+def test_length_section_is_accepted():
+    text = problem("(:init (clear a)) (:goal (handempty)) (:length (:serial 4) (:parallel 2))")
+    assert preflight(DOMAIN, text) == []
+
+
+def test_unknown_sections_are_reported():
+    errors = preflight(DOMAIN, problem("(:init) (:goal (handempty)) (:horizon 3)"))
+    assert messages(errors) == ["unknown problem section :horizon"]
+
+
+def test_arity_type_and_domain_errors_have_positions():
+    errors = preflight(DOMAIN, "(define (problem p) (:domain other)\n (:objects a - ball) (:init (on a)) (:goal (handempty)))")
+    assert messages(errors) == ["problem is for domain other, but the domain is blocks",
+                                "undeclared type ball", "on expects 2 arguments, got 1"]
+    assert (errors[1]["line"], errors[1]["column"]) == (2, 16)
+
+
+def test_unbalanced_parentheses():
+    errors = preflight(DOMAIN[:-2])
+    assert errors[0]["file"] == "domain"
+    assert errors[0]["message"] == "'(' is never closed"
+
+
+def test_features_from_requirements_and_use():
+    # negated effects are not negative preconditions
+    assert features(DOMAIN) == ["typing"]
+    assert features(DOMAIN.replace("(handempty))\n    :effect", "(not (handempty)))\n    :effect")) == \
+        ["negative-preconditions", "typing"]
+    assert features("(define (domain d) (:requirements :durative-actions))") == ["durative-actions"]
+
+
+def test_tokens_are_reused():
+    text = "(define (problem p) (:domain other)\n (:objects a - ball) (:init (on a)) (:goal (handempty)))"
+    tokens = (tokenize(DOMAIN), tokenize(text))
+    assert tokens[1][:3] == ["(", "define", "("] and tokens[1].offsets[:3] == [0, 1, 8]
+    assert preflight(DOMAIN, text, tokens=tokens) == preflight(DOMAIN, text)
+    assert features(DOMAIN, None, (tokens[0], None)) == features(DOMAIN)
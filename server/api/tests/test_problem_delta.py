@@ -0,0 +1,120 @@
+import os
+
+import pytest
+
+from action_plan_parser.problem_delta import apply_delta
+
+DOMAINS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "testing", "benchmarks", "domains")
+PROBLEM = """(define (problem bw-3) (:domain blocks)
+  (:objects b0 b1 b2) ; three blocks
+  (:init (clear b2) (ontable b0) (on b1 b0) (on b2 b1) (handempty))
+  (:goal (and (on b0 b1) (on b1 b2))))"""
+PLAN = "(unstack b2 b1)\n(put-down b2)\n(unstack b1 b0)\n(stack b1 b2)\n(pick-up b0)\n(stack b0 b1)\n"
+
+
+def test_add_and_remove_init_facts():
+    edited = apply_delta(PROBLEM, add_init=["(ON b2 b0)"], remove_init=["( on  b2 b1 )", "(clear b2)"])
+    assert "(on b2 b1)" not in edited and "(clear b2)" not in edited
+    assert "(ON b2 b0)" in edited and "(on b1 b0)" in edited
+    # the other sections keep their text
+    assert "(:objects b0 b1 b2) ; three blocks" in edited
+    assert "(:goal (and (on b0 b1) (on b1 b2)))" in edited
+
+
+def test_added_facts_are_not_duplicated():
+    edited = apply_delta(PROBLEM, add_init=["(handempty)", "(on b0 b2)", "(on b0 b2)"])
+    assert edited.count("(handempty)") == 1
+    assert edited.count("(on b0 b2)") == 1
+
+
+def test_edit_goal_conjuncts():
+    edited = apply_delta(PROBLEM, add_goals=["(clear b0)"], remove_goals=["(on b0 b1)"])
+    assert "(:goal (and (on b1 b2) (clear b0)))" in edited
+    # a goal that is a single fact is edited as a conjunction of one
+    single = apply_delta(PROBLEM, goal="(on b0 b1)")
+    assert "(:goal (on b0 b1))" in single
+    assert "(:goal (and (on b0 b1) (clear b2)))" in apply_delta(single, add_goals=["(clear b2)"])
+
+
+def test_replace_goal():
+    edited = apply_delta(PROBLEM, goal="(and (on b2 b0))", add_init=["(clear b0)"])
+    assert "(:goal (and (on b2 b0)))" in edited
+    assert "(clear b0)" in edited
+
+
+@pytest.mark.parametrize("changes", [
+    {"remove_init": ["(on b0 b2)"]},
+    {"remove_goals": ["(clear b0)"]},
+    {"add_init": ["handempty"]},
+    {"add_init": ["()"]},
+])
+def test_invalid_changes(changes):
+    with pytest.raises(ValueError):
+        apply_delta(PROBLEM, **changes)
+
+
+def test_problem_without_sections():
+    with pytest.raises(ValueError):
+        apply_delta("(define (problem p) (:domain blocks) (:init (handempty)))", add_init=["(clear b0)"])
+    with pytest.raises(ValueError):
+        apply_delta(PROBLEM + ")", add_init=["(clear b0)"])
+
+
+@pytest.fixture
+def previous(api, sent, monkeypatch):
+    """A finished lama-first task on PROBLEM whose result is PLAN. Returns the answers the API stores itself."""
+    with open(os.path.join(DOMAINS, "blocksworld.pddl")) as f:
+        domain = f.read()
+    result = {"output": {"sas_plan.1": "(pick-up b0)\n", "sas_plan.2": PLAN}, "output_type": "generic", "planner": "lama-first"}
+    arguments = {"domain": {"value": domain, "type": "file"}, "problem": {"value": PROBLEM, "type": "file"}}
+    monkeypatch.setattr(api, "load_task", lambda task_id: (result, arguments) if task_id == "done" else None)
+    monkeypatch.setattr(api, "task_kwargs", lambda task_id: {})
+    stored = []
+    monkeypatch.setattr(api, "store_answer", lambda arguments, result, persistent=False: stored.append((arguments, result, persistent)) or "answer")
+    return stored
+
+
+def resolve(api, task_id, changes):
+    with api.app.test_client() as client:
+        return client.post("/resolve/%s" % task_id, json=changes).get_json()
+
+
+def test_resolve_reuses_a_plan_still_valid(api, sent, previous):
+    response = resolve(api, "done", {"add_init": ["(clear b0)"], "remove_goals": ["(on b0 b1)"]})
+    assert response["reused"] is True and "/check/answer" in response["result"]
+    assert sent == []
+    arguments, result, persistent = previous[0]
+    assert result["output"] == {"sas_plan.2": PLAN} and persistent is False
+    assert result["resolved_from"] == "done"
+    assert "(clear b0)" in arguments["problem"]["value"]
+
+
+def test_resolve_runs_the_planner_again(api, sent, previous):
+    response = resolve(api, "done", {"goal": "(and (on b2 b1) (on b1 b0))", "remove_init": ["(on b2 b1)"], "add_init": ["(ontable b2)", "(clear b1)"]})
+    assert response["reused"] is False and response["planner"] == "lama-first"
+    assert previous == []
+    assert len(sent) == 1
+    assert "(ontable b2)" in sent[0]["args"][1]["problem"]["value"]
+
+
+def test_resolve_keeps_the_persistence_and_client_of_the_task(api, sent, previous, monkeypatch):
+    monkeypatch.setattr(api, "task_kwargs", lambda task_id: {"persistent": "true", "client": "key-original"})
+    queued = []
+    monkeypatch.setattr(api, "FAIR_SHARE", True)
+    monkeypatch.setattr(api.fair_share, "enqueue", lambda client, task_id, entry, cost: queued.append((client, entry)))
+    monkeypatch.setattr(api.fair_share, "wake", lambda: None)
+    response = resolve(api, "done", {"goal": "(and (on b2 b1) (on b1 b0))", "remove_init": ["(on b2 b1)"], "add_init": ["(ontable b2)", "(clear b1)"]})
+    assert response["reused"] is False
+    client, entry = queued[0]
+    assert client == "key-original"
+    assert entry["kwargs"]["persistent"] == "true" and entry["kwargs"]["client"] == "key-original"
+
+    resolve(api, "done", {"add_init": ["(clear b0)"], "remove_goals": ["(on b0 b1)"]})
+    assert previous[0][2] is True
+
+
+def test_resolve_errors(api, sent, previous):
+    assert "no result yet" in resolve(api, "pending", {})["Error"]
+    assert resolve(api, "done", {"remove_init": ["(on b0 b2)"]})["Error"].startswith("Could not apply the changes")
+    assert "not installed" in resolve(api, "done", {"planner": "no-such-planner"})["Error"]
+    assert sent == [] and previous == []
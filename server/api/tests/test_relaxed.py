@@ -0,0 +1,54 @@
+import pytest
+
+from relaxed import relaxed_precheck
+
+from test_grounder import DOMAIN, PROBLEM
+from test_planner_selection import TEMPORAL
+
+
+def test_reachable_goal_estimates():
+    summary = relaxed_precheck(DOMAIN, PROBLEM)
+    assert summary["solvable"] is None and summary["unreachable_goals"] == []
+    assert (summary["h_add"], summary["h_ff"]) == (2, 2)
+    assert summary["operators"] == 2
+
+
+def test_h_add_counts_shared_subgoals_twice():
+    summary = relaxed_precheck(DOMAIN, PROBLEM.replace("(visited c)", "(and (visited b) (visited c))"))
+    assert (summary["h_add"], summary["h_ff"]) == (3, 2)
+
+
+def test_unreachable_goals_prove_unsolvable():
+    summary = relaxed_precheck(DOMAIN, PROBLEM.replace("(visited c)", "(and (visited c) (visited d))"))
+    assert summary["solvable"] is False
+    assert summary["unreachable_goals"] == ["(visited d)"]
+    assert summary["h_add"] is None and summary["h_ff"] is None
+
+
+PRECONDITION = "(and (at ?v ?from) (road ?from ?to))"
+EFFECT = "(and (not (at ?v ?from)) (at ?v ?to) (visited ?to))"
+UNSUPPORTED = {
+    "derived": DOMAIN[:-1] + " (:derived (reachable ?p - place) (visited ?p)))",
+    "derived-requirement": DOMAIN.replace(":typing", ":typing :derived-predicates"),
+    "numeric": DOMAIN.replace("(:action", "(:functions (fuel ?v - vehicle)) (:action")
+                     .replace(EFFECT, EFFECT[:-1] + " (decrease (fuel ?v) 1))"),
+    "comparison": DOMAIN.replace(PRECONDITION, PRECONDITION[:-1] + " (> (fuel ?v) 0))"),
+    "conditional": DOMAIN.replace(EFFECT, EFFECT[:-1] + " (when (road ?to ?from) (visited ?from)))"),
+    "equality": DOMAIN.replace(PRECONDITION, PRECONDITION[:-1] + " (not (= ?from ?to)))"),
+}
+
+
+@pytest.mark.parametrize("kind", sorted(UNSUPPORTED))
+def test_unsupported_domains_give_no_estimate(kind):
+    assert relaxed_precheck(UNSUPPORTED[kind], PROBLEM) is None
+
+
+def test_durative_domains_give_no_estimate():
+    assert relaxed_precheck(TEMPORAL, "(define (problem p) (:domain t) (:init) (:goal (ready x)))") is None
+
+
+def test_negative_preconditions_are_relaxed_away():
+    domain = DOMAIN.replace("(and (at ?v ?from) (road ?from ?to))", "(and (at ?v ?from) (road ?from ?to) (not (visited ?to)))")
+    summary = relaxed_precheck(domain, PROBLEM)
+    assert summary["solvable"] is None
+    assert (summary["h_add"], summary["h_ff"]) == (2, 2)
@@ -0,0 +1,62 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from meta_history import MetaHistory
+from runtime_model import RuntimeModel
+
+
+class History:
+    """A fixed run history, in the form of MetaHistory."""
+
+    def __init__(self, samples):
+        self._samples = samples
+
+    def samples(self):
+        return self._samples
+
+    def durations(self):
+        return {p: (sum(d for _, d in runs) / len(runs), len(runs)) for p, runs in self._samples.items()}
+
+
+def stats(objects):
+    return {"objects": objects, "init_facts": 2 * objects, "goals": objects, "actions": 4, "max_arity": 2}
+
+
+def test_fit_follows_the_size_of_the_task():
+    # run time grows with the square of the number of objects
+    runs = [(stats(n), 0.01 * n * n) for n in range(2, 60)]
+    model = RuntimeModel(History({"lama-first": runs}), min_runs=20)
+    small, large = model.predict("lama-first", stats(5)), model.predict("lama-first", stats(50))
+    assert small < large
+    assert large == pytest.approx(25, rel=0.5)
+
+
+def test_few_runs_predict_the_mean_and_none_predict_nothing():
+    model = RuntimeModel(History({"lama-first": [(stats(3), 1.0), (stats(30), 3.0)]}), min_runs=20)
+    assert model.predict("lama-first", stats(100)) == 2.0
+    assert model.predict("lama-first", None) == 2.0
+    assert model.predict("optic", stats(3)) is None
+
+
+@pytest.fixture
+def history(tmp_path):
+    engine = create_engine("sqlite:///%s" % (tmp_path / "db.sqlite"))
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE meta_basic (task_id VARCHAR(255), name VARCHAR(255), duration DECIMAL(6,2))"))
+        conn.execute(text("CREATE TABLE meta_features (id INTEGER PRIMARY KEY AUTOINCREMENT, task_id VARCHAR(255) UNIQUE, "
+                          "objects INT, init_facts INT, goals INT, actions INT, max_arity INT)"))
+        for i in range(10):
+            conn.execute(text("INSERT INTO meta_basic VALUES (:t, 'lama-first', :d)"), {"t": "t%d" % i, "d": i})
+            conn.execute(text("INSERT INTO meta_features (task_id, objects, init_facts, goals, actions, max_arity) "
+                              "VALUES (:t, :n, 1, 1, 1, 1)"), {"t": "t%d" % i, "n": i})
+    history = MetaHistory(ttl=300, max_samples=3)
+    history._engine = engine
+    return history
+
+
+def test_samples_are_the_most_recent_runs(history):
+    runs = history.samples()["lama-first"]
+    assert sorted(duration for _, duration in runs) == [7.0, 8.0, 9.0]
+    # cached until the history is reloaded
+    assert history.samples() is history.samples()
+    assert history.durations() == {"lama-first": (4.5, 10)}
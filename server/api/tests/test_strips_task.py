@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from grounder import GroundProblem
+from strips_task import StripsTask
+
+from test_grounder import DOMAIN, PROBLEM
+
+
+@pytest.fixture
+def task():
+    return StripsTask.from_ground_problem(GroundProblem(DOMAIN, PROBLEM))
+
+
+def test_search_reaches_the_goal(task):
+    states = np.atleast_2d(task.init)
+    plan = []
+    for _ in range(2):
+        assert not task.is_goal(states).any()
+        ops = np.flatnonzero(task.applicable(states)[0])
+        assert len(ops) == 1
+        plan.append(task.operators[ops[0]])
+        states = task.successors(states, [0], ops)
+    assert plan == ["drive_t_a_b", "drive_t_b_c"]
+    assert task.is_goal(states).all()
+    held = set(task.fluents[i] for i in np.flatnonzero(task.unpack(states)[0]))
+    assert ("at", ("t", "c")) in held and ("at", ("t", "a")) not in held
+
+
+def test_batches(task):
+    after = task.successors(task.init, [0], [task.operators.index("drive_t_a_b")])
+    states = np.vstack([np.atleast_2d(task.init), after])
+    applicable = task.applicable(states)
+    assert applicable.shape == (2, len(task.operators))
+    assert [task.operators[i] for i in np.flatnonzero(applicable[1])] == ["drive_t_b_c"]
+    assert (task.unpack(task.pack(task.unpack(states))) == task.unpack(states)).all()
+
+
+def test_unreachable_goals_stay_representable():
+    task = StripsTask.from_ground_problem(GroundProblem(DOMAIN, PROBLEM.replace("(visited c)", "(visited d)")))
+    assert task.fluents[task.goal[0]] == ("visited", ("d",))
+    assert not task.is_goal(task.init).any()
+
+
+def test_non_strips_operators_are_rejected():
+    domain = DOMAIN.replace("(and (at ?v ?from) (road ?from ?to))", "(and (at ?v ?from) (not (visited ?to)))")
+    with pytest.raises(ValueError):
+        StripsTask.from_ground_problem(GroundProblem(domain, PROBLEM))
+
+
+def test_relaxed_task_drops_negative_conditions_and_deletes():
+    domain = DOMAIN.replace("(and (at ?v ?from) (road ?from ?to))", "(and (at ?v ?from) (not (visited ?to)))")
+    task = StripsTask.from_ground_problem(GroundProblem(domain, PROBLEM), relaxed=True)
+    assert len(task.del_indices) == 0
+    assert all(task.fluents[i][0] == "at" for i in task.pre_indices)
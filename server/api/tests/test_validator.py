@@ -0,0 +1,65 @@
+from domain_cache import DOMAIN_CACHE
+from action_plan_parser.plan_parser import Plan
+from action_plan_parser.validator import PlanValidator
+
+DOMAIN = """
+(define (domain marking)
+  (:requirements :strips :conditional-effects :universal-preconditions :negative-preconditions)
+  (:predicates (item ?x) (link ?x ?y) (blocked ?x ?y) (marked ?x))
+  (:action mark
+    :parameters (?x ?y)
+    :precondition (and (item ?y) (forall (?x ?z) (not (blocked ?x ?z))))
+    :effect (forall (?x ?z) (when (link ?x ?z) (marked ?z)))))
+"""
+
+PROBLEM = """
+(define (problem marking-1)
+  (:domain marking)
+  (:objects a b c)
+  (:init (item a) (link a b) %s)
+  (:goal (marked b)))
+"""
+
+
+def validate(init, plan):
+    domain, _ = DOMAIN_CACHE.get(DOMAIN)
+    return PlanValidator(domain.with_problem(PROBLEM % init)).validate(Plan(plan))
+
+
+def test_forall_shadowing_a_parameter_binds_each_variable():
+    result = validate("", "(mark c a)")
+    assert result["valid"], result
+
+
+def test_forall_shadowing_a_parameter_in_a_precondition():
+    result = validate("(blocked a b)", "(mark c a)")
+    assert not result["valid"]
+    assert result["failed_step"] == 0
+
+
+def test_unknown_action_and_arity():
+    assert validate("", "(paint a)")["error"] == "unknown action paint"
+    assert validate("", "(mark a)")["error"] == "mark expects 2 arguments, got 1"
+
+
+def test_unknown_objects_are_rejected():
+    result = validate("", "(mark c z)")
+    assert not result["valid"] and result["failed_step"] == 0
+    assert result["error"] == "unknown object z in (mark c z)"
+
+
+def test_arguments_must_have_the_parameter_type():
+    from test_grounder import DOMAIN as ROADS, PROBLEM as ROADS_PROBLEM
+    domain, _ = DOMAIN_CACHE.get(ROADS)
+    validator = PlanValidator(domain.with_problem(ROADS_PROBLEM))
+    result = validator.validate(Plan("(drive a t b)"))
+    assert result["failed_step"] == 0
+    assert result["error"] == "?v of (drive a t b) must be of type vehicle, got a"
+    assert validator.validate(Plan("(drive t a b)\n(drive t b c)"))["valid"]
+
+
+def test_deltas_are_sorted():
+    result = PlanValidator(DOMAIN_CACHE.get(DOMAIN)[0].with_problem(PROBLEM % "(link a c)")) \
+        .validate(Plan("(mark c a)"), trajectory="deltas")
+    assert result["valid"], result
+    assert result["deltas"] == [{"add": ["(marked b)", "(marked c)"], "del": []}]
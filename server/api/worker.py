@@ -1,9 +1,18 @@
 import os
+import sys
 from celery import Celery
 
+# Serializer shared with the workers (installed in the image, or next to this folder in local dev)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+from compact_serializer import use_compact_serializer
+from scheduling import use_deadline_priorities
+
 
 CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379'),
 CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379')
 
 
 celery = Celery('tasks', broker=CELERY_BROKER_URL, backend=CELERY_RESULT_BACKEND)
+use_compact_serializer(celery)
+# Queues ordered by task deadline, as in the workers
+use_deadline_priorities(celery)
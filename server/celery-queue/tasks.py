@@ -1,4 +1,5 @@
 import os
+import sys
 import shutil
 import time
 import tempfile
@@ -7,12 +8,26 @@ import subprocess
 import json
 import glob
 import time
+import hashlib
+import logging
 from db import MetaDB
+# Result store shared with the API (installed in the image, or next to this folder in local dev)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+from blob_store import get_store, offload_result, expiry, sweep_if_due, is_blob, LocalBlobCache, LocalFileCache
+from compact_serializer import use_compact_serializer
+from affinity import TASK_AFFINITY, start_heartbeat, stop_heartbeat
+from scheduling import use_deadline_priorities, skip_reason, count_skip
+from metrics import incr
+from fair_share import release, charge
 from functools import wraps
 
 from celery import Celery
+import planutils
 from planutils.package_installation import PACKAGES
-from celery.exceptions import SoftTimeLimitExceeded
+from celery.exceptions import SoftTimeLimitExceeded, Ignore
+from celery.signals import worker_ready, worker_shutdown, task_revoked, task_postrun
+from celery.utils.nodenames import worker_direct
+import celery.worker.state as worker_state
 
 CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0'),
 CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
@@ -20,17 +35,78 @@ CELERY_RESULT_EXPIRE=os.environ.get('CELERY_RESULT_EXPIRE', 86400)
 
 WEB_DOCKER_URL = os.environ.get('WEB_DOCKER_URL', None)
 TIME_LIMIT=int(os.environ.get('TIME_LIMIT', 20))
+# Cache Fast Downward's translation (output.sas) of each domain and problem, and its size limit in bytes
+FD_TRANSLATE_CACHE=os.environ.get('FD_TRANSLATE_CACHE', 'false') == 'true'
+FD_CACHE_PATH=os.environ.get('FD_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'paas-sas-cache'))
+FD_CACHE_BYTES=int(os.environ.get('FD_CACHE_BYTES', 1024 * 1024 * 1024))
+# Pool of this worker: "small", or "large" for the workers consuming the API's LARGE_TASK_QUEUE
+WORKER_POOL=os.environ.get('WORKER_POOL', 'small')
+# Peak memory (MB) a task of the small pool may use; tasks above it should have been classed large
+SMALL_TASK_MEMORY_MB=int(os.environ.get('SMALL_TASK_MEMORY_MB', 400))
 celery = Celery('tasks', broker=CELERY_BROKER_URL, backend=CELERY_RESULT_BACKEND)
 celery.conf.update(result_extended=True)
 # result_expires in seconds: https://docs.celeryq.dev/en/latest/userguide/configuration.html#result-expires
 celery.conf.update(result_expires=CELERY_RESULT_EXPIRE)
+# msgpack + zstd for task arguments and results, as in the API (worker.py)
+use_compact_serializer(celery)
+# Each worker also consumes its own queue, to which the API routes tasks by domain (see shared/affinity.py)
+celery.conf.update(worker_direct=TASK_AFFINITY)
+# Tasks are taken by deadline, one at a time (see shared/scheduling.py)
+use_deadline_priorities(celery)
+logger = logging.getLogger(__name__)
 meta_db=MetaDB()
+blob_store=get_store()
+# File arguments sent as digests are fetched once per worker
+file_cache=LocalBlobCache(blob_store)
+translation_cache=LocalFileCache(FD_CACHE_PATH, FD_CACHE_BYTES) if FD_TRANSLATE_CACHE else None
+
+heartbeats={}
+
+
+@worker_ready.connect
+def announce_worker(sender, **kwargs):
+    # Load is the number of tasks the worker holds, running or prefetched
+    if TASK_AFFINITY:
+        hostname=sender.hostname
+        slots=sender.controller.concurrency
+        heartbeats[hostname]=start_heartbeat(hostname, worker_direct(hostname).name, slots, lambda: len(worker_state.reserved_requests), WORKER_POOL)
+
+
+@task_revoked.connect
+def count_expired(sender=None, request=None, expired=False, **kwargs):
+    # Celery drops tasks whose expires (the deadline sent by the API) has passed
+    if expired:
+        count_skip("deadline")
+    if request is not None and (request.kwargs or {}).get("client"):
+        release(request.kwargs["client"], request.id)
+
+
+@task_postrun.connect
+def release_client_slot(sender=None, task_id=None, kwargs=None, **extra):
+    # Tasks sent from a fair-share queue make room for the next one (see shared/fair_share.py)
+    if kwargs and kwargs.get("client"):
+        release(kwargs["client"], task_id)
+
+
+@worker_shutdown.connect
+def withdraw_worker(sender, **kwargs):
+    for hostname, stop in list(heartbeats.items()):
+        stop_heartbeat(hostname, stop)
+        heartbeats.pop(hostname)
 
 
 def track_celery(method):
     """
     This decorator measures celery task meta data and store it in Mysql db.
 
+    Large result and argument values are moved to the blob store, so Redis
+    only keeps a summary. Results submitted with persistent=true are also
+    kept in the blob store for RESULT_PERSISTENT_EXPIRE seconds, after
+    Redis has dropped them.
+
+    Tasks past their deadline, or whose client stopped polling for them,
+    are marked revoked without running.
+
     Usage:
     Decorate your functions like this:
     @track_celery
@@ -39,14 +115,35 @@ def track_celery(method):
     """
     @wraps(method)
     def measure_task(*args, **kwargs):
+        task=args[0]
+        reason=skip_reason(task.request.id, kwargs.get("deadline"), kwargs.get("persistent")=="true")
+        if reason:
+            count_skip(reason)
+            task.backend.mark_as_revoked(task.request.id, reason, request=task.request)
+            raise Ignore()
         start_time_of_task = time.time()
         result,arguments = method(*args, **kwargs)
         end_time_of_task = time.time()
         end_time_of_task - start_time_of_task
         duration=(end_time_of_task - start_time_of_task)
-        # Update the meta_data table, args[0] is the celery task object(self)
-        meta_db.add_meta_basic(args[0].request.id,"tasks.run.package",duration)
-        meta_db.add_meta_advanced(args[0].request.id,bytes(json.dumps(result), 'utf-8'))
+        task_id=args[0].request.id
+        persistent=kwargs.get("persistent")=="true"
+        result,arguments=offload_result(result,arguments,blob_store,expiry(persistent))
+        if persistent:
+            blob_store.put_task(task_id,(result,arguments),expiry(True))
+        sweep_if_due(blob_store)
+        # Update the meta_data table, args[0] is the celery task object(self) and args[1] the package
+        meta_db.add_meta_basic(task_id,args[1],duration)
+        if kwargs.get("client"):
+            charge(kwargs["client"],duration)
+        # Size statistics sent by the API, the inputs of its run time predictions
+        if kwargs.get("stats"):
+            # Only the run time model misses them, so a failure here must not fail the task
+            try:
+                meta_db.add_meta_features(task_id,kwargs["stats"])
+            except Exception:
+                logger.exception("Could not record the size statistics of task %s", task_id)
+        meta_db.add_meta_advanced(task_id,bytes(json.dumps(result), 'utf-8'))
         return result,arguments
 
     return measure_task
@@ -76,6 +173,111 @@ def write_to_temp_file(name:str, data:str, folder:str):
         f.write(data)
     return path
 
+def run_shell(call: str, cwd: str):
+    """
+    Run a shell command like subprocess.run, and return its CompletedProcess
+    with max_rss_kb: the peak memory of the command, or of the largest of the
+    processes it waited for.
+    """
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(call, stdout=out, stderr=err, executable='/bin/bash', shell=True, cwd=cwd)
+        try:
+            _, status, usage = os.wait4(proc.pid, 0)
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            raise
+        proc.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+        out.seek(0)
+        err.seek(0)
+        res = subprocess.CompletedProcess(call, proc.returncode, out.read().decode('utf-8', 'replace'), err.read().decode('utf-8', 'replace'))
+    res.max_rss_kb = usage.ru_maxrss
+    return res
+
+def record_size_class(size_class, runs):
+    """
+    Count whether the API classed a task right, from the peak memory of its
+    runs: small tasks that were killed (as by the container's memory limit)
+    or went over SMALL_TASK_MEMORY_MB were underestimated, large tasks that
+    stayed under it overestimated.
+    """
+    if size_class is None or not runs:
+        return
+    peak_mb = max(res.max_rss_kb for res in runs) / 1024
+    killed = any(res.returncode in (137, -9) for res in runs)
+    if size_class == "small" and (killed or peak_mb > SMALL_TASK_MEMORY_MB):
+        outcome = "underestimated"
+    elif size_class == "large" and not killed and peak_mb <= SMALL_TASK_MEMORY_MB:
+        outcome = "overestimated"
+    else:
+        outcome = "ok"
+    incr("paas_size_class_tasks", size_class=size_class, outcome=outcome)
+    incr("paas_size_class_peak_mb", peak_mb, size_class=size_class)
+
+def translator_version():
+    """Identify the installed downward image (None if it is not installed), as translations depend on it."""
+    image = os.path.join(os.path.dirname(planutils.__file__), "packages", "downward", "downward.sif")
+    try:
+        stat = os.stat(image)
+    except FileNotFoundError:
+        return None
+    return "%d-%d" % (stat.st_size, int(stat.st_mtime))
+
+def downward_packages():
+    """
+    Packages whose run script is planutils' downward with fixed options (lama,
+    lama-first), which can be given downward's translation instead of the PDDL.
+    Packages shipping an image of their own (delfi, scorpion, symk, the IPC 2023
+    planners, ...) bundle their own translator, and delfi picks its planner from
+    the PDDL itself, so they are always given the domain and problem.
+    """
+    root = os.path.join(os.path.dirname(planutils.__file__), "packages")
+    found = []
+    for package in PACKAGES:
+        try:
+            with open(os.path.join(root, package, "run")) as f:
+                if "planutils run downward --" in f.read():
+                    found.append(package)
+        except OSError:
+            pass
+    return tuple(sorted(found))
+
+# Packages that run planutils' downward, so that it translates their input
+FD_PACKAGES=downward_packages()
+
+def run_translated(package: str, folder: str, version: str):
+    """
+    Run a Fast Downward based package on folder/domain and folder/problem,
+    translating them only if their output.sas is not cached yet. The package
+    is then given output.sas, on which Fast Downward runs the search alone.
+    Returns the stdout, stderr and call, and the processes run (see run_shell).
+    """
+    deadline = time.time() + TIME_LIMIT
+    digest = hashlib.sha256()
+    for name in ("domain", "problem"):
+        with open(os.path.join(folder, name), 'rb') as f:
+            digest.update(f.read())
+        digest.update(b"\0")
+    digest.update(version.encode('utf-8'))
+    key = digest.hexdigest() + ".sas"
+
+    sas = os.path.join(folder, "output.sas")
+    cached = translation_cache.get(key)
+    # a translation evicted between get() and link() is a miss too
+    if cached is None or translation_cache.link(cached, sas) is None:
+        translate = f"timeout {TIME_LIMIT} planutils run downward -- --translate domain problem"
+        res = run_shell(translate, folder)
+        if res.returncode != 0 or not os.path.exists(sas):
+            return res.stdout, res.stderr, translate, [res]
+        translation_cache.add(key, lambda tmp: shutil.copyfile(sas, tmp))
+        stdout, stderr, calls, runs = res.stdout, res.stderr, [translate], [res]
+    else:
+        stdout, stderr, calls, runs = "Using the cached translation %s\n" % key, "", [], []
+
+    search = f"timeout {max(1, int(deadline - time.time()))} planutils run {package} -- output.sas"
+    res = run_shell(search, folder)
+    return stdout + res.stdout, stderr + res.stderr, " && ".join(calls + [search]), runs + [res]
+
 # The solve endpoint is replaced by the runpackage completely? So I have commented the following code.
 # # Solve using downloaded flask files - not strings
 # @celery.task(name='tasks.solve')
@@ -117,11 +319,18 @@ def run_package(self, package: str, arguments:dict, call:str, output_file:dict,*
 
     try:
         tmpfolder = tempfile.mkdtemp()
+        # Fast Downward translations are reused when the package is called on a plain domain and problem
+        version = translator_version() if translation_cache is not None else None
+        translate_once = version is not None and package in FD_PACKAGES and call == "%s {domain} {problem}" % package
         # Write files and replace args in the call string
         for k, v in arguments.items():
             if v['type'] == 'file':
-                # Need to write to a temp file
-                path_to_file = write_to_temp_file(k, v['value'], tmpfolder)
+                if is_blob(v['value']):
+                    # Link the file from the worker's cache
+                    path_to_file = file_cache.materialize(v['value'], os.path.join(tmpfolder, k))
+                else:
+                    # Need to write to a temp file
+                    path_to_file = write_to_temp_file(k, v['value'], tmpfolder)
                 # k is a file, we want to replace with the file path
                 call = call.replace("{%s}" % k, k)
             else:
@@ -129,20 +338,24 @@ def run_package(self, package: str, arguments:dict, call:str, output_file:dict,*
                 call = call.replace("{%s}" % k, str(v['value']))
 
         
-        # Avoid planutils consuming a planner argument
-        planner = call.split(' ')[0]
-        args = ' '.join(call.split(' ')[1:])
-        call = f'{planner} -- {args}'
-        call = f"timeout {TIME_LIMIT} planutils run {call}"
-        
-        res = subprocess.run(call, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                            executable='/bin/bash', encoding='utf-8',
-                            shell=True, cwd=tmpfolder)
+        if translate_once:
+            stdout, stderr, call, runs = run_translated(package, tmpfolder, version)
+        else:
+            # Avoid planutils consuming a planner argument
+            planner = call.split(' ')[0]
+            args = ' '.join(call.split(' ')[1:])
+            call = f'{planner} -- {args}'
+            call = f"timeout {TIME_LIMIT} planutils run {call}"
+
+            res = run_shell(call, tmpfolder)
+            stdout, stderr, runs = res.stdout, res.stderr, [res]
+        # Peak memory against the memory class the API routed the task by
+        record_size_class(kwargs.get("size_class"), runs)
 
         output = retrieve_output_file(output_file, tmpfolder)
         # Remove the files in temfolder when task is finished
         shutil.rmtree(tmpfolder)
-        result={"stdout":res.stdout, "stderr":res.stderr, "call":call, "output":output,"output_type":output_file["type"]}
+        result={"stdout":stdout, "stderr":stderr, "call":call, "output":output,"output_type":output_file["type"]}
         return result,arguments
     except SoftTimeLimitExceeded as e:
         return {"stdout":"Request Time Out", "stderr":"", "call":call, "output":{},"output_type":output_file["type"]},arguments
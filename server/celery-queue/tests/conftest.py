@@ -0,0 +1,34 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The worker imports db.py and the shared modules by their flat names
+QUEUE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, QUEUE_DIR)
+sys.path.append(os.path.join(QUEUE_DIR, "..", "shared"))
+
+os.environ.setdefault("BLOB_STORE_PATH", tempfile.mkdtemp(prefix="paas-blobs-"))
+
+
+class FakeMetaDB:
+    """Stands in for db.MetaDB, which needs the MySQL driver and server. Keeps the rows added in memory."""
+
+    def __init__(self):
+        self.rows = []
+
+    def __getattr__(self, name):
+        if name.startswith("add_meta_"):
+            return lambda *args: self.rows.append((name[len("add_meta_"):],) + args)
+        raise AttributeError(name)
+
+
+@pytest.fixture
+def tasks(monkeypatch):
+    """The worker's tasks module, recording its metadata in a FakeMetaDB."""
+    import db
+    monkeypatch.setattr(db, "MetaDB", FakeMetaDB)
+    import tasks
+    monkeypatch.setattr(tasks, "meta_db", FakeMetaDB())
+    return tasks
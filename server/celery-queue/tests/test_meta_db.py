@@ -0,0 +1,30 @@
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, text
+
+STATS = {"objects": 4, "init_facts": 6, "goals": 2, "actions": 3, "max_arity": 2}
+
+
+def test_features_table_is_created_on_first_use():
+    import db
+    engine = create_engine("sqlite://")
+    meta_db = db.MetaDB(engine)
+    meta_db.add_meta_features("t1", STATS)
+    meta_db.add_meta_features("t2", dict(STATS, goals=1))
+    with engine.begin() as conn:
+        rows = conn.execute(text("SELECT task_id, goals FROM meta_features ORDER BY task_id")).fetchall()
+    assert [tuple(r) for r in rows] == [("t1", 2), ("t2", 1)]
+
+
+def test_task_succeeds_when_its_features_are_not_recorded(tasks, monkeypatch, caplog):
+    def add_meta_features(task_id, stats):
+        raise RuntimeError("no meta_features table")
+
+    monkeypatch.setattr(tasks, "skip_reason", lambda task_id, deadline, persistent: None)
+    monkeypatch.setattr(tasks, "sweep_if_due", lambda store: None)
+    monkeypatch.setattr(tasks.meta_db, "add_meta_features", add_meta_features, raising=False)
+    run = tasks.track_celery(lambda task, package, **kwargs: ({"stdout": "ok"}, {}))
+    task = SimpleNamespace(request=SimpleNamespace(id="t1"))
+    assert run(task, "lama-first", stats=STATS) == ({"stdout": "ok"}, {})
+    assert [row[0] for row in tasks.meta_db.rows] == ["basic", "advanced"]
+    assert "Could not record the size statistics of task t1" in caplog.text
@@ -0,0 +1,104 @@
+import os
+import subprocess
+
+import pytest
+
+from blob_store import LocalFileCache
+
+DOMAIN = "(define (domain d) (:predicates (p)) (:action a :parameters () :precondition () :effect (p)))"
+PROBLEM = "(define (problem q) (:domain d) (:init) (:goal (p)))"
+
+
+@pytest.fixture
+def shell(tasks, monkeypatch, tmp_path):
+    """Replace the worker's commands: the translator writes output.sas, the search succeeds. Returns the calls made."""
+    calls = []
+
+    def run_shell(call, cwd, translated=True):
+        calls.append(call)
+        if "--translate" in call and translated:
+            with open(os.path.join(cwd, "output.sas"), "w") as f:
+                f.write("begin_version\n3\nend_version\n")
+        res = subprocess.CompletedProcess(call, 0 if translated else 1, "ran %s\n" % call.split()[4], "")
+        res.max_rss_kb = 1024
+        return res
+
+    monkeypatch.setattr(tasks, "run_shell", run_shell)
+    monkeypatch.setattr(tasks, "translation_cache", LocalFileCache(str(tmp_path / "sas"), 1 << 20))
+    return calls
+
+
+def task_folder(tmp_path, name, domain=DOMAIN):
+    folder = tmp_path / name
+    folder.mkdir()
+    (folder / "domain").write_text(domain)
+    (folder / "problem").write_text(PROBLEM)
+    return str(folder)
+
+
+def test_translation_is_reused(tasks, shell, tmp_path):
+    stdout, _, call, runs = tasks.run_translated("lama-first", task_folder(tmp_path, "first"), "1-1")
+    assert len(shell) == 2 and "--translate domain problem" in shell[0]
+    assert shell[1].endswith("planutils run lama-first -- output.sas")
+    assert call == " && ".join(shell)
+    assert len(runs) == 2
+
+    folder = task_folder(tmp_path, "second")
+    stdout, _, call, runs = tasks.run_translated("lama-first", folder, "1-1")
+    assert len(shell) == 3 and shell[2].endswith("planutils run lama-first -- output.sas")
+    assert stdout.startswith("Using the cached translation")
+    assert call == shell[2]
+    assert len(runs) == 1
+    with open(os.path.join(folder, "output.sas")) as f:
+        assert f.read().startswith("begin_version")
+
+
+def test_translation_depends_on_task_and_version(tasks, shell, tmp_path):
+    tasks.run_translated("lama-first", task_folder(tmp_path, "a"), "1-1")
+    tasks.run_translated("lama-first", task_folder(tmp_path, "b"), "2-2")
+    tasks.run_translated("lama-first", task_folder(tmp_path, "c", DOMAIN.replace("(p)", "(r)")), "1-1")
+    assert sum("--translate" in call for call in shell) == 3
+
+
+def test_failed_translation_is_not_cached(tasks, shell, monkeypatch, tmp_path):
+    run_shell = tasks.run_shell
+    monkeypatch.setattr(tasks, "run_shell", lambda call, cwd: run_shell(call, cwd, translated=False))
+    _, _, call, runs = tasks.run_translated("lama-first", task_folder(tmp_path, "a"), "1-1")
+    assert "--translate" in call and len(runs) == 1 and runs[0].returncode == 1
+    assert os.listdir(tasks.translation_cache.root) == []
+
+    monkeypatch.setattr(tasks, "run_shell", run_shell)
+    tasks.run_translated("lama-first", task_folder(tmp_path, "b"), "1-1")
+    assert sum("--translate" in call for call in shell) == 2
+
+
+def test_translator_version(tasks, monkeypatch, tmp_path):
+    monkeypatch.setattr(tasks.planutils, "__file__", str(tmp_path / "__init__.py"))
+    assert tasks.translator_version() is None
+    image = tmp_path / "packages" / "downward" / "downward.sif"
+    image.parent.mkdir(parents=True)
+    image.write_bytes(b"x" * 10)
+    os.utime(image, (1000, 1000))
+    assert tasks.translator_version() == "10-1000"
+
+
+def test_translation_evicted_after_the_lookup_is_redone(tasks, shell, monkeypatch, tmp_path):
+    tasks.run_translated("lama-first", task_folder(tmp_path, "a"), "1-1")
+    cache = tasks.translation_cache
+    lookup = cache.get
+
+    def get_then_evict(key):
+        path = lookup(key)
+        os.remove(path)
+        return path
+
+    monkeypatch.setattr(cache, "get", get_then_evict)
+    folder = task_folder(tmp_path, "b")
+    stdout, _, _, runs = tasks.run_translated("lama-first", folder, "1-1")
+    assert sum("--translate" in call for call in shell) == 2 and len(runs) == 2
+    assert os.path.exists(os.path.join(folder, "output.sas"))
+
+
+def test_only_packages_running_planutils_downward_are_translated(tasks):
+    assert {"lama", "lama-first"} <= set(tasks.FD_PACKAGES)
+    assert not {"delfi", "downward", "scorpion", "symk"} & set(tasks.FD_PACKAGES)
@@ -4,11 +4,36 @@ CREATE TABLE meta_basic (
     duration DECIMAL(6,2)
 );
 
+-- Size statistics of the domain and problem of a task, for predicting run times
+-- (id numbers the rows in the order the tasks finished)
+CREATE TABLE meta_features (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    task_id VARCHAR(255) UNIQUE,
+    objects INT,
+    init_facts INT,
+    goals INT,
+    actions INT,
+    max_arity INT
+);
+
 CREATE TABLE meta_advanced (
     task_id VARCHAR(255),
     result BLOB
 );
 
+-- Cold tier of the result store (BLOB_STORE=mysql)
+CREATE TABLE result_blobs (
+    digest CHAR(64) PRIMARY KEY,
+    data LONGBLOB,
+    expires_at DOUBLE
+);
+
+CREATE TABLE result_tasks (
+    task_id VARCHAR(255) PRIMARY KEY,
+    record LONGBLOB,
+    expires_at DOUBLE
+);
+
 SET wait_timeout = 60;
 
 SET_GLOBAL max_connections = 1000;
\ No newline at end of file
@@ -0,0 +1,13 @@
+-- Rows recorded before the workers stored the package name in meta_basic.name
+-- all read 'tasks.run.package'. The package is the planner that planutils ran,
+-- the first word after "planutils run" in the call echoed in the task result.
+-- Rows whose result is missing or truncated keep the old name; planner
+-- selection ignores them as they match no package.
+UPDATE meta_basic b
+JOIN meta_advanced a ON a.task_id = b.task_id
+SET b.name = SUBSTRING_INDEX(SUBSTRING_INDEX(
+        JSON_UNQUOTE(JSON_EXTRACT(CONVERT(a.result USING utf8mb4), '$.call')),
+        'planutils run ', -1), ' ', 1)
+WHERE b.name = 'tasks.run.package'
+  AND JSON_VALID(CONVERT(a.result USING utf8mb4))
+  AND JSON_EXTRACT(CONVERT(a.result USING utf8mb4), '$.call') LIKE '%planutils run %';
@@ -1,13 +1,48 @@
 import os
+import sys
+import json
 import time
+import asyncio
+import random
 import inspect
-from typing import Any, Dict, Optional, List
+import weakref
+import functools
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, List, Tuple
 
 import httpx
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import FastMCP, Context
+from mcp.server.lowlevel import NotificationOptions
+
+@asynccontextmanager
+async def _lifespan(server: FastMCP):
+    """
+    Keep the tools in line with the installed packages while the server runs
+    """
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.create_task(_refresh_manifest_loop())
+    yield {}
+
+class _PaaSMCP(FastMCP):
+    """
+    FastMCP that announces tools/list_changed, and remembers the sessions that
+    listed the tools so they can be told when the tool set changes
+    """
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.sessions = weakref.WeakSet()
+        self._mcp_server.create_initialization_options = functools.partial(
+            self._mcp_server.create_initialization_options, NotificationOptions(tools_changed=True))
+
+    async def list_tools(self):
+        request_context = self.get_context().request_context
+        if request_context is not None:
+            self.sessions.add(request_context.session)
+        return await super().list_tools()
 
 # MCP server
-mcp = FastMCP("PaaS-wrap")
+mcp = _PaaSMCP("PaaS-wrap", lifespan=_lifespan)
 
 # Config (from env)
 # PAAS_BASE_URL = os.getenv("PAAS_BASE_URL", "http://localhost:5001").rstrip("/")
@@ -17,7 +52,24 @@ mcp = FastMCP("PaaS-wrap")
 
 PAAS_BASE_URL = f"http://localhost:{os.getenv('PAAS_PORT', 5001)}" # default API destination
 DEFAULT_TIMEOUT_S = int(os.getenv("TIME_LIMIT", 30)) # max time wrapper will wait for plan
-DEFAULT_POLL_INTERVAL_S = float(os.getenv("MCP_POLL_INTERVAL", 0.5)) # how often we check the planner
+DEFAULT_POLL_INTERVAL_S = float(os.getenv("MCP_POLL_INTERVAL", 0.5)) # first wait between checks of the planner
+MCP_POLL_BACKOFF = float(os.getenv("MCP_POLL_BACKOFF", 1.5)) # growth of the wait after each check
+MCP_POLL_MAX_INTERVAL = float(os.getenv("MCP_POLL_MAX_INTERVAL", 5)) # longest wait between checks
+MCP_MAX_CONNECTIONS = int(os.getenv("MCP_MAX_CONNECTIONS", 100)) # pooled connections to PaaS
+MCP_BATCH_MAX_JOBS = int(os.getenv("MCP_BATCH_MAX_JOBS", 32)) # most payloads a batch tool accepts
+MCP_MANIFEST_CACHE = os.getenv("MCP_MANIFEST_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".manifest_cache.json")) # last known /package response
+MCP_MANIFEST_REFRESH_S = float(os.getenv("MCP_MANIFEST_REFRESH", 60)) # how often the manifest is revalidated
+MCP_STARTUP_TIMEOUT_S = float(os.getenv("MCP_STARTUP_TIMEOUT", 2)) # max wait for the manifest at startup when nothing is cached
+
+# Shared client, created on first use in the server's event loop
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# Registered package tools: tool name -> the service manifest it was built from
+_registered: Dict[str, Dict[str, Any]] = {}
+# ETag of the manifest the tools were built from
+_manifest_etag: Optional[str] = None
+_refresh_task: Optional[asyncio.Task] = None
 
 
 # API helper functions
@@ -31,15 +83,31 @@ def _complete_check_url(job_tag: str) -> str:
         return job_tag
     return PAAS_BASE_URL + job_tag
 
-def _http_client() -> httpx.Client:
+def _http_client() -> httpx.AsyncClient:
     """
-    Create client to make requests to PaaS
+    Return the client shared by all tool calls to make requests to PaaS.
+    Connections are kept alive and pooled, so concurrent calls don't each pay
+    a new TCP setup.
     """
-    return httpx.Client(timeout=DEFAULT_TIMEOUT_S)
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT_S,
+            limits=httpx.Limits(max_connections=MCP_MAX_CONNECTIONS, max_keepalive_connections=MCP_MAX_CONNECTIONS),
+        )
+        _client_loop = loop
+    return _client
+
+def _next_poll_delay(delay: float) -> float:
+    """
+    Exponential backoff of the wait between checks, capped at MCP_POLL_MAX_INTERVAL
+    """
+    return min(delay * MCP_POLL_BACKOFF, MCP_POLL_MAX_INTERVAL)
 
 
 # Core PaaS helper - generic API submit-and-poll function
-def _submit_and_poll(
+async def _submit_and_poll(
     package: str,
     service: str,
     payload: Dict[str, Any],
@@ -49,6 +117,8 @@ def _submit_and_poll(
     
     """
     Submit a job to a PaaS package/service and poll until completion.
+    The wait between checks starts at poll_interval_s and grows exponentially,
+    with jitter so that concurrent calls don't poll in lockstep.
 
     Returns:
       {
@@ -69,55 +139,69 @@ def _submit_and_poll(
     check_url: Optional[str] = None
 
     try:
-        with _http_client() as client:
-            # Submit
-            r = client.post(submit_url, json=payload)
-            r.raise_for_status()
-            submit_json = r.json()
-
-            # Extract check URL
-            if "result" not in submit_json:
+        client = _http_client()
+        # Submit, with our timeout as the deadline after which the workers may drop the job
+        r = await client.post(submit_url, json={"deadline": timeout_s, **payload})
+        r.raise_for_status()
+        submit_json = r.json()
+
+        # Extract check URL
+        if "result" not in submit_json:
+            return {
+                "status": "error",
+                "package": package,
+                "service": service,
+                "submit_url": submit_url,
+                "error": "Unexpected submit response (missing 'result')",
+                "raw_submit": submit_json,
+            }
+
+        check_url = _complete_check_url(str(submit_json["result"]))
+
+        # Poll
+        deadline = time.monotonic() + float(timeout_s)
+        delay = float(poll_interval_s)
+        while True:
+            cr = await client.get(check_url)
+            cr.raise_for_status()
+            last_json = cr.json()
+
+            if last_json.get("status") == "ok":
+                result = last_json.get("result", {}) or {}
+                return {
+                    "status": "ok",
+                    "package": package,
+                    "service": service,
+                    "check_url": check_url,
+                    "output": result.get("output", {}),
+                    "stdout": result.get("stdout", ""),
+                    "stderr": result.get("stderr", ""),
+                    "raw": last_json,
+                }
+            if last_json.get("status") in ("skipped", "expired"):
                 return {
                     "status": "error",
                     "package": package,
                     "service": service,
-                    "submit_url": submit_url,
-                    "error": "Unexpected submit response (missing 'result')",
-                    "raw_submit": submit_json,
+                    "check_url": check_url,
+                    "error": last_json.get("Error", ""),
+                    "raw": last_json,
                 }
 
-            check_url = _complete_check_url(str(submit_json["result"]))
-
-            # Poll
-            deadline = time.time() + float(timeout_s)
-            while time.time() < deadline:
-                cr = client.get(check_url)
-                cr.raise_for_status()
-                last_json = cr.json()
-
-                if last_json.get("status") == "ok":
-                    result = last_json.get("result", {}) or {}
-                    return {
-                        "status": "ok",
-                        "package": package,
-                        "service": service,
-                        "check_url": check_url,
-                        "output": result.get("output", {}),
-                        "stdout": result.get("stdout", ""),
-                        "stderr": result.get("stderr", ""),
-                        "raw": last_json,
-                    }
-
-                time.sleep(float(poll_interval_s))
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(remaining, random.uniform(delay / 2, delay)))
+            delay = _next_poll_delay(delay)
 
-            return {
-                "status": "timeout",
-                "package": package,
-                "service": service,
-                "check_url": check_url,
-                "timeout_s": timeout_s,
-                "last": last_json,
-            }
+        return {
+            "status": "timeout",
+            "package": package,
+            "service": service,
+            "check_url": check_url,
+            "timeout_s": timeout_s,
+            "last": last_json,
+        }
 
     except httpx.HTTPError as e:
         return {
@@ -141,19 +225,80 @@ def _submit_and_poll(
         }
     
 
+async def _batch_submit_and_poll(
+    package: str,
+    service: str,
+    payloads: List[Dict[str, Any]],
+    timeout_s: float = DEFAULT_TIMEOUT_S,
+    poll_interval_s: float = DEFAULT_POLL_INTERVAL_S,
+    ctx: Optional[Context] = None,
+) -> Dict[str, Any]:
+
+    """
+    Submit every payload to a PaaS package/service concurrently and poll them
+    all until they finish or timeout_s passes. A progress notification is sent
+    through ctx as each job finishes.
+
+    Returns:
+      {
+        "status": "ok" | "partial",  # partial if any job did not finish ok
+        "package": "...",
+        "service": "...",
+        "completed": n,              # jobs that finished with status ok
+        "total": N,
+        "results": [...],            # one _submit_and_poll result per payload, in order
+      }
+    """
+
+    # Each job stops polling at the deadline; the grace covers its last request
+    deadline = time.monotonic() + float(timeout_s) + 1
+    jobs = {
+        asyncio.create_task(_submit_and_poll(package, service, payload, timeout_s, poll_interval_s)): i
+        for i, payload in enumerate(payloads)
+    }
+    results: List[Optional[Dict[str, Any]]] = [None] * len(payloads)
+    pending = set(jobs)
+    finished = 0
+
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+        for job in done:
+            i = jobs[job]
+            results[i] = job.result()
+            finished += 1
+            if ctx is not None:
+                await ctx.report_progress(finished, len(payloads), f"job {i}: {results[i]['status']}")
+
+    for job in pending:
+        job.cancel()
+        results[jobs[job]] = {"status": "timeout", "package": package, "service": service, "timeout_s": timeout_s}
+
+    completed = sum(1 for r in results if r["status"] == "ok")
+    return {
+        "status": "ok" if completed == len(payloads) else "partial",
+        "package": package,
+        "service": service,
+        "completed": completed,
+        "total": len(payloads),
+        "results": results,
+    }
+
+
 # MCP tools
 @mcp.tool()
-def paas_list_packages() -> Dict[str, Any]:
+async def paas_list_packages() -> Dict[str, Any]:
     """
     Return installed packages and their service manifests, as provided by PaaS.
     This mirrors GET {PAAS_BASE_URL}/package.
     """
     url = f"{PAAS_BASE_URL}/package"
     try:
-        with _http_client() as client:
-            r = client.get(url)
-            r.raise_for_status()
-            return r.json()
+        r = await _http_client().get(url)
+        r.raise_for_status()
+        return r.json()
     except httpx.HTTPError as e:
         return {"status": "error", "error": str(e), "url": url}
 
@@ -177,7 +322,7 @@ def _register_paas_tool(
       - timeout_s
       - poll_interval_s
 
-    We generate a function with exec() so it has an explicit signature that MCP can introspect.
+    The wrapper gets an explicit inspect.Signature so that MCP can introspect it.
     """
 
     tool_name = _make_tool_name(package, service)
@@ -208,7 +353,7 @@ def _register_paas_tool(
         f"- files: {returns_files}\n\n"
         f"Wrapper controls:\n"
         f"- timeout_s: max time to wait for completion (default {DEFAULT_TIMEOUT_S})\n"
-        f"- poll_interval_s: seconds between polls (default {DEFAULT_POLL_INTERVAL_S})\n"
+        f"- poll_interval_s: seconds before the first poll, growing with each poll (default {DEFAULT_POLL_INTERVAL_S})\n"
     )
 
     # Build inspect.Signature based on manifest
@@ -259,7 +404,7 @@ def _register_paas_tool(
     sig = inspect.Signature(parameters=params, return_annotation=Dict[str, Any])
 
     # Define the wrapper
-    def wrapper(*args: Any, **kwargs: Any) -> Dict[str, Any]:
+    async def wrapper(*args: Any, **kwargs: Any) -> Dict[str, Any]:
         # Enforce signature
         bound = sig.bind(*args, **kwargs)
         bound.apply_defaults()
@@ -272,7 +417,7 @@ def _register_paas_tool(
         # Remaining keys should match manifest args and become the payload
         payload = values
 
-        return _submit_and_poll(
+        return await _submit_and_poll(
             package=package, 
             service=service, 
             payload=payload,
@@ -287,28 +432,75 @@ def _register_paas_tool(
 
     globals()[tool_name] = wrapper
 
-    # Register the function as an MCP tool
+    # Batch variant: the same service for a list of payloads, run concurrently
+    async def batch_wrapper(
+        payloads: List[Dict[str, Any]],
+        ctx: Context,
+        *,
+        timeout_s: float = DEFAULT_TIMEOUT_S,
+        poll_interval_s: float = DEFAULT_POLL_INTERVAL_S,
+    ) -> Dict[str, Any]:
+        if len(payloads) > MCP_BATCH_MAX_JOBS:
+            return {"status": "error", "package": package, "service": service,
+                    "error": f"At most {MCP_BATCH_MAX_JOBS} payloads per batch, got {len(payloads)}"}
+        # Check every payload against the manifest before submitting any, and
+        # fill in the manifest defaults as the single-call tool does
+        bound_payloads = []
+        for i, payload in enumerate(payloads):
+            try:
+                bound = sig.bind(**payload)
+            except TypeError as e:
+                return {"status": "error", "package": package, "service": service,
+                        "error": f"Payload {i} does not match the manifest arguments: {e}"}
+            bound.apply_defaults()
+            bound_payloads.append({k: v for k, v in bound.arguments.items() if k not in ("timeout_s", "poll_interval_s")})
+
+        return await _batch_submit_and_poll(
+            package=package,
+            service=service,
+            payloads=bound_payloads,
+            timeout_s=float(timeout_s),
+            poll_interval_s=float(poll_interval_s),
+            ctx=ctx,
+        )
+
+    batch_name = tool_name + "_batch"
+    batch_wrapper.__name__ = batch_name
+    batch_wrapper.__doc__ = (
+        f"{package}.{service} for several inputs at once\n\n"
+        f"Submits every payload to `{tool_name}`'s service concurrently and reports progress as each job finishes.\n"
+        f"Each payload is an object with the arguments of `{tool_name}`:\n{args_block}\n\n"
+        f"At timeout_s, returns the results so far: status is \"partial\" and unfinished jobs have status \"timeout\" "
+        f"(with the check_url to fetch their result later when they were submitted). "
+        f"At most {MCP_BATCH_MAX_JOBS} payloads.\n\n"
+        f"Wrapper controls:\n"
+        f"- timeout_s: max time to wait for all jobs (default {DEFAULT_TIMEOUT_S})\n"
+        f"- poll_interval_s: seconds before the first poll of each job, growing with each poll (default {DEFAULT_POLL_INTERVAL_S})\n"
+    )
+    globals()[batch_name] = batch_wrapper
+
+    # Register the functions as MCP tools
     mcp.tool(name=tool_name)(wrapper)
-    print("Registered tool:", tool_name)
+    mcp.tool(name=batch_name)(batch_wrapper)
+    _registered[tool_name] = svc_manifest
+    print("Registered tools:", tool_name, batch_name, file=sys.stderr)
 
-def _build_tools_from_manifest() -> None:
+def _unregister_paas_tool(tool_name: str) -> None:
     """
-    Enumerate installed packages/services from PaaS and register MCP tools for them.
-    If PaaS isn't reachable at startup, we still run with only paas_list_packages().
+    Remove a package tool, e.g. when its package is uninstalled
     """
+    for name in (tool_name, tool_name + "_batch"):
+        mcp.remove_tool(name)
+        globals().pop(name, None)
+    _registered.pop(tool_name, None)
+    print("Removed tools:", tool_name, tool_name + "_batch", file=sys.stderr)
 
-    packages = paas_list_packages()
-    
-    # Don't run if there is an error
-    if isinstance(packages, dict) and packages.get("status") == "error":
-        print(f"Error fetching packages from PaaS: {packages.get('error')}")
-        return
-
-    # Don't run if there is no response from paas_list_packages()
-    if not isinstance(packages, dict):
-        print("No valid response from PaaS when listing packages.")
-        return
-
+def _services(packages: Dict[str, Any]) -> Dict[str, Tuple[str, str, List[Dict[str, Any]], Dict[str, Any]]]:
+    """
+    Map tool names to (package, service, args, service manifest) for every
+    well-formed service in a /package response
+    """
+    services_by_tool = {}
     for package_name, package_info in packages.items():
         # skip if no info
         if not isinstance(package_info, dict):
@@ -331,12 +523,125 @@ def _build_tools_from_manifest() -> None:
             if not isinstance(args, list):
                 args = []
 
+            services_by_tool[_make_tool_name(package_name, service_name)] = (package_name, service_name, args, svc_manifest)
+    return services_by_tool
+
+def _sync_tools(packages: Any) -> bool:
+    """
+    Register tools for new or changed services, and remove the tools of
+    services that are gone. Returns True if any tool was added or removed.
+    """
+    if not isinstance(packages, dict):
+        print("No valid response from PaaS when listing packages.", file=sys.stderr)
+        return False
+
+    changed = False
+    wanted = _services(packages)
+    for tool_name in list(_registered):
+        if tool_name not in wanted or wanted[tool_name][3] != _registered[tool_name]:
+            _unregister_paas_tool(tool_name)
+            changed = True
+    for tool_name, (package_name, service_name, args, svc_manifest) in wanted.items():
+        if tool_name not in _registered:
             _register_paas_tool(package_name, service_name, args, svc_manifest)
+            changed = True
+    return changed
+
+async def _notify_tools_changed() -> None:
+    """
+    Send notifications/tools/list_changed to every session that listed the tools.
+    Sessions that have gone away are forgotten.
+    """
+    for session in list(mcp.sessions):
+        try:
+            await session.send_tool_list_changed()
+        except Exception as e:
+            mcp.sessions.discard(session)
+            print(f"Could not notify a session of the tool changes: {type(e).__name__}: {e}", file=sys.stderr)
+
+def _load_manifest_cache() -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """
+    Return (etag, packages) from the manifest cache file, or (None, None)
+    """
+    try:
+        with open(MCP_MANIFEST_CACHE) as f:
+            cached = json.load(f)
+        return cached.get("etag"), cached["packages"]
+    except (OSError, ValueError, KeyError):
+        return None, None
+
+def _save_manifest_cache(etag: Optional[str], packages: Dict[str, Any]) -> None:
+    try:
+        tmp = MCP_MANIFEST_CACHE + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"etag": etag, "packages": packages}, f)
+        os.replace(tmp, MCP_MANIFEST_CACHE)
+    except OSError as e:
+        print(f"Could not write manifest cache {MCP_MANIFEST_CACHE}: {e}", file=sys.stderr)
+
+async def _refresh_manifest() -> bool:
+    """
+    Revalidate the manifest with PaaS and update the tools if it changed.
+    Returns True if the tools were rebuilt.
+    """
+    global _manifest_etag
+    headers = {"If-None-Match": _manifest_etag} if _manifest_etag else {}
+    r = await _http_client().get(f"{PAAS_BASE_URL}/package", headers=headers)
+    if r.status_code == 304:
+        return False
+    r.raise_for_status()
+    packages = r.json()
+    changed = _sync_tools(packages)
+    _manifest_etag = r.headers.get("ETag")
+    _save_manifest_cache(_manifest_etag, packages)
+    if changed:
+        await _notify_tools_changed()
+    return True
+
+async def _refresh_manifest_loop() -> None:
+    """
+    Revalidate the manifest every MCP_MANIFEST_REFRESH_S seconds, starting now.
+    Failures (e.g. PaaS being down) are retried on the next round.
+    """
+    while True:
+        try:
+            await _refresh_manifest()
+        except Exception as e:
+            print(f"Error refreshing packages from PaaS: {type(e).__name__}: {e}", file=sys.stderr)
+        await asyncio.sleep(MCP_MANIFEST_REFRESH_S)
+
+def _build_tools_from_manifest() -> None:
+    """
+    Register MCP tools for the installed packages/services, from the cached
+    manifest when there is one so that startup never waits for PaaS. Without a
+    cache, PaaS is asked once with a short timeout. Either way the background
+    refresh brings the tools up to date once the server runs.
+    """
+    global _manifest_etag
+
+    etag, packages = _load_manifest_cache()
+    if packages is not None:
+        _manifest_etag = etag
+        _sync_tools(packages)
+        return
+
+    url = f"{PAAS_BASE_URL}/package"
+    try:
+        r = httpx.get(url, timeout=MCP_STARTUP_TIMEOUT_S)
+        r.raise_for_status()
+        packages = r.json()
+    except (httpx.HTTPError, ValueError) as e:
+        print(f"Error fetching packages from PaaS: {e}", file=sys.stderr)
+        return
+
+    _manifest_etag = r.headers.get("ETag")
+    _sync_tools(packages)
+    _save_manifest_cache(_manifest_etag, packages)
 
 
 # Build MCP tools at startup
 _build_tools_from_manifest()
-print("Dynamic tools registered.")
+print("Dynamic tools registered.", file=sys.stderr)
 
 if __name__ == "__main__":
     mcp.run()
@@ -0,0 +1,227 @@
+import os
+import json
+import asyncio
+import tempfile
+
+import httpx
+import pytest
+
+# Never read or overwrite the manifest cache of a real server
+os.environ.setdefault("MCP_MANIFEST_CACHE", os.path.join(tempfile.mkdtemp(), "manifest.json"))
+
+import mcp_wrap
+
+
+class FakePaaS:
+    """Answers submits with a check URL, and checks with "PENDING" `pending` times before the result."""
+
+    def __init__(self, pending=0, final=None):
+        self.pending = pending
+        self.final = final or {"status": "ok", "result": {"output": {"plan": "(a)"}, "stdout": "done"}}
+        self.submitted = []
+        self.checks = 0
+
+    def __call__(self, request):
+        if request.method == "POST":
+            self.submitted.append(json.loads(request.read()))
+            return httpx.Response(200, json={"result": "/check/%d" % len(self.submitted)})
+        self.checks += 1
+        if self.checks <= self.pending:
+            return httpx.Response(200, json={"status": "PENDING"})
+        return httpx.Response(200, json=self.final)
+
+
+@pytest.fixture
+def paas(monkeypatch):
+    def use(handler):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(mcp_wrap, "_http_client", lambda: client)
+        return handler
+    return use
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_submit_and_poll_until_done(paas):
+    fake = paas(FakePaaS(pending=2))
+    result = run(mcp_wrap._submit_and_poll("lama-first", "solve", {"domain": "d"}, timeout_s=5, poll_interval_s=0.001))
+    assert result["status"] == "ok" and result["output"] == {"plan": "(a)"} and result["stdout"] == "done"
+    assert result["check_url"] == mcp_wrap.PAAS_BASE_URL + "/check/1"
+    assert fake.checks == 3
+    # the timeout is sent as the deadline of the job
+    assert fake.submitted == [{"deadline": 5, "domain": "d"}]
+
+
+def test_dropped_jobs_are_errors(paas):
+    paas(FakePaaS(final={"status": "skipped", "Error": "dropped"}))
+    result = run(mcp_wrap._submit_and_poll("lama-first", "solve", {}, timeout_s=5, poll_interval_s=0.001))
+    assert result["status"] == "error" and result["error"] == "dropped"
+
+
+def test_timeout(paas):
+    paas(FakePaaS(pending=10 ** 6))
+    result = run(mcp_wrap._submit_and_poll("lama-first", "solve", {}, timeout_s=0.05, poll_interval_s=0.01))
+    assert result["status"] == "timeout" and result["last"] == {"status": "PENDING"}
+
+
+def test_http_errors(paas):
+    paas(lambda request: httpx.Response(500))
+    result = run(mcp_wrap._submit_and_poll("lama-first", "solve", {}, timeout_s=1))
+    assert result["status"] == "error" and "500" in result["error"]
+
+
+def test_poll_delay_grows_to_the_cap():
+    delay, delays = mcp_wrap.DEFAULT_POLL_INTERVAL_S, []
+    for _ in range(20):
+        delay = mcp_wrap._next_poll_delay(delay)
+        delays.append(delay)
+    assert delays == sorted(delays)
+    assert delays[-1] == mcp_wrap.MCP_POLL_MAX_INTERVAL
+
+
+def manifest(*args):
+    return {"lama-first": {"endpoint": {"services": {"solve": {
+        "args": [{"name": a, "type": "file"} for a in args], "call": "lama-first", "return": {"type": "generic"}}}}}}
+
+
+@pytest.fixture
+def tools(monkeypatch, tmp_path):
+    """Tools registered by the test only, and a manifest cache of its own."""
+    monkeypatch.setattr(mcp_wrap, "_registered", {})
+    monkeypatch.setattr(mcp_wrap, "_manifest_etag", None)
+    monkeypatch.setattr(mcp_wrap, "MCP_MANIFEST_CACHE", str(tmp_path / "manifest.json"))
+    yield mcp_wrap._registered
+    mcp_wrap._sync_tools({})
+
+
+def tool_params(name):
+    return [p for p in mcp_wrap.inspect.signature(getattr(mcp_wrap, name)).parameters if p not in ("timeout_s", "poll_interval_s")]
+
+
+def test_tools_start_from_the_cached_manifest(tools, monkeypatch):
+    mcp_wrap._save_manifest_cache('"v1"', manifest("domain", "problem"))
+    monkeypatch.setattr(mcp_wrap.httpx, "get", lambda *args, **kwargs: pytest.fail("PaaS asked at startup"))
+    mcp_wrap._build_tools_from_manifest()
+    assert set(tools) == {"paas_lama_first_solve"}
+    assert tool_params("paas_lama_first_solve") == ["domain", "problem"]
+    assert hasattr(mcp_wrap, "paas_lama_first_solve_batch")
+    assert mcp_wrap._manifest_etag == '"v1"'
+
+
+def test_refresh_revalidates_with_the_etag(tools, paas):
+    mcp_wrap._save_manifest_cache('"v1"', manifest("domain", "problem"))
+    mcp_wrap._build_tools_from_manifest()
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v2"':
+            return httpx.Response(304)
+        return httpx.Response(200, json=manifest("domain"), headers={"ETag": '"v2"'})
+
+    paas(handler)
+    assert run(mcp_wrap._refresh_manifest()) is True
+    assert tool_params("paas_lama_first_solve") == ["domain"]
+    assert mcp_wrap._load_manifest_cache() == ('"v2"', manifest("domain"))
+    assert run(mcp_wrap._refresh_manifest()) is False
+    assert seen == ['"v1"', '"v2"']
+
+
+def test_removed_packages_lose_their_tools(tools):
+    mcp_wrap._sync_tools(manifest("domain"))
+    mcp_wrap._sync_tools({})
+    assert tools == {}
+    assert not hasattr(mcp_wrap, "paas_lama_first_solve")
+
+
+def test_clients_hear_when_the_tools_change(tools, paas, monkeypatch):
+    from mcp import types
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    async def no_refresh():
+        pass
+
+    monkeypatch.setattr(mcp_wrap, "_refresh_manifest_loop", no_refresh)
+    current = {"etag": '"v1"', "packages": manifest("domain")}
+
+    def handler(request):
+        if request.headers.get("If-None-Match") == current["etag"]:
+            return httpx.Response(304)
+        return httpx.Response(200, json=current["packages"], headers={"ETag": current["etag"]})
+
+    paas(handler)
+    notifications = []
+
+    async def collect(message):
+        if isinstance(message, types.ServerNotification):
+            notifications.append(message.root.method)
+
+    async def session():
+        async with create_connected_server_and_client_session(mcp_wrap.mcp, message_handler=collect) as client:
+            assert client.get_server_capabilities().tools.listChanged
+            await client.list_tools()
+            assert await mcp_wrap._refresh_manifest() is True
+            assert await mcp_wrap._refresh_manifest() is False
+            current.update(etag='"v2"', packages={})
+            assert await mcp_wrap._refresh_manifest() is True
+            await client.send_ping()
+
+    run(session())
+    assert notifications == ["notifications/tools/list_changed"] * 2
+    assert tools == {}
+
+
+class Progress:
+    def __init__(self):
+        self.reports = []
+
+    async def report_progress(self, progress, total, message):
+        self.reports.append((progress, total, message))
+
+
+def test_batch_results_keep_the_payload_order(paas):
+    fake = FakePaaS()
+
+    def handler(request):
+        # the second job never finishes
+        if request.url.path == "/check/2":
+            return httpx.Response(200, json={"status": "PENDING"})
+        return fake(request)
+
+    paas(handler)
+    progress = Progress()
+    payloads = [{"domain": "d%d" % i} for i in range(3)]
+    result = run(mcp_wrap._batch_submit_and_poll("lama-first", "solve", payloads, timeout_s=0.2, poll_interval_s=0.01, ctx=progress))
+    assert result["status"] == "partial" and (result["completed"], result["total"]) == (2, 3)
+    assert [r["status"] for r in result["results"]] == ["ok", "timeout", "ok"]
+    assert sorted(p["domain"] for p in fake.submitted) == ["d0", "d1", "d2"]
+    assert [(done, total) for done, total, _ in progress.reports] == [(1, 3), (2, 3), (3, 3)]
+
+
+def test_batch_tool_checks_every_payload_first(tools, paas):
+    fake = paas(FakePaaS())
+    mcp_wrap._sync_tools(manifest("domain", "problem"))
+    batch = mcp_wrap.paas_lama_first_solve_batch
+    bad = run(batch([{"domain": "d", "problem": "p"}, {"domainX": "d"}], Progress()))
+    assert bad["status"] == "error" and "Payload 1" in bad["error"]
+    too_many = run(batch([{"domain": "d", "problem": "p"}] * (mcp_wrap.MCP_BATCH_MAX_JOBS + 1), Progress()))
+    assert too_many["status"] == "error"
+    assert fake.submitted == []
+    ok = run(batch([{"domain": "d", "problem": "p", "timeout_s": 1}], Progress(), poll_interval_s=0.01))
+    assert ok["status"] == "ok"
+    # per-payload wrapper controls are dropped in favour of the batch's
+    assert fake.submitted == [{"deadline": mcp_wrap.DEFAULT_TIMEOUT_S, "domain": "d", "problem": "p"}]
+
+
+def test_batch_payloads_get_the_manifest_defaults(tools, paas):
+    fake = paas(FakePaaS())
+    packages = manifest("domain")
+    packages["lama-first"]["endpoint"]["services"]["solve"]["args"].append({"name": "bound", "type": "int", "default": 5})
+    mcp_wrap._sync_tools(packages)
+    single = run(mcp_wrap.paas_lama_first_solve("d", poll_interval_s=0.01))
+    batch = run(mcp_wrap.paas_lama_first_solve_batch([{"domain": "d"}], Progress(), poll_interval_s=0.01))
+    assert single["status"] == batch["status"] == "ok"
+    assert fake.submitted[0] == fake.submitted[1]
+    assert fake.submitted[1]["bound"] == 5
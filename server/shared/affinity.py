@@ -0,0 +1,160 @@
+import os
+import math
+import time
+import bisect
+import hashlib
+import threading
+
+from scheduling import queue_keys
+
+# Cache-affinity routing: tasks for the same domain go to the same worker's
+# own queue (Celery's worker_direct queues), so that its local caches of
+# files and translations are reused.
+TASK_AFFINITY=os.environ.get('TASK_AFFINITY', 'false') == 'true'
+# Seconds between worker heartbeats; a worker missing three is considered gone
+AFFINITY_HEARTBEAT=float(os.environ.get('AFFINITY_HEARTBEAT', 5))
+# A worker takes at most this factor times the average load before tasks spill to the next one
+AFFINITY_LOAD_FACTOR=float(os.environ.get('AFFINITY_LOAD_FACTOR', 1.25))
+# Points per worker on the hash ring
+AFFINITY_VNODES=int(os.environ.get('AFFINITY_VNODES', 64))
+# Heartbeats are kept next to the queues, in the broker
+AFFINITY_REDIS_URL=os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+
+WORKERS_KEY = "paas:workers"
+WORKER_KEY = "paas:worker:%s"
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.sha256(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent hash ring over worker names, with vnodes points per worker."""
+
+    def __init__(self, nodes, vnodes=AFFINITY_VNODES):
+        self.nodes = sorted(nodes)
+        points = sorted((_hash("%s#%d" % (node, i)), node) for node in self.nodes for i in range(vnodes))
+        self._hashes = [h for h, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def walk(self, key):
+        """Yield every node once, starting from the owner of key and going round the ring."""
+        seen = set()
+        start = bisect.bisect(self._hashes, _hash(key))
+        for i in range(len(self._nodes)):
+            node = self._nodes[(start + i) % len(self._nodes)]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == len(self.nodes):
+                    return
+
+
+def _redis():
+    import redis
+    return redis.Redis.from_url(AFFINITY_REDIS_URL)
+
+
+def start_heartbeat(hostname, queue, slots, load, pool="small"):
+    """
+    Publish a worker (its direct queue, the number of tasks it runs at once,
+    its pool and load()) every AFFINITY_HEARTBEAT
+    seconds from a daemon thread. The entry expires after three missed
+    heartbeats, so routers drop workers that die without stop_heartbeat.
+    """
+    client = _redis()
+    stop = threading.Event()
+
+    def beat():
+        while not stop.is_set():
+            try:
+                pipe = client.pipeline()
+                pipe.hset(WORKER_KEY % hostname, mapping={"queue": queue, "slots": slots, "pool": pool, "load": load()})
+                pipe.expire(WORKER_KEY % hostname, int(3 * AFFINITY_HEARTBEAT) + 1)
+                pipe.sadd(WORKERS_KEY, hostname)
+                pipe.execute()
+            except Exception:
+                pass
+            stop.wait(AFFINITY_HEARTBEAT)
+
+    threading.Thread(target=beat, name="affinity-heartbeat", daemon=True).start()
+    return stop
+
+
+def stop_heartbeat(hostname, stop):
+    stop.set()
+    try:
+        client = _redis()
+        client.srem(WORKERS_KEY, hostname)
+        client.delete(WORKER_KEY % hostname)
+    except Exception:
+        pass
+
+
+class AffinityRouter:
+    """
+    Choose the worker for a routing key by consistent hashing with bounded
+    loads: the key's owner on the ring, or the next worker round the ring
+    whose load (tasks reserved by the worker plus tasks waiting in its
+    queue) stays within AFFINITY_LOAD_FACTOR times the average, or within
+    its number of slots while the workers are lightly loaded. Workers
+    joining or leaving only move the keys next to them on the ring. Only
+    the workers of the task's pool (small or large, see SIZE_ROUTING) are
+    considered.
+    """
+
+    def __init__(self, refresh=1.0):
+        self.refresh = refresh
+        self._client = None
+        self._workers = {}
+        self._ring = None
+        self._loaded = 0
+
+    def _load_workers(self):
+        client = self._client
+        names = sorted(name.decode('utf-8') for name in client.smembers(WORKERS_KEY))
+        pipe = client.pipeline()
+        for name in names:
+            pipe.hgetall(WORKER_KEY % name)
+        workers = {}
+        for name, entry in zip(names, pipe.execute()):
+            if entry:
+                workers[name] = (entry[b"queue"].decode('utf-8'), int(entry.get(b"slots", 1)), entry.get(b"pool", b"small").decode('utf-8'))
+            else:
+                # missed its heartbeats
+                client.srem(WORKERS_KEY, name)
+        if self._ring is None or sorted(workers) != self._ring.nodes:
+            self._ring = HashRing(workers)
+        self._workers = workers
+
+    def _loads(self):
+        pipe = self._client.pipeline()
+        for name, (queue, _, _) in self._workers.items():
+            pipe.hget(WORKER_KEY % name, "load")
+            for key in queue_keys(queue):
+                pipe.llen(key)
+        values = iter(pipe.execute())
+        loads = {}
+        for name, (queue, _, _) in self._workers.items():
+            loads[name] = int(next(values) or 0) + sum(int(next(values) or 0) for _ in queue_keys(queue))
+        return loads
+
+    def route(self, key, pool="small"):
+        """Return the hostname of the worker of pool for key, or None to use the pool's shared queue."""
+        try:
+            if self._client is None:
+                self._client = _redis()
+            if time.time() - self._loaded > self.refresh:
+                self._load_workers()
+                self._loaded = time.time()
+            if not any(w[2] == pool for w in self._workers.values()):
+                return None
+            loads = {name: load for name, load in self._loads().items() if self._workers[name][2] == pool}
+        except Exception:
+            return None
+        # the task being routed counts towards the total; rounding up leaves room on at least one worker
+        capacity = math.ceil(AFFINITY_LOAD_FACTOR * (sum(loads.values()) + 1) / len(loads))
+        for name in self._ring.walk(key):
+            if name in loads and loads[name] + 1 <= max(capacity, self._workers[name][1]):
+                return name
+        return None
@@ -0,0 +1,346 @@
+import os
+import json
+import time
+import random
+import shutil
+import hashlib
+import tempfile
+
+# Cold tier for task results: large values are moved out of Redis into a
+# content-addressed store shared by the API and the workers.
+BLOB_STORE=os.environ.get('BLOB_STORE', 'disk') # disk | mysql
+BLOB_STORE_PATH=os.environ.get('BLOB_STORE_PATH', '/data/blobs')
+# Values whose JSON is larger than this (in bytes) are offloaded
+RESULT_INLINE_BYTES=int(os.environ.get('RESULT_INLINE_BYTES', 4096))
+# Cold-tier retention of non-persistent and persistent results, in seconds (0 = keep forever)
+CELERY_RESULT_EXPIRE=int(os.environ.get('CELERY_RESULT_EXPIRE', 86400))
+RESULT_PERSISTENT_EXPIRE=int(os.environ.get('RESULT_PERSISTENT_EXPIRE', 30 * 86400))
+# Seconds between sweeps of expired entries (per process)
+BLOB_SWEEP_INTERVAL=int(os.environ.get('BLOB_SWEEP_INTERVAL', 3600))
+# File arguments (PDDL) larger than this (in bytes) are sent to the workers as digests
+FILE_INLINE_BYTES=int(os.environ.get('FILE_INLINE_BYTES', 512))
+# Worker-local copy of the file blobs, and its size limit in bytes
+BLOB_CACHE_PATH=os.environ.get('BLOB_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'paas-blob-cache'))
+BLOB_CACHE_BYTES=int(os.environ.get('BLOB_CACHE_BYTES', 256 * 1024 * 1024))
+
+MYSQL_USER=os.environ.get('MYSQL_USER', 'user')
+MYSQL_PASSWORD=os.environ.get('MYSQL_PASSWORD', 'password')
+MYSQL_HOST=os.environ.get('MYSQL_HOST', 'mysql')
+
+# Marks an offloaded value: {BLOB_KEY: digest, "size": bytes}
+BLOB_KEY = "__blob__"
+# Expiry used for entries kept forever (2100-01-01)
+FOREVER = 4102444800
+
+
+def expiry(persistent):
+    """Return the cold-tier expiry timestamp for a result."""
+    seconds = RESULT_PERSISTENT_EXPIRE if persistent else CELERY_RESULT_EXPIRE
+    return FOREVER if seconds == 0 else time.time() + seconds
+
+
+class DiskBlobStore:
+    """
+    Blobs and task records as files under root (a volume shared by the API and
+    the workers). Each file's mtime holds its expiry time, and storing content
+    that already exists only extends it.
+    """
+
+    def __init__(self, root=BLOB_STORE_PATH):
+        self.root = root
+        self._last_sweep = 0
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, "blobs", digest[:2], digest)
+
+    def _task_path(self, task_id):
+        return os.path.join(self.root, "tasks", os.path.basename(task_id) + ".json")
+
+    def _write(self, path, data, expires):
+        if os.path.exists(path):
+            if os.path.getmtime(path) < expires:
+                os.utime(path, (expires, expires))
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = "%s.%d.tmp" % (path, os.getpid())
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.utime(tmp, (expires, expires))
+        os.replace(tmp, path)
+
+    def _read(self, path):
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, data, expires):
+        digest = hashlib.sha256(data).hexdigest()
+        self._write(self._blob_path(digest), data, expires)
+        return digest
+
+    def get(self, digest):
+        return self._read(self._blob_path(digest))
+
+    def put_task(self, task_id, record, expires):
+        path = self._task_path(task_id)
+        if os.path.exists(path):
+            os.remove(path)
+        self._write(path, json.dumps(record).encode('utf-8'), expires)
+
+    def get_task(self, task_id):
+        data = self._read(self._task_path(task_id))
+        return None if data is None else json.loads(data)
+
+    def sweep(self):
+        """Delete expired blobs and task records."""
+        now = time.time()
+        for folder, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(folder, name)
+                try:
+                    if os.path.getmtime(path) < now:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+class MySQLBlobStore:
+    """
+    Blobs and task records in the metadata database (tables result_blobs and
+    result_tasks, as in init/db_init.sql). The tables are created on first use
+    when the database predates them.
+    """
+
+    TABLES = [
+        "CREATE TABLE IF NOT EXISTS result_blobs (digest CHAR(64) PRIMARY KEY, data LONGBLOB, expires_at DOUBLE)",
+        "CREATE TABLE IF NOT EXISTS result_tasks (task_id VARCHAR(255) PRIMARY KEY, record LONGBLOB, expires_at DOUBLE)",
+    ]
+
+    def __init__(self, engine=None):
+        from sqlalchemy import create_engine
+        self.engine = engine or create_engine(f'mysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:3306/db', pool_recycle=500)
+        self._last_sweep = 0
+        self._tables_ready = False
+
+    def _execute(self, query, **params):
+        from sqlalchemy import text
+        if not self._tables_ready:
+            # not at construction, as the database may still be starting up then
+            with self.engine.begin() as conn:
+                for table in self.TABLES:
+                    conn.execute(text(table))
+            self._tables_ready = True
+        with self.engine.begin() as conn:
+            return conn.execute(text(query), params).fetchall() if query.startswith("SELECT") else conn.execute(text(query), params)
+
+    def put(self, data, expires):
+        digest = hashlib.sha256(data).hexdigest()
+        self._execute("INSERT INTO result_blobs (digest, data, expires_at) VALUES (:digest, :data, :expires) "
+                      "ON DUPLICATE KEY UPDATE expires_at = GREATEST(expires_at, VALUES(expires_at))",
+                      digest=digest, data=data, expires=expires)
+        return digest
+
+    def get(self, digest):
+        rows = self._execute("SELECT data FROM result_blobs WHERE digest = :digest", digest=digest)
+        return rows[0][0] if rows else None
+
+    def put_task(self, task_id, record, expires):
+        self._execute("REPLACE INTO result_tasks (task_id, record, expires_at) VALUES (:task_id, :record, :expires)",
+                      task_id=task_id, record=json.dumps(record).encode('utf-8'), expires=expires)
+
+    def get_task(self, task_id):
+        rows = self._execute("SELECT record FROM result_tasks WHERE task_id = :task_id", task_id=task_id)
+        return json.loads(rows[0][0]) if rows else None
+
+    def sweep(self):
+        now = time.time()
+        self._execute("DELETE FROM result_blobs WHERE expires_at < :now", now=now)
+        self._execute("DELETE FROM result_tasks WHERE expires_at < :now", now=now)
+
+
+def get_store():
+    """Return the blob store configured by BLOB_STORE."""
+    return MySQLBlobStore() if BLOB_STORE == 'mysql' else DiskBlobStore()
+
+
+def sweep_if_due(store):
+    """Sweep the store if this process has not done so for BLOB_SWEEP_INTERVAL seconds."""
+    now = time.time()
+    # jitter so that workers started together don't all sweep at once
+    if now - store._last_sweep > BLOB_SWEEP_INTERVAL * random.uniform(1, 1.5):
+        store._last_sweep = now
+        store.sweep()
+
+
+def is_blob(value):
+    return isinstance(value, dict) and BLOB_KEY in value
+
+
+def put_value(value, store, expires):
+    """Store a JSON value and return its digest."""
+    return store.put(json.dumps(value).encode('utf-8'), expires)
+
+
+def get_value(digest, store):
+    """Return the JSON value stored under digest. Raises KeyError if it has expired."""
+    data = store.get(digest)
+    if data is None:
+        raise KeyError(digest)
+    return json.loads(data)
+
+
+def _offload(value, store, expires, inline_bytes=RESULT_INLINE_BYTES):
+    data = json.dumps(value).encode('utf-8')
+    if len(data) <= inline_bytes:
+        return value
+    return {BLOB_KEY: store.put(data, expires), "size": len(data)}
+
+
+def _rehydrate(value, store):
+    return get_value(value[BLOB_KEY], store) if is_blob(value) else value
+
+
+def offload_file_arguments(arguments, store, expires):
+    """
+    Return a copy of a task's arguments in which the values of file arguments
+    larger than FILE_INLINE_BYTES are replaced by references to blobs in
+    store. Identical files share one blob, so a domain submitted with many
+    problems is stored and sent to each worker once.
+    """
+    return {name: dict(arg, value=_offload(arg["value"], store, expires, FILE_INLINE_BYTES))
+            if isinstance(arg, dict) and arg.get("type") == "file" and isinstance(arg.get("value"), str) else arg
+            for name, arg in arguments.items()}
+
+
+def offload_result(result, arguments, store, expires):
+    """
+    Return copies of a task's (result, arguments) in which stdout, stderr, the
+    output files and the argument values larger than RESULT_INLINE_BYTES are
+    replaced by references to blobs in store.
+    """
+    result = dict(result)
+    for key in ("stdout", "stderr"):
+        if key in result:
+            result[key] = _offload(result[key], store, expires)
+    if isinstance(result.get("output"), dict):
+        result["output"] = {name: _offload(v, store, expires) for name, v in result["output"].items()}
+    arguments = {name: dict(arg, value=_offload(arg["value"], store, expires)) if isinstance(arg, dict) and "value" in arg else arg
+                 for name, arg in arguments.items()}
+    return result, arguments
+
+
+def rehydrate_result(result, arguments, store):
+    """
+    Inverse of offload_result. Raises KeyError if a referenced blob has expired.
+    """
+    result = dict(result)
+    for key in ("stdout", "stderr"):
+        if key in result:
+            result[key] = _rehydrate(result[key], store)
+    if isinstance(result.get("output"), dict):
+        result["output"] = {name: _rehydrate(v, store) for name, v in result["output"].items()}
+    arguments = {name: dict(arg, value=_rehydrate(arg["value"], store)) if isinstance(arg, dict) and "value" in arg else arg
+                 for name, arg in arguments.items()}
+    return result, arguments
+
+
+class LocalFileCache:
+    """
+    Size-bounded directory of read-only files, named by key, that are linked
+    into task folders. Keep root in the same file system as the task folders
+    (the temporary directory), so that files are hardlinked rather than
+    copied. The least recently used files are evicted once the cache grows
+    beyond max_bytes.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def get(self, key):
+        """Return the path of the cached file for key, or None."""
+        path = os.path.join(self.root, os.path.basename(key))
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def add(self, key, write):
+        """Cache the file written by write(path) under key and return its path."""
+        path = os.path.join(self.root, os.path.basename(key))
+        tmp = "%s.%d.tmp" % (path, os.getpid())
+        write(tmp)
+        # read-only, as it is shared by every task linking it
+        os.chmod(tmp, 0o444)
+        os.replace(tmp, path)
+        self._trim()
+        return path
+
+    def _trim(self):
+        files = []
+        for name in os.listdir(self.root):
+            try:
+                stat = os.stat(os.path.join(self.root, name))
+                files.append((stat.st_mtime, stat.st_size, name))
+            except FileNotFoundError:
+                pass
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def link(self, cached, path):
+        """
+        Link (or copy) the cached file returned by get() to path and return
+        path. Returns None if the file has been evicted since, which callers
+        treat as a miss.
+        """
+        try:
+            try:
+                os.link(cached, path)
+            except FileNotFoundError:
+                raise
+            except OSError:
+                # e.g. the task folder is on another file system
+                shutil.copyfile(cached, path)
+        except FileNotFoundError:
+            if os.path.exists(cached):
+                raise
+            return None
+        return path
+
+
+class LocalBlobCache(LocalFileCache):
+    """Worker-local cache of file blobs, decoded and ready to be linked into a task folder."""
+
+    def __init__(self, store, root=BLOB_CACHE_PATH, max_bytes=BLOB_CACHE_BYTES):
+        super().__init__(root, max_bytes)
+        self.store = store
+
+    def materialize(self, ref, path):
+        """
+        Create path with the content of the blob referenced by ref. Raises
+        KeyError if the blob has expired.
+        """
+        digest = ref[BLOB_KEY]
+        cached = self.get(digest)
+        if cached is not None and self.link(cached, path) is not None:
+            return path
+        text = get_value(digest, self.store)
+        def write(tmp):
+            with open(tmp, 'w') as f:
+                f.write(text)
+        cached = self.add(digest, write)
+        if self.link(cached, path) is None:
+            # evicted again straight away, e.g. by another worker filling the cache
+            write(path)
+        return path
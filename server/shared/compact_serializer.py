@@ -0,0 +1,67 @@
+import os
+import uuid
+import datetime
+import decimal
+
+import msgpack
+import zstandard
+from kombu.serialization import register
+
+# Celery messages and results (task arguments carry whole PDDL files) are
+# msgpack, zstd-compressed above a size threshold.
+SERIALIZER_NAME = 'msgpack-zstd'
+CONTENT_TYPE = 'application/x-msgpack-zstd'
+# Packed payloads larger than this (in bytes) are compressed
+CELERY_COMPRESS_THRESHOLD=int(os.environ.get('CELERY_COMPRESS_THRESHOLD', 1024))
+CELERY_COMPRESS_LEVEL=int(os.environ.get('CELERY_COMPRESS_LEVEL', 3))
+
+# First byte of every payload
+_RAW = b'M'
+_ZSTD = b'Z'
+
+
+def _default(obj):
+    """Encode the non-msgpack types found in Celery messages and result metadata."""
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, (uuid.UUID, decimal.Decimal)):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError("Cannot serialize %r" % type(obj))
+
+
+def dumps(obj):
+    packed = msgpack.packb(obj, use_bin_type=True, default=_default)
+    if len(packed) > CELERY_COMPRESS_THRESHOLD:
+        # compressors are not thread-safe, so each call makes its own
+        return _ZSTD + zstandard.ZstdCompressor(level=CELERY_COMPRESS_LEVEL).compress(packed)
+    return _RAW + packed
+
+
+def loads(data):
+    if isinstance(data, str):
+        data = data.encode('latin-1')
+    data = bytes(data)
+    if data[:1] == _ZSTD:
+        data = zstandard.ZstdDecompressor().decompress(data[1:])
+    elif data[:1] == _RAW:
+        data = data[1:]
+    else:
+        raise ValueError("Not a %s payload" % SERIALIZER_NAME)
+    return msgpack.unpackb(data, raw=False)
+
+
+def use_compact_serializer(app):
+    """
+    Register the serializer and make it the default of a Celery app for task
+    messages and results. JSON is still accepted, so that messages queued
+    before an upgrade can be read.
+    """
+    register(SERIALIZER_NAME, dumps, loads, content_type=CONTENT_TYPE, content_encoding='binary')
+    app.conf.update(
+        task_serializer=SERIALIZER_NAME,
+        result_serializer=SERIALIZER_NAME,
+        accept_content=[SERIALIZER_NAME, 'json'],
+        result_accept_content=[SERIALIZER_NAME, 'json'],
+    )
@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import logging
+import threading
+
+from metrics import get_redis
+
+# Weighted fair sharing of the workers between clients (API keys, or IP
+# addresses). With FAIR_SHARE set, the API holds submitted tasks in one queue
+# per client and sends them on to Celery only while fewer than
+# FAIR_MAX_IN_FLIGHT tasks are queued or running there, so that a client
+# submitting thousands of tasks cannot fill the Celery queues ahead of
+# everyone else. The next task sent is the one with the smallest virtual
+# finish time (start-time fair queuing): each task costs its expected run
+# time divided by its client's weight.
+FAIR_SHARE=os.environ.get('FAIR_SHARE', 'false') == 'true'
+FAIR_MAX_IN_FLIGHT=int(os.environ.get('FAIR_MAX_IN_FLIGHT', 16))
+FAIR_DEFAULT_WEIGHT=float(os.environ.get('FAIR_DEFAULT_WEIGHT', 1))
+# Most tasks of one client sent to Celery at once (0 for no cap), unless set for the client
+FAIR_DEFAULT_MAX_RUNNING=int(os.environ.get('FAIR_DEFAULT_MAX_RUNNING', 0))
+# Seconds between dispatches of the API's background thread, which sends tasks as others finish
+FAIR_DISPATCH_INTERVAL=float(os.environ.get('FAIR_DISPATCH_INTERVAL', 0.5))
+# Tasks sent this long ago no longer count as running, in case their worker died
+FAIR_RUNNING_TIMEOUT=int(os.environ.get('FAIR_RUNNING_TIMEOUT', 3600))
+# Tasks that fail to be sent this many times (for reasons other than the broker being
+# unreachable) are moved to DEAD_KEY, which keeps the last FAIR_DEAD_LETTERS of them
+FAIR_MAX_ATTEMPTS=int(os.environ.get('FAIR_MAX_ATTEMPTS', 3))
+FAIR_DEAD_LETTERS=int(os.environ.get('FAIR_DEAD_LETTERS', 1000))
+# Longest pause of the dispatcher thread after consecutive failures, in seconds
+FAIR_MAX_BACKOFF=float(os.environ.get('FAIR_MAX_BACKOFF', 30))
+
+CLIENTS_KEY = "paas:fair:clients"
+KNOWN_KEY = "paas:fair:known"
+QUEUE_KEY = "paas:fair:queue:%s"
+RUNNING_KEY = "paas:fair:running:%s"
+IN_FLIGHT_KEY = "paas:fair:in-flight"
+POLICY_KEY = "paas:fair:policy:%s"
+USAGE_KEY = "paas:fair:usage:%s"
+# Virtual time ("virtual_time") and the last finish time of each client ("finish:<client>")
+CLOCK_KEY = "paas:fair:clock"
+# LOCK_KEY is held by the dispatcher for a whole round, CLOCK_LOCK_KEY only while the clock is updated
+LOCK_KEY = "paas:fair:lock"
+CLOCK_LOCK_KEY = "paas:fair:clock-lock"
+DEAD_KEY = "paas:fair:dead"
+
+logger = logging.getLogger(__name__)
+# Set to have the dispatcher thread run a round without waiting for its interval
+_wake = threading.Event()
+
+
+def policy(client):
+    """Return the (weight, max_running) of a client, max_running 0 meaning no cap."""
+    entry = get_redis().hgetall(POLICY_KEY % client)
+    return float(entry.get(b"weight", FAIR_DEFAULT_WEIGHT)), int(entry.get(b"max_running", FAIR_DEFAULT_MAX_RUNNING))
+
+
+def set_policy(client, weight=None, max_running=None):
+    """Set the weight and/or concurrency cap of a client. Raises ValueError unless weight > 0 and max_running >= 0."""
+    if weight is not None and not float(weight) > 0:
+        raise ValueError("weight must be positive")
+    if max_running is not None and int(max_running) < 0:
+        raise ValueError("max_running must be 0 (no cap) or more")
+    mapping = {}
+    if weight is not None:
+        mapping["weight"] = float(weight)
+    if max_running is not None:
+        mapping["max_running"] = int(max_running)
+    if mapping:
+        client_redis = get_redis()
+        client_redis.hset(POLICY_KEY % client, mapping=mapping)
+        client_redis.sadd(KNOWN_KEY, client)
+
+
+def enqueue(client, task_id, entry, cost):
+    """Queue entry (JSON-serializable), to be sent as task_id, behind the client's earlier tasks."""
+    client_redis = get_redis()
+    weight, _ = policy(client)
+    # not the dispatcher's lock, which is held while tasks are being sent
+    with client_redis.lock(CLOCK_LOCK_KEY, timeout=5, blocking_timeout=5):
+        virtual_time, last_finish = client_redis.hmget(CLOCK_KEY, "virtual_time", "finish:%s" % client)
+        start = max(float(virtual_time or 0), float(last_finish or 0))
+        finish = start + max(cost, 0.001) / weight
+        pipe = client_redis.pipeline()
+        pipe.rpush(QUEUE_KEY % client, json.dumps({"task_id": task_id, "start": start, "finish": finish, "entry": entry}))
+        pipe.hset(CLOCK_KEY, "finish:%s" % client, finish)
+        pipe.sadd(CLIENTS_KEY, client)
+        pipe.sadd(KNOWN_KEY, client)
+        pipe.hincrby(USAGE_KEY % client, "submitted", 1)
+        pipe.execute()
+
+
+def _running(client_redis, key):
+    client_redis.zremrangebyscore(key, 0, time.time() - FAIR_RUNNING_TIMEOUT)
+    return client_redis.zcard(key)
+
+
+def _unreachable(error):
+    """Whether a send failed because the broker could not be reached, rather than because of the task."""
+    from kombu.exceptions import OperationalError
+    from redis.exceptions import ConnectionError, TimeoutError
+    return isinstance(error, (OperationalError, ConnectionError, TimeoutError, OSError))
+
+
+def _dead_letter(client_redis, client, item, error, drop):
+    logger.error("Giving up on task %s of %s after %d attempts: %r", item["task_id"], client, item["attempts"], error)
+    pipe = client_redis.pipeline()
+    pipe.lpush(DEAD_KEY, json.dumps(dict(item, client=client, error=repr(error), failed_at=time.time())))
+    pipe.ltrim(DEAD_KEY, 0, FAIR_DEAD_LETTERS - 1)
+    pipe.hincrby(USAGE_KEY % client, "dead_lettered", 1)
+    pipe.execute()
+    if drop is not None:
+        drop(item["task_id"], item["entry"], error)
+
+
+def dispatch(send, drop=None):
+    """
+    Send queued tasks, smallest virtual finish time first, while there is room
+    in flight and their client is under its cap. send(task_id, entry) sends a
+    task and returns False if it was dropped instead. Only one process
+    dispatches at a time; the others return 0 at once.
+    Tasks count as running from just before they are sent, so that one
+    finishing at once is released after it was counted; the count is undone
+    when the send raises or drops the task. A task whose send raises stays at
+    the head of its queue and the round ends. If the broker was reachable the attempt counts, and after
+    FAIR_MAX_ATTEMPTS the task is dead-lettered and drop(task_id, entry,
+    error) is called; if not, the error is raised.
+    Returns the number of tasks taken from the queues.
+    """
+    client_redis = get_redis()
+    lock = client_redis.lock(LOCK_KEY, timeout=30, blocking_timeout=0)
+    if not lock.acquire():
+        return 0
+    taken = 0
+    try:
+        while _running(client_redis, IN_FLIGHT_KEY) < FAIR_MAX_IN_FLIGHT:
+            best = None
+            for name in client_redis.smembers(CLIENTS_KEY):
+                client = name.decode('utf-8')
+                head = client_redis.lindex(QUEUE_KEY % client, 0)
+                if head is None:
+                    client_redis.srem(CLIENTS_KEY, client)
+                    continue
+                _, max_running = policy(client)
+                if max_running and _running(client_redis, RUNNING_KEY % client) >= max_running:
+                    continue
+                item = json.loads(head)
+                if best is None or item["finish"] < best[1]["finish"]:
+                    best = (client, item)
+            if best is None:
+                break
+            client, item = best
+            client_redis.lpop(QUEUE_KEY % client)
+            with client_redis.lock(CLOCK_LOCK_KEY, timeout=5, blocking_timeout=5):
+                virtual_time = float(client_redis.hget(CLOCK_KEY, "virtual_time") or 0)
+                client_redis.hset(CLOCK_KEY, "virtual_time", max(virtual_time, item["start"]))
+            taken += 1
+            now = time.time()
+            pipe = client_redis.pipeline()
+            pipe.zadd(RUNNING_KEY % client, {item["task_id"]: now})
+            pipe.zadd(IN_FLIGHT_KEY, {item["task_id"]: now})
+            pipe.execute()
+            try:
+                sent = send(item["task_id"], item["entry"])
+            except Exception as error:
+                release(client, item["task_id"])
+                if _unreachable(error):
+                    # e.g. the broker is down: keep the task at the head of its queue
+                    client_redis.lpush(QUEUE_KEY % client, json.dumps(item))
+                    taken -= 1
+                    raise
+                item["attempts"] = item.get("attempts", 0) + 1
+                if item["attempts"] >= FAIR_MAX_ATTEMPTS:
+                    _dead_letter(client_redis, client, item, error, drop)
+                    continue
+                logger.warning("Sending task %s of %s failed (attempt %d of %d): %r",
+                               item["task_id"], client, item["attempts"], FAIR_MAX_ATTEMPTS, error)
+                client_redis.lpush(QUEUE_KEY % client, json.dumps(item))
+                taken -= 1
+                break
+            if sent:
+                client_redis.hincrby(USAGE_KEY % client, "sent", 1)
+            else:
+                release(client, item["task_id"])
+    finally:
+        lock.release()
+    return taken
+
+
+def start_dispatcher(send, drop=None):
+    """
+    Dispatch every FAIR_DISPATCH_INTERVAL seconds from a daemon thread, as tasks
+    finish, or sooner when woken (see wake). Failures are logged, and the
+    thread waits twice as long after each consecutive one, up to
+    FAIR_MAX_BACKOFF seconds, whether woken or not.
+    """
+
+    def loop():
+        pause = FAIR_DISPATCH_INTERVAL
+        while True:
+            _wake.clear()
+            try:
+                dispatch(send, drop)
+                pause = FAIR_DISPATCH_INTERVAL
+            except Exception:
+                pause = min(pause * 2, FAIR_MAX_BACKOFF)
+                logger.exception("Fair-share dispatch failed, retrying in %.1f seconds", pause)
+            if pause > FAIR_DISPATCH_INTERVAL:
+                time.sleep(pause)
+            else:
+                _wake.wait(pause)
+
+    threading.Thread(target=loop, name="fair-share-dispatcher", daemon=True).start()
+
+
+def wake():
+    """Have the dispatcher thread send newly queued tasks now rather than at its next round."""
+    _wake.set()
+
+
+def release(client, task_id):
+    """Stop counting a task as running, once it finished or was dropped."""
+    try:
+        pipe = get_redis().pipeline()
+        pipe.zrem(RUNNING_KEY % client, task_id)
+        pipe.zrem(IN_FLIGHT_KEY, task_id)
+        pipe.execute()
+    except Exception:
+        pass
+
+
+def charge(client, seconds):
+    """Account a finished task and the seconds it ran to its client."""
+    try:
+        pipe = get_redis().pipeline()
+        pipe.hincrby(USAGE_KEY % client, "finished", 1)
+        pipe.hincrbyfloat(USAGE_KEY % client, "busy_seconds", seconds)
+        pipe.execute()
+    except Exception:
+        pass
+
+
+def report():
+    """Return {client: {weight, max_running, queued, running, submitted, sent, dead_lettered, finished, busy_seconds}}."""
+    client_redis = get_redis()
+    clients = {}
+    for name in sorted(client_redis.smembers(KNOWN_KEY)):
+        client = name.decode('utf-8')
+        weight, max_running = policy(client)
+        usage = {k.decode('utf-8'): float(v) for k, v in client_redis.hgetall(USAGE_KEY % client).items()}
+        clients[client] = {
+            "weight": weight,
+            "max_running": max_running,
+            "queued": client_redis.llen(QUEUE_KEY % client),
+            "running": _running(client_redis, RUNNING_KEY % client),
+            "submitted": int(usage.get("submitted", 0)),
+            "sent": int(usage.get("sent", 0)),
+            "dead_lettered": int(usage.get("dead_lettered", 0)),
+            "finished": int(usage.get("finished", 0)),
+            "busy_seconds": round(usage.get("busy_seconds", 0), 2),
+        }
+    return clients
@@ -0,0 +1,49 @@
+import os
+import json
+
+# Counters shared by the API processes and the workers, kept in one Redis
+# hash and exported by the API's /metrics endpoint.
+METRICS_REDIS_URL=os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+METRICS_KEY = "paas:metrics"
+
+DESCRIPTIONS = {
+    "paas_tasks_skipped": "Tasks dropped without running, by reason",
+    "paas_size_class_tasks": "Tasks run, by the memory class the API gave them and whether their peak memory matched it",
+    "paas_size_class_peak_mb": "Sum of the peak memory (MB) of the tasks run, by memory class",
+}
+
+_client = None
+
+
+def get_redis():
+    """Return this process's Redis client for the broker."""
+    global _client
+    if _client is None:
+        import redis
+        _client = redis.Redis.from_url(METRICS_REDIS_URL)
+    return _client
+
+
+def incr(name, amount=1, **labels):
+    """Add amount to a counter. Failures are ignored, as metrics never fail a request or task."""
+    try:
+        get_redis().hincrbyfloat(METRICS_KEY, json.dumps([name, labels], sort_keys=True), amount)
+    except Exception:
+        pass
+
+
+class RedisCounters:
+    """prometheus_client collector exporting the counters in METRICS_KEY."""
+
+    def collect(self):
+        from prometheus_client.core import CounterMetricFamily
+        families = {}
+        for field, value in sorted(get_redis().hgetall(METRICS_KEY).items()):
+            name, labels = json.loads(field)
+            names = sorted(labels)
+            family = families.get((name, tuple(names)))
+            if family is None:
+                family = CounterMetricFamily(name, DESCRIPTIONS.get(name, name), labels=names)
+                families[(name, tuple(names))] = family
+            family.add_metric([str(labels[n]) for n in names], float(value))
+        return list(families.values())
@@ -0,0 +1,87 @@
+import os
+import time
+import bisect
+
+from metrics import get_redis, incr
+
+# Deadline-aware scheduling: tasks carry the time by which their client
+# stops waiting. Redis queues are served by priority, and priorities are
+# given by the time left, which approximates earliest-deadline-first.
+# Workers drop tasks whose deadline has passed, or whose client stopped
+# polling /check for TASK_ABANDON_AFTER seconds (0 disables that check).
+TASK_ABANDON_AFTER=int(os.environ.get('TASK_ABANDON_AFTER', 60))
+# Tasks without a deadline are queued as if due in this many seconds, or,
+# when their run time is predicted, in SJF_STRETCH times that run time
+# (shortest expected job first)
+DEFAULT_DEADLINE=int(os.environ.get('DEFAULT_DEADLINE', 300))
+SJF_STRETCH=float(os.environ.get('SJF_STRETCH', 10))
+
+# Upper bounds (seconds left) of priorities 0 (served first) to 8; anything later gets 9
+PRIORITY_BOUNDS = [5, 15, 30, 60, 120, 300, 600, 1800, 3600]
+PRIORITY_STEPS = list(range(len(PRIORITY_BOUNDS) + 1))
+# Separator of kombu's Redis lists for priorities above 0 ("<queue><sep><priority>")
+PRIORITY_SEP = '\x06\x16'
+POLL_KEY = "paas:poll:%s"
+
+
+def use_deadline_priorities(app):
+    """
+    Configure a Celery app for priorities 0-9, 0 being served first, and
+    workers that take one task at a time, so that urgent tasks are not stuck
+    behind prefetched ones. Producers and workers need the same settings.
+    """
+    app.conf.update(
+        broker_transport_options={'priority_steps': PRIORITY_STEPS, 'queue_order_strategy': 'priority'},
+        worker_prefetch_multiplier=1,
+    )
+
+
+def priority(deadline, runtime=None, now=None):
+    """
+    Return the priority of a task due at deadline (a timestamp, or None) and
+    expected to run for runtime seconds (or None). Tasks with a deadline are
+    ordered by slack, the time that will be left once they have run.
+    """
+    if deadline is not None:
+        left = deadline - (now or time.time()) - (runtime or 0)
+    elif runtime is not None:
+        left = SJF_STRETCH * runtime
+    else:
+        left = DEFAULT_DEADLINE
+    return bisect.bisect_left(PRIORITY_BOUNDS, left)
+
+
+def queue_keys(queue):
+    """Return the Redis lists holding the messages of a queue, one per priority."""
+    return [queue] + ["%s%s%d" % (queue, PRIORITY_SEP, p) for p in PRIORITY_STEPS[1:]]
+
+
+def record_poll(task_id):
+    """Note that the client of a task has just polled it."""
+    try:
+        get_redis().set(POLL_KEY % task_id, time.time(), ex=max(TASK_ABANDON_AFTER, 1) * 10)
+    except Exception:
+        pass
+
+
+def skip_reason(task_id, deadline, persistent=False):
+    """
+    Return why a task about to start should be dropped ("deadline" or
+    "abandoned"), or None. Only tasks whose client has polled them can be
+    abandoned, and persistent tasks never are.
+    """
+    now = time.time()
+    if deadline is not None and now > deadline:
+        return "deadline"
+    if TASK_ABANDON_AFTER and not persistent:
+        try:
+            last_poll = get_redis().get(POLL_KEY % task_id)
+        except Exception:
+            return None
+        if last_poll is not None and now - float(last_poll) > TASK_ABANDON_AFTER:
+            return "abandoned"
+    return None
+
+
+def count_skip(reason):
+    incr("paas_tasks_skipped", reason=reason)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The shared modules import each other by their flat names, as on the path of the API and the workers
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,91 @@
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+import affinity
+from affinity import HashRing, AffinityRouter, WORKERS_KEY, WORKER_KEY
+from scheduling import queue_keys
+
+KEYS = ["domain-%d" % i for i in range(200)]
+
+
+@pytest.fixture(autouse=True)
+def redis(monkeypatch):
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(affinity, "_redis", lambda: client)
+    return client
+
+
+def add_worker(client, name, slots=1, pool="small", load=0):
+    client.hset(WORKER_KEY % name, mapping={"queue": "%s.dq" % name, "slots": slots, "pool": pool, "load": load})
+    client.sadd(WORKERS_KEY, name)
+
+
+def test_ring_walks_every_node_once():
+    ring = HashRing(["w1", "w2", "w3"], vnodes=16)
+    for key in KEYS[:20]:
+        walk = list(ring.walk(key))
+        assert sorted(walk) == ["w1", "w2", "w3"]
+        assert walk == list(ring.walk(key))
+
+
+def test_ring_only_moves_the_keys_of_a_removed_node():
+    before = HashRing(["w1", "w2", "w3"])
+    after = HashRing(["w1", "w3"])
+    owners = {key: next(before.walk(key)) for key in KEYS}
+    assert set(owners.values()) == {"w1", "w2", "w3"}
+    for key, owner in owners.items():
+        if owner != "w2":
+            assert next(after.walk(key)) == owner
+
+
+def test_route_to_the_owner_of_the_key(redis):
+    for name in ("w1", "w2", "w3"):
+        add_worker(redis, name, slots=4)
+    router = AffinityRouter()
+    ring = HashRing(["w1", "w2", "w3"])
+    for key in KEYS[:20]:
+        assert router.route(key) == next(ring.walk(key))
+
+
+def test_route_spills_from_a_loaded_worker(redis):
+    add_worker(redis, "w1")
+    add_worker(redis, "w2")
+    key = next(k for k in KEYS if next(HashRing(["w1", "w2"]).walk(k)) == "w1")
+    router = AffinityRouter(refresh=0)
+    assert router.route(key) == "w1"
+    # load counts the tasks the worker reserved and those waiting in its queue, at any priority
+    redis.hset(WORKER_KEY % "w1", "load", 1)
+    redis.rpush(queue_keys("w1.dq")[3], "task")
+    assert router.route(key) == "w2"
+    # the capacity follows the average load, so that some worker always has room
+    redis.hset(WORKER_KEY % "w2", "load", 3)
+    assert router.route(key) == "w1"
+
+
+def test_route_within_the_pool(redis):
+    add_worker(redis, "small1", slots=4)
+    add_worker(redis, "large1", slots=4, pool="large")
+    router = AffinityRouter()
+    assert {router.route(key, "large") for key in KEYS[:20]} == {"large1"}
+    assert {router.route(key) for key in KEYS[:20]} == {"small1"}
+
+
+def test_route_without_workers(redis):
+    assert AffinityRouter().route("d") is None
+    add_worker(redis, "w1")
+    assert AffinityRouter().route("d", "large") is None
+
+
+def test_workers_missing_heartbeats_are_dropped(redis):
+    add_worker(redis, "w1", slots=4)
+    redis.sadd(WORKERS_KEY, "gone")
+    assert {AffinityRouter().route(key) for key in KEYS[:20]} == {"w1"}
+    assert redis.smembers(WORKERS_KEY) == {b"w1"}
+
+
+def test_route_without_redis(monkeypatch):
+    def unreachable():
+        raise ConnectionError("no broker")
+    monkeypatch.setattr(affinity, "_redis", unreachable)
+    assert AffinityRouter().route("d") is None
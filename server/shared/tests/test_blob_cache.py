@@ -0,0 +1,94 @@
+import os
+import time
+
+import pytest
+
+from blob_store import DiskBlobStore, LocalBlobCache, LocalFileCache, FILE_INLINE_BYTES, BLOB_KEY, expiry, is_blob, \
+    offload_file_arguments
+
+DOMAIN = "(define (domain d) %s)" % ("(:action a)" * FILE_INLINE_BYTES)
+
+
+class CountingStore(DiskBlobStore):
+    def __init__(self, root):
+        super().__init__(root)
+        self.gets = 0
+
+    def get(self, digest):
+        self.gets += 1
+        return super().get(digest)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CountingStore(str(tmp_path / "store"))
+
+
+def test_only_large_files_are_offloaded(store):
+    arguments = {"domain": {"value": DOMAIN, "type": "file"}, "problem": {"value": "(define)", "type": "file"},
+                 "options": {"value": "x" * (FILE_INLINE_BYTES + 1), "type": "string"}}
+    offloaded = offload_file_arguments(arguments, store, expiry(False))
+    assert is_blob(offloaded["domain"]["value"]) and offloaded["domain"]["type"] == "file"
+    assert offloaded["problem"] == arguments["problem"] and offloaded["options"] == arguments["options"]
+    again = offload_file_arguments(arguments, store, expiry(False))
+    assert again["domain"]["value"][BLOB_KEY] == offloaded["domain"]["value"][BLOB_KEY]
+
+
+def test_materialize_reads_each_blob_once(store, tmp_path):
+    ref = offload_file_arguments({"domain": {"value": DOMAIN, "type": "file"}}, store, expiry(False))["domain"]["value"]
+    cache = LocalBlobCache(store, str(tmp_path / "cache"), 10 ** 6)
+    for task in ("task1", "task2"):
+        os.makedirs(str(tmp_path / task))
+        path = cache.materialize(ref, str(tmp_path / task / "domain.pddl"))
+        with open(path) as f:
+            assert f.read() == DOMAIN
+    assert store.gets == 1
+
+
+def test_expired_blobs_raise_key_error(store, tmp_path):
+    ref = {BLOB_KEY: store.put(b'"gone"', time.time() - 1), "size": 6}
+    store.sweep()
+    with pytest.raises(KeyError):
+        LocalBlobCache(store, str(tmp_path / "cache"), 10 ** 6).materialize(ref, str(tmp_path / "domain.pddl"))
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    cache = LocalFileCache(str(tmp_path / "cache"), 250)
+
+    def write(text):
+        def writer(path):
+            with open(path, "w") as f:
+                f.write(text)
+        return writer
+
+    first = cache.add("a", write("a" * 100))
+    second = cache.add("b", write("b" * 100))
+    os.utime(first, (1, 1))
+    os.utime(second, (2, 2))
+    # using a file makes it the most recent
+    assert cache.get("a") is not None
+    cache.add("c", write("c" * 100))
+    assert cache.get("b") is None and cache.get("a") is not None and cache.get("c") is not None
+    # cached files are shared between tasks, so they are read-only
+    assert not os.access(first, os.W_OK) or os.geteuid() == 0
+
+
+def test_files_evicted_after_the_lookup_are_misses(store, tmp_path, monkeypatch):
+    ref = offload_file_arguments({"domain": {"value": DOMAIN, "type": "file"}}, store, expiry(False))["domain"]["value"]
+    cache = LocalBlobCache(store, str(tmp_path / "cache"), 10 ** 6)
+    os.makedirs(str(tmp_path / "task1"))
+    cache.materialize(ref, str(tmp_path / "task1" / "domain.pddl"))
+    lookup = cache.get
+
+    def get_then_evict(key):
+        path = lookup(key)
+        os.remove(path)
+        return path
+
+    monkeypatch.setattr(cache, "get", get_then_evict)
+    os.makedirs(str(tmp_path / "task2"))
+    path = cache.materialize(ref, str(tmp_path / "task2" / "domain.pddl"))
+    with open(path) as f:
+        assert f.read() == DOMAIN
+    assert store.gets == 2
+    assert cache.link(str(tmp_path / "cache" / "gone"), str(tmp_path / "task2" / "problem.pddl")) is None
@@ -0,0 +1,74 @@
+import os
+import time
+
+import pytest
+
+from blob_store import (DiskBlobStore, BLOB_KEY, RESULT_INLINE_BYTES, expiry, get_value, is_blob, put_value,
+                        offload_result, rehydrate_result)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DiskBlobStore(str(tmp_path))
+
+
+def test_put_is_content_addressed_and_extends_expiry(store):
+    soon = time.time() + 60
+    later = time.time() + 3600
+    digest = store.put(b"plan", soon)
+    assert store.put(b"plan", later) == digest
+    assert store.get(digest) == b"plan"
+    assert os.path.getmtime(store._blob_path(digest)) == pytest.approx(later)
+    # storing it again with an earlier expiry keeps the later one
+    store.put(b"plan", soon)
+    assert os.path.getmtime(store._blob_path(digest)) == pytest.approx(later)
+
+
+def test_sweep_deletes_expired_entries(store):
+    old = store.put(b"old", time.time() - 1)
+    new = store.put(b"new", expiry(False))
+    store.put_task("t1", {"status": "SUCCESS"}, time.time() - 1)
+    store.sweep()
+    assert store.get(old) is None
+    assert store.get(new) == b"new"
+    assert store.get_task("t1") is None
+    with pytest.raises(KeyError):
+        get_value(old, store)
+
+
+def test_task_records_are_replaced(store):
+    store.put_task("t1", {"status": "PENDING"}, expiry(True))
+    store.put_task("t1", {"status": "SUCCESS"}, expiry(True))
+    assert store.get_task("t1") == {"status": "SUCCESS"}
+    assert store.get_task("../t1") == {"status": "SUCCESS"}
+
+
+def test_offload_result_round_trip(store):
+    big = "x" * (RESULT_INLINE_BYTES + 1)
+    result = {"stdout": big, "stderr": "", "output": {"plan": big, "log": "ok"}}
+    arguments = {"domain": {"value": big, "type": "file"}, "problem": {"value": "(define)", "type": "file"}}
+    cold_result, cold_arguments = offload_result(result, arguments, store, expiry(False))
+    assert is_blob(cold_result["stdout"]) and is_blob(cold_result["output"]["plan"])
+    assert cold_result["stderr"] == "" and cold_result["output"]["log"] == "ok"
+    assert is_blob(cold_arguments["domain"]["value"]) and not is_blob(cold_arguments["problem"]["value"])
+    # identical values share one blob
+    assert cold_result["stdout"][BLOB_KEY] == cold_result["output"]["plan"][BLOB_KEY]
+    assert rehydrate_result(cold_result, cold_arguments, store) == (result, arguments)
+
+
+def test_put_value_round_trip(store):
+    value = {"plan": ["(pick-up a)"], "cost": 1}
+    assert get_value(put_value(value, store, expiry(False)), store) == value
+
+
+def test_mysql_store_creates_its_tables(tmp_path):
+    sqlalchemy = pytest.importorskip("sqlalchemy")
+    from blob_store import MySQLBlobStore
+    # SQLite understands the table definitions and the task record queries
+    store = MySQLBlobStore(sqlalchemy.create_engine("sqlite:///%s" % (tmp_path / "meta.db")))
+    store.put_task("t1", {"status": "SUCCESS"}, time.time() + 60)
+    assert store.get_task("t1") == {"status": "SUCCESS"}
+    assert store.get("0" * 64) is None
+    store.put_task("t2", {"status": "SUCCESS"}, time.time() - 1)
+    store.sweep()
+    assert store.get_task("t2") is None
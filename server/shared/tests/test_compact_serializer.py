@@ -0,0 +1,47 @@
+import datetime
+import uuid
+
+import pytest
+from celery import Celery
+from kombu import serialization
+
+from compact_serializer import dumps, loads, use_compact_serializer, CELERY_COMPRESS_THRESHOLD, SERIALIZER_NAME
+
+
+def test_small_payloads_are_not_compressed():
+    value = [["lama-first", {"domain": {"value": "(define)", "type": "file"}}], {"deadline": 12.5}]
+    data = dumps(value)
+    assert data[:1] == b"M"
+    assert loads(data) == value
+
+
+def test_large_payloads_are_compressed():
+    value = {"domain": "(define (domain d) " + "(:action a) " * CELERY_COMPRESS_THRESHOLD + ")", "plan": b"\x00\x01"}
+    data = dumps(value)
+    assert data[:1] == b"Z"
+    assert len(data) < len(value["domain"]) // 10
+    assert loads(data) == value
+    assert loads(data.decode("latin-1")) == value
+
+
+def test_celery_types_become_strings_and_lists():
+    when = datetime.datetime(2026, 1, 2, 3, 4, 5)
+    task_id = uuid.uuid4()
+    assert loads(dumps({"date_done": when, "id": task_id, "tags": {"a"}})) == \
+        {"date_done": when.isoformat(), "id": str(task_id), "tags": ["a"]}
+    with pytest.raises(TypeError):
+        dumps(object())
+
+
+def test_foreign_payloads_are_rejected():
+    with pytest.raises(ValueError):
+        loads(b'{"json": true}')
+
+
+def test_celery_app_uses_it_and_still_reads_json():
+    app = Celery("test")
+    use_compact_serializer(app)
+    assert app.conf.task_serializer == app.conf.result_serializer == SERIALIZER_NAME
+    assert "json" in app.conf.accept_content
+    content_type, encoding, data = serialization.dumps({"result": "x" * 5000}, serializer=SERIALIZER_NAME)
+    assert serialization.loads(data, content_type, encoding, accept=serialization.prepare_accept_content(app.conf.accept_content)) == {"result": "x" * 5000}
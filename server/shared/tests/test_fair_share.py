@@ -0,0 +1,156 @@
+import json
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+import fair_share
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def redis(monkeypatch):
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(metrics, "_client", client)
+    monkeypatch.setattr(fair_share, "FAIR_MAX_IN_FLIGHT", 100)
+    return client
+
+
+def sender(sent, fail=None):
+    def send(task_id, entry):
+        if fail is not None and task_id in fail:
+            raise fail[task_id]
+        sent.append(task_id)
+        return True
+    return send
+
+
+def test_dispatch_order_follows_the_weights():
+    fair_share.set_policy("heavy", weight=2)
+    for i in range(4):
+        fair_share.enqueue("heavy", "h%d" % i, {}, 1.0)
+        fair_share.enqueue("light", "l%d" % i, {}, 1.0)
+    sent = []
+    assert fair_share.dispatch(sender(sent)) == 8
+    # finish times: heavy 0.5, 1, 1.5, 2 and light 1, 2, 3, 4
+    assert sent[0] == "h0"
+    assert set(sent[1:3]) == {"h1", "l0"}
+    assert sent.index("h3") < sent.index("l2")
+    assert sent[-2:] == ["l2", "l3"]
+
+
+def test_late_clients_start_at_the_virtual_time():
+    for i in range(3):
+        fair_share.enqueue("early", "e%d" % i, {}, 1.0)
+    sent = []
+    fair_share.dispatch(sender(sent))
+    fair_share.enqueue("early", "e3", {}, 1.0)
+    fair_share.enqueue("late", "l0", {}, 1.0)
+    fair_share.dispatch(sender(sent))
+    # late is not owed the time early used before it arrived
+    assert sent[3:] == ["l0", "e3"]
+
+
+def test_caps_hold_tasks_until_released(monkeypatch):
+    monkeypatch.setattr(fair_share, "FAIR_MAX_IN_FLIGHT", 3)
+    fair_share.set_policy("capped", max_running=1)
+    for i in range(3):
+        fair_share.enqueue("capped", "c%d" % i, {}, 1.0)
+        fair_share.enqueue("other", "o%d" % i, {}, 1.0)
+    sent = []
+    fair_share.dispatch(sender(sent))
+    assert sorted(sent) == ["c0", "o0", "o1"]
+    fair_share.release("capped", "c0")
+    fair_share.dispatch(sender(sent))
+    assert sent[3:] == ["c1"]
+    report = fair_share.report()
+    assert report["capped"]["queued"] == 1 and report["capped"]["running"] == 1
+    assert report["other"]["sent"] == 2
+
+
+def test_policy_is_validated():
+    with pytest.raises(ValueError):
+        fair_share.set_policy("c", weight=0)
+    with pytest.raises(ValueError):
+        fair_share.set_policy("c", max_running=-1)
+    assert fair_share.policy("c") == (fair_share.FAIR_DEFAULT_WEIGHT, fair_share.FAIR_DEFAULT_MAX_RUNNING)
+
+
+def test_unreachable_broker_keeps_the_task_queued(redis):
+    fair_share.enqueue("c", "t0", {}, 1.0)
+    with pytest.raises(ConnectionError):
+        fair_share.dispatch(sender([], {"t0": ConnectionError("broker down")}))
+    item = json.loads(redis.lindex(fair_share.QUEUE_KEY % "c", 0))
+    assert item["task_id"] == "t0" and "attempts" not in item
+
+
+def test_failing_tasks_are_dead_lettered(redis):
+    fair_share.enqueue("c", "bad", {"n": 1}, 1.0)
+    fair_share.enqueue("c", "good", {}, 1.0)
+    sent, dropped = [], []
+    send = sender(sent, {"bad": TypeError("not serializable")})
+    for _ in range(fair_share.FAIR_MAX_ATTEMPTS - 1):
+        assert fair_share.dispatch(send, lambda *args: dropped.append(args)) == 0
+    assert sent == [] and dropped == []
+    assert fair_share.dispatch(send, lambda *args: dropped.append(args)) == 2
+    assert sent == ["good"]
+    assert [(task_id, entry) for task_id, entry, _ in dropped] == [("bad", {"n": 1})]
+    dead = json.loads(redis.lindex(fair_share.DEAD_KEY, 0))
+    assert dead["task_id"] == "bad" and dead["client"] == "c" and dead["attempts"] == fair_share.FAIR_MAX_ATTEMPTS
+    assert fair_share.report()["c"]["dead_lettered"] == 1
+
+
+def test_tasks_finishing_during_their_send_are_released(redis):
+    fair_share.enqueue("c", "fast", {}, 1.0)
+
+    def send(task_id, entry):
+        # the worker finishes the task before send returns
+        assert redis.zscore(fair_share.IN_FLIGHT_KEY, task_id) is not None
+        fair_share.release("c", task_id)
+        return True
+
+    assert fair_share.dispatch(send) == 1
+    assert redis.zcard(fair_share.IN_FLIGHT_KEY) == 0 and redis.zcard(fair_share.RUNNING_KEY % "c") == 0
+    assert fair_share.report()["c"]["sent"] == 1
+
+
+def test_failed_or_dropped_sends_do_not_count_as_running(redis):
+    fair_share.enqueue("c", "dropped", {}, 1.0)
+    fair_share.enqueue("c", "failing", {}, 1.0)
+
+    def send(task_id, entry):
+        if task_id == "failing":
+            raise ConnectionError("broker down")
+        return False
+
+    with pytest.raises(ConnectionError):
+        fair_share.dispatch(send)
+    assert redis.zcard(fair_share.IN_FLIGHT_KEY) == 0 and redis.zcard(fair_share.RUNNING_KEY % "c") == 0
+    assert fair_share.report()["c"]["sent"] == 0
+
+
+def test_enqueue_does_not_wait_for_a_dispatch_round(redis):
+    with redis.lock(fair_share.LOCK_KEY, timeout=30):
+        fair_share.enqueue("c", "t0", {}, 1.0)
+        assert fair_share.dispatch(sender([])) == 0
+    assert redis.llen(fair_share.QUEUE_KEY % "c") == 1
+
+
+def test_wake_starts_a_round_at_once(monkeypatch):
+    monkeypatch.setattr(fair_share, "FAIR_DISPATCH_INTERVAL", 60)
+    monkeypatch.setattr(fair_share, "_wake", fair_share.threading.Event())
+    rounds = fair_share.threading.Semaphore(0)
+    calls = []
+
+    def dispatch(send, drop):
+        calls.append(send)
+        rounds.release()
+        if len(calls) == 2:
+            # park the thread, which the test process does not wait for
+            fair_share.threading.Event().wait()
+
+    monkeypatch.setattr(fair_share, "dispatch", dispatch)
+    fair_share.start_dispatcher(None)
+    assert rounds.acquire(timeout=5)
+    fair_share.wake()
+    assert rounds.acquire(timeout=5)
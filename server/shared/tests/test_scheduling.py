@@ -0,0 +1,82 @@
+import time
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+import metrics
+import scheduling
+from scheduling import priority, queue_keys, skip_reason, record_poll, PRIORITY_BOUNDS, PRIORITY_SEP, POLL_KEY
+
+NOW = 1000000.0
+
+
+@pytest.fixture(autouse=True)
+def redis(monkeypatch):
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(metrics, "_client", client)
+    return client
+
+
+@pytest.mark.parametrize("left,expected", [
+    (-10, 0), (0, 0), (5, 0), (5.5, 1), (15, 1), (16, 2), (300, 5), (301, 6), (3600, 8), (3601, 9), (10 ** 6, 9),
+])
+def test_priority_buckets(left, expected):
+    # a bound belongs to the bucket it ends
+    assert priority(NOW + left, now=NOW) == expected
+
+
+def test_priority_uses_the_slack():
+    assert priority(NOW + 100, runtime=90, now=NOW) == priority(NOW + 10, now=NOW) == 1
+    assert priority(NOW + 100, runtime=200, now=NOW) == 0
+
+
+def test_priority_without_deadline(monkeypatch):
+    monkeypatch.setattr(scheduling, "SJF_STRETCH", 10)
+    monkeypatch.setattr(scheduling, "DEFAULT_DEADLINE", 300)
+    assert priority(None) == 5
+    assert priority(None, runtime=0.5) == 0
+    assert priority(None, runtime=3) == 2
+    assert priority(None, runtime=1000) == len(PRIORITY_BOUNDS)
+
+
+def test_queue_keys():
+    keys = queue_keys("celery")
+    assert keys[0] == "celery"
+    assert keys[1:] == ["celery%s%d" % (PRIORITY_SEP, p) for p in range(1, len(PRIORITY_BOUNDS) + 1)]
+
+
+def test_skip_after_the_deadline():
+    assert skip_reason("t", time.time() - 1) == "deadline"
+    assert skip_reason("t", time.time() - 1, persistent=True) == "deadline"
+    assert skip_reason("t", time.time() + 60) is None
+    assert skip_reason("t", None) is None
+
+
+def test_skip_abandoned_tasks(redis, monkeypatch):
+    monkeypatch.setattr(scheduling, "TASK_ABANDON_AFTER", 60)
+    record_poll("t")
+    assert 0 < redis.ttl(POLL_KEY % "t") <= 600
+    assert skip_reason("t", None) is None
+    redis.set(POLL_KEY % "t", time.time() - 61)
+    assert skip_reason("t", None) == "abandoned"
+    assert skip_reason("t", None, persistent=True) is None
+    # tasks never polled are not abandoned
+    assert skip_reason("other", None) is None
+    monkeypatch.setattr(scheduling, "TASK_ABANDON_AFTER", 0)
+    assert skip_reason("t", None) is None
+
+
+def test_skip_without_redis(monkeypatch):
+    class Unreachable:
+        def get(self, key):
+            raise ConnectionError("no broker")
+    monkeypatch.setattr(metrics, "_client", Unreachable())
+    assert skip_reason("t", None) is None
+    record_poll("t")
+
+
+def test_count_skip(redis):
+    scheduling.count_skip("deadline")
+    scheduling.count_skip("deadline")
+    assert list(redis.hgetall(metrics.METRICS_KEY).values()) == [b"2"]
@@ -0,0 +1,75 @@
+"""
+Benchmark GroundProblem on standard IPC domains: operator and fluent counts and
+grounding time with relaxed-reachability pruning against the naive product of
+all type-compatible objects.
+
+Usage: python bench_grounding.py [size ...]   (default sizes: 4 8 12)
+"""
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, "..", "..", "server", "api", "adaptor", "planning_editor_adaptor", "action_plan_parser"))
+from grounder import GroundProblem
+
+
+def blocksworld(n):
+    blocks = ["b%d" % i for i in range(n)]
+    init = ["(clear %s)" % blocks[-1], "(ontable %s)" % blocks[0], "(handempty)"]
+    init += ["(on %s %s)" % (blocks[i + 1], blocks[i]) for i in range(n - 1)]
+    goal = ["(on %s %s)" % (blocks[i], blocks[i + 1]) for i in range(n - 1)]
+    return "(define (problem bw-%d) (:domain blocks) (:objects %s) (:init %s) (:goal (and %s)))" % \
+        (n, " ".join(blocks), " ".join(init), " ".join(goal))
+
+
+def gripper(n):
+    balls = ["ball%d" % i for i in range(n)]
+    objects = ["rooma", "roomb", "left", "right"] + balls
+    init = ["(room rooma)", "(room roomb)", "(gripper left)", "(gripper right)", "(free left)",
+            "(free right)", "(at-robby rooma)"]
+    init += ["(ball %s)" % b for b in balls] + ["(at %s rooma)" % b for b in balls]
+    goal = ["(at %s roomb)" % b for b in balls]
+    return "(define (problem gripper-%d) (:domain gripper-strips) (:objects %s) (:init %s) (:goal (and %s)))" % \
+        (n, " ".join(objects), " ".join(init), " ".join(goal))
+
+
+def logistics(n):
+    cities = ["city%d" % i for i in range(n)]
+    objects = ["%s - city" % c for c in cities]
+    objects += ["%s-apt - airport" % c for c in cities] + ["%s-post - location" % c for c in cities]
+    objects += ["truck%d - truck" % i for i in range(n)] + ["plane0 - airplane"]
+    objects += ["pkg%d - package" % i for i in range(n)]
+    init = ["(at plane0 city0-apt)"]
+    for i, c in enumerate(cities):
+        init += ["(in-city %s-apt %s)" % (c, c), "(in-city %s-post %s)" % (c, c),
+                 "(at truck%d %s-post)" % (i, c), "(at pkg%d %s-post)" % (i, c)]
+    goal = ["(at pkg%d %s-post)" % (i, cities[(i + 1) % n]) for i in range(n)]
+    return "(define (problem logistics-%d) (:domain logistics) (:objects %s) (:init %s) (:goal (and %s)))" % \
+        (n, " ".join(objects), " ".join(init), " ".join(goal))
+
+
+PROBLEMS = [("blocksworld", blocksworld), ("gripper", gripper), ("logistics", logistics)]
+
+
+def ground(domain, problem, reachability):
+    start = time.time()
+    task = GroundProblem(domain, problem, reachability=reachability)
+    return len(task.operators), len(task.fluents), time.time() - start
+
+
+def main(sizes):
+    print("%-12s %4s  %20s  %20s  %18s" % ("domain", "size", "operators (naive)", "fluents (naive)", "seconds (naive)"))
+    for name, generate in PROBLEMS:
+        with open(os.path.join(HERE, "domains", name + ".pddl")) as f:
+            domain = f.read()
+        for n in sizes:
+            problem = generate(n)
+            naive = ground(domain, problem, False)
+            pruned = ground(domain, problem, True)
+            print("%-12s %4d  %8d (%9d)  %8d (%9d)  %7.3f (%8.3f)" %
+                  (name, n, pruned[0], naive[0], pruned[1], naive[1], pruned[2], naive[2]))
+
+
+if __name__ == "__main__":
+    main([int(n) for n in sys.argv[1:]] or [4, 8, 12])
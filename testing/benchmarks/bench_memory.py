@@ -0,0 +1,70 @@
+"""
+Measure the memory held by grounded parser objects with tracemalloc: bytes per
+two-argument fluent wrapped in a Primitive, and bytes per ground operator whose
+precondition and effect are And/Not formulas over those fluents. Names are
+built at run time, as the parser does, so the compiler does not intern them.
+
+Usage: python bench_memory.py [--parser DIR] [count]   (default count: 30000)
+
+--parser points at another action_plan_parser directory, e.g. a worktree of an
+older revision, to compare against it. Figures on CPython 3.11 with 30000:
+
+    revision                      fluent   operator
+    baseline (no slots/interning)    544        699
+    slots + interned symbols         296        483
+"""
+import os
+import sys
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PARSER = os.path.join(HERE, "..", "..", "server", "api", "adaptor", "planning_editor_adaptor", "action_plan_parser")
+
+
+def symbol(*parts):
+    return "".join(parts)
+
+
+def build_fluents(n, Predicate, Primitive):
+    objects = 1 + int(n ** 0.5)
+    return [Primitive(Predicate(symbol("at"), None,
+                                [(symbol("o", str(i % objects)), symbol("obj")),
+                                 (symbol("o", str(i // objects)), symbol("obj"))]))
+            for i in range(n)]
+
+
+def build_operators(fluents, Action, And, Not):
+    return [Action(symbol("move_", str(i)), [],
+                   And([fluents[i]]), None,
+                   And([Not([fluents[i]]), fluents[(i + 1) % len(fluents)]]))
+            for i in range(len(fluents))]
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, used
+
+
+def main(argv):
+    parser = PARSER
+    if argv[:1] == ["--parser"]:
+        parser, argv = argv[1], argv[2:]
+    n = int(argv[0]) if argv else 30000
+    sys.path.insert(0, os.path.abspath(parser))
+    from predicate import Predicate
+    from formula import Primitive, And, Not
+    from action import Action
+
+    fluents, fluent_bytes = measure(lambda: build_fluents(n, Predicate, Primitive))
+    operators, operator_bytes = measure(lambda: build_operators(fluents, Action, And, Not))
+    print("%-10s %8s %10s" % ("object", "count", "bytes each"))
+    print("%-10s %8d %10d" % ("fluent", n, fluent_bytes // n))
+    print("%-10s %8d %10d" % ("operator", len(operators), operator_bytes // len(operators)))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,41 @@
+"""
+Benchmark the streaming plan parser used by the planning editor adaptor.
+
+Each plan in plans/ is repeated until it reaches the requested size, then parsed
+with action_plan_parser.plan_parser.Plan and with the regex used previously.
+
+Usage: python bench_plan_parser.py [size in MB, default 4]
+"""
+import os
+import re
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, "..", "..", "server", "api", "adaptor", "planning_editor_adaptor", "action_plan_parser"))
+from plan_parser import Plan
+
+OLD_STEP_RE = re.compile(r"(\([a-z\d _-]*\))")
+
+
+def main(size_mb):
+    for name in sorted(os.listdir(os.path.join(HERE, "plans"))):
+        with open(os.path.join(HERE, "plans", name)) as f:
+            sample = f.read().lower()
+        text = sample * max(1, int(size_mb * 1024 * 1024 / len(sample)))
+
+        start = time.time()
+        plan = Plan(text)
+        steps = sum(1 for _ in plan)
+        new_time = time.time() - start
+
+        start = time.time()
+        old_steps = len(OLD_STEP_RE.findall(text))
+        old_time = time.time() - start
+
+        print("%-14s %6.1f MB  steps %8d (old regex %8d)  cost %-8s  %.3fs (old regex %.3fs)" %
+              (name, len(text) / 1024.0 / 1024.0, steps, old_steps, plan.cost, new_time, old_time))
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 4)
@@ -0,0 +1,79 @@
+"""
+Benchmark the Celery serializer on the messages PaaS sends: the run_package
+task message (domain and problem files as arguments) and its stored result
+(planner log, plan file and the echoed arguments). Sizes and encode + decode
+times of kombu's json are compared with plain msgpack and with msgpack-zstd
+(server/shared/compact_serializer.py).
+
+Usage: python bench_serializer.py [size ...]   (default sizes: 4 16 64)
+"""
+import os
+import sys
+import time
+import uuid
+import datetime
+
+import msgpack
+from kombu.utils import json
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, "..", "..", "server", "shared"))
+from compact_serializer import dumps, loads
+from bench_grounding import PROBLEMS
+
+REPEAT = 20
+
+
+def task_message(domain, problem):
+    arguments = {"domain": {"value": domain, "type": "file"}, "problem": {"value": problem, "type": "file"}}
+    args = ["lama-first", arguments, "lama-first {domain} {problem}", {"plan": {"type": "file", "files": "*plan*"}}]
+    kwargs = {"persistent": "false", "estimate": {"h_add": 42, "h_ff": 17}}
+    # Celery protocol 2 body: (args, kwargs, embed)
+    return [args, kwargs, {"callbacks": None, "errbacks": None, "chain": None, "chord": None}]
+
+
+def task_result(domain, problem):
+    with open(os.path.join(HERE, "plans", "classical.plan")) as f:
+        plan = f.read()
+    stdout = "".join("[t=0.%04ds, 12345 KB] %s (1)\n" % (i, step) for i, step in enumerate(plan.splitlines() * 20))
+    arguments = {"domain": {"value": domain, "type": "file"}, "problem": {"value": problem, "type": "file"}}
+    result = {"stdout": stdout, "stderr": "", "call": "timeout 30 planutils run lama-first -- domain problem",
+              "output": {"sas_plan": plan}, "output_type": "file"}
+    return {"status": "SUCCESS", "result": [result, arguments], "traceback": None, "children": [],
+            "date_done": datetime.datetime.utcnow().isoformat(), "task_id": str(uuid.uuid4())}
+
+
+CODECS = [
+    ("json", lambda obj: json.dumps(obj).encode("utf-8"), lambda data: json.loads(data)),
+    ("msgpack", lambda obj: msgpack.packb(obj, use_bin_type=True), lambda data: msgpack.unpackb(data, raw=False)),
+    ("msgpack-zstd", dumps, loads),
+]
+
+
+def measure(obj):
+    row = []
+    for name, encode, decode in CODECS:
+        start = time.time()
+        for _ in range(REPEAT):
+            data = encode(obj)
+            decode(data)
+        row.append((len(data), (time.time() - start) / REPEAT * 1000))
+    return row
+
+
+def main(sizes):
+    print("%-12s %4s %-7s  %s" % ("domain", "size", "payload",
+                                   "  ".join("%24s" % ("%s bytes (ms)" % name) for name, _, _ in CODECS)))
+    for name, generate in PROBLEMS:
+        with open(os.path.join(HERE, "domains", name + ".pddl")) as f:
+            domain = f.read()
+        for n in sizes:
+            problem = generate(n)
+            for kind, build in (("task", task_message), ("result", task_result)):
+                row = measure(build(domain, problem))
+                print("%-12s %4d %-7s  %s" % (name, n, kind, "  ".join(
+                    "%9d %5.1f%% (%6.3f)" % (size, 100.0 * size / row[0][0], ms) for size, ms in row)))
+
+
+if __name__ == "__main__":
+    main([int(n) for n in sys.argv[1:]] or [4, 16, 64])